@@ -13,45 +13,169 @@ bl_info = {
 import bpy
 import os
 import sys
+import time
+import logging
 
-# Add the parent directory to sys.path
+# Setup logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Add the scripts directory to sys.path; the pipeline modules import each other by bare name
 parent_dir = os.path.dirname(os.path.abspath(__file__))
-if parent_dir not in sys.path:
-    sys.path.append(parent_dir)
-
-from scripts.main import edge_to_grease_pencil
-
-def get_current_frame_image():
-    for area in bpy.context.screen.areas:
-        if area.type == 'VIEW_3D':
-            for space in area.spaces:
-                if space.type == 'VIEW_3D':
-                    if space.background_images:
-                        bg_image = space.background_images[0]
-                        if bg_image.image:
-                            # Save the current frame as a temporary image
-                            temp_path = os.path.join(bpy.app.tempdir, "temp_frame.png")
-                            bg_image.image.save_render(temp_path)
-                            return temp_path
-    return None
+scripts_dir = os.path.join(parent_dir, 'scripts')
+if scripts_dir not in sys.path:
+    sys.path.append(scripts_dir)
+
+# Registration only imports these light modules; OpenCV, the stroke code and the inference stack
+# are imported by load_pipeline on the first operator invocation, or preloaded on a background thread
+import result_cache
+from lazy_import import import_timed, start_preload, format_import_times
+
+class EDGE2GP_AddonPreferences(bpy.types.AddonPreferences):
+    bl_idname = __name__
+
+    cache_enabled: bpy.props.BoolProperty(
+        name="Cache Detection Results",
+        description="Store detection results on disk and reuse them when frame, model and parameters match",
+        default=False,
+    )
+    cache_directory: bpy.props.StringProperty(
+        name="Cache Directory",
+        subtype='DIR_PATH',
+        default=result_cache.DEFAULT_CACHE_DIR,
+    )
+    cache_max_mb: bpy.props.IntProperty(
+        name="Cache Size (MB)",
+        description="Least recently used results are evicted beyond this size",
+        default=result_cache.DEFAULT_MAX_BYTES // (1024 * 1024), min=16,
+    )
+    preload_pipeline: bpy.props.BoolProperty(
+        name="Preload in Background",
+        description="Import the detection pipeline and the library of the selected backend on a background "
+                    "thread when Blender starts, so the first run does not wait for them",
+        default=False,
+    )
+
+    def draw(self, context):
+        layout = self.layout
+        layout.prop(self, "cache_enabled")
+        col = layout.column()
+        col.enabled = self.cache_enabled
+        col.prop(self, "cache_directory")
+        col.prop(self, "cache_max_mb")
+        layout.prop(self, "preload_pipeline")
+        import_times = format_import_times()
+        if import_times:
+            layout.label(text=f"Imported: {import_times}")
+
+def apply_preferences(context):
+    prefs = context.preferences.addons[__name__].preferences
+    result_cache.configure_cache(
+        enabled=prefs.cache_enabled,
+        directory=bpy.path.abspath(prefs.cache_directory),
+        max_bytes=prefs.cache_max_mb * 1024 * 1024,
+    )
+
+def load_pipeline():
+    """
+    Import the pipeline modules on first use.
+
+    :return: Seconds spent importing; close to 0 once they are loaded
+    """
+    start = time.perf_counter()
+    for name in ('main', 'frame_extraction', 'background_job', 'stylization'):
+        import_timed(name)
+    return time.perf_counter() - start
+
+def apply_style(operator):
+    from stylization import configure_style
+    configure_style(noise=operator.noise, variation=operator.variation)
+
+def get_current_frame_image(background):
+    """
+    Save the current frame of a background image as a temporary PNG and return its path.
+
+    Only used for sources read_background_frame cannot read in memory, e.g. image sequences.
+    """
+    if background.source != 'IMAGE' or background.image is None:
+        return None
+    temp_path = os.path.join(bpy.app.tempdir, "temp_frame.png")
+    background.image.save_render(temp_path)
+    return temp_path
+
+def capture_current_frame(context):
+    """
+    Read the current frame of the first readable camera background image, or else of the loaded movie.
+
+    :return: Tuple of (pixels, channel_order), or (None, None)
+    """
+    import cv2
+    import numpy as np
+    from frame_extraction import get_background_images, read_background_frame, get_movie_frame_pixels
+
+    scene = context.scene
+    for background in get_background_images(scene):
+        pixels, channel_order = read_background_frame(background, scene)
+        if pixels is None:
+            frame_path = get_current_frame_image(background)
+            pixels, channel_order = (cv2.imread(frame_path), 'BGR') if frame_path else (None, None)
+        if pixels is not None:
+            return pixels, channel_order
+    pixels = get_movie_frame_pixels(dtype=np.uint8)
+    if pixels is None:
+        return None, None
+    # Copy out of the pooled readback buffer, inference runs on a background thread
+    return pixels.copy(), 'RGB'
 
 class GPENCIL_OT_edge_detect(bpy.types.Operator):
     bl_idname = "gpencil.edge_detect"
     bl_label = "Detect Edges to Grease Pencil"
     bl_options = {'REGISTER', 'UNDO'}
 
-    noise: bpy.props.FloatProperty(name="Noise", default=0.1, min=0.0, max=1.0)
-    variation: bpy.props.FloatProperty(name="Variation", default=0.05, min=0.0, max=1.0)
+    noise: bpy.props.FloatProperty(name="Noise", description="Per-point jitter; 1.0 is about 1% of the frame",
+                                   default=0.1, min=0.0, max=1.0)
+    variation: bpy.props.FloatProperty(name="Variation",
+                                       description="Random offset of whole strokes; 1.0 is up to 1% of the frame",
+                                       default=0.05, min=0.0, max=1.0)
+
+    @classmethod
+    def poll(cls, context):
+        background_job = sys.modules.get('background_job')
+        return background_job is None or background_job.get_active_job() is None
+
+    def invoke(self, context, event):
+        load_pipeline()
+        import background_job
+
+        # Inference runs on background threads; strokes are written between redraws
+        frame_pixels, channel_order = capture_current_frame(context)
+        if frame_pixels is None:
+            self.report({'ERROR'}, "Could not get current frame image")
+            return {'CANCELLED'}
+        apply_preferences(context)
+        apply_style(self)
+        return background_job.invoke_modal(self, context, frame_pixels=frame_pixels, channel_order=channel_order)
+
+    def modal(self, context, event):
+        import background_job
+        return background_job.modal_step(self, context, event)
 
     def execute(self, context):
-        frame_path = get_current_frame_image()
-        if not frame_path:
+        load_pipeline()
+        from main import edge_to_grease_pencil
+
+        frame_pixels, channel_order = capture_current_frame(context)
+        if frame_pixels is None:
             self.report({'ERROR'}, "Could not get current frame image")
             return {'CANCELLED'}
 
         try:
-            gpencil_obj = edge_to_grease_pencil(frame_path, noise_amount=self.noise, variation_amount=self.variation)
-            self.report({'INFO'}, f"Added edge strokes to Grease Pencil object: {gpencil_obj.name}")
+            apply_preferences(context)
+            apply_style(self)
+            gpencil_obj = edge_to_grease_pencil(frame_pixels=frame_pixels, channel_order=channel_order)
+            stats = result_cache.get_cache_stats()
+            self.report({'INFO'}, f"Added edge strokes to Grease Pencil object: {gpencil_obj.name} "
+                                  f"(cache: {stats['hits']} hits, {stats['misses']} misses)")
         except Exception as e:
             self.report({'ERROR'}, str(e))
             return {'CANCELLED'}
@@ -61,13 +185,32 @@ class GPENCIL_OT_edge_detect(bpy.types.Operator):
 def menu_func(self, context):
     self.layout.operator(GPENCIL_OT_edge_detect.bl_idname)
 
+def selected_backend(context):
+    """
+    Return the backend chosen in the scene's Edge2GP panel, or PyTorch, detection's default, without the panel.
+    """
+    settings = getattr(getattr(context, 'scene', None), 'edge2gp', None)
+    return getattr(settings, 'inference_backend', 'torch')
+
+def _start_preload():
+    # Runs from a timer once Blender has loaded the startup file, so the scene's settings can be read
+    start_preload(backend=selected_backend(bpy.context))
+    return None
+
 def register():
+    start = time.perf_counter()
+    bpy.utils.register_class(EDGE2GP_AddonPreferences)
     bpy.utils.register_class(GPENCIL_OT_edge_detect)
     bpy.types.VIEW3D_MT_gpencil_add.append(menu_func)
+    addon = bpy.context.preferences.addons.get(__name__)
+    if addon is not None and addon.preferences.preload_pipeline:
+        bpy.app.timers.register(_start_preload, first_interval=0.0)
+    logger.info(f"Registered Edge to Grease Pencil in {(time.perf_counter() - start) * 1000:.1f} ms")
 
 def unregister():
     bpy.utils.unregister_class(GPENCIL_OT_edge_detect)
     bpy.types.VIEW3D_MT_gpencil_add.remove(menu_func)
+    bpy.utils.unregister_class(EDGE2GP_AddonPreferences)
 
 if __name__ == "__main__":
     register()
\ No newline at end of file
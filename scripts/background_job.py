@@ -0,0 +1,200 @@
+import bpy
+import time
+import logging
+import main
+from frame_extraction import get_frame_info, get_movie_source
+from frame_pipeline import (
+    start_frame_pipeline,
+    start_array_pipeline,
+    iter_frame_results,
+    stop_frame_pipeline,
+    get_pipeline_stats,
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_QUEUE_DEPTH,
+)
+from blender_utils import get_or_create_grease_pencil_object
+from instrumentation import start_run
+from preview import reset_preview
+
+# Setup logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Seconds between modal timer events, and main-thread seconds per event spent writing strokes.
+# Results queue up while Blender redraws, so the pipeline threads never wait on the UI.
+TIMER_INTERVAL = 0.02
+TICK_BUDGET = 0.05
+
+# The running job; Edge2GP writes to a single Grease Pencil object, so only one job runs at a time.
+# This module must not be importlib.reload()-ed while a job is running.
+_active = {'job': None}
+
+def get_active_job():
+    return _active['job']
+
+def start_job(frame_range=False, batch_size=DEFAULT_BATCH_SIZE, queue_depth=DEFAULT_QUEUE_DEPTH,
+              temporal_threshold=None, optical_flow=False, validate_every=0, frame_pixels=None,
+              channel_order='RGB'):
+    """
+    Start an Edge2GP run whose decoding, inference and mask post-processing happen on background threads.
+
+    Call step_job from Blender's main thread until it reports completion, or cancel_job to stop early.
+
+    :param frame_range: Process the scene frame range instead of the current frame
+    :param frame_pixels: Current frame already read into memory; otherwise frames are decoded from the movie
+    :param channel_order: Channel order of frame_pixels, 'RGB' or 'BGR'
+    :return: Job dictionary
+    """
+    if _active['job'] is not None:
+        raise RuntimeError("An Edge2GP job is already running")
+
+    frame_info = get_frame_info()
+    if frame_range:
+        start_frame, end_frame = frame_info['start_frame'], frame_info['end_frame']
+    else:
+        start_frame = end_frame = frame_info['current_frame']
+    logger.info(f"Starting background Edge2GP job for frames {start_frame}-{end_frame}")
+
+    start_run(f"Edge2GP frames {start_frame}-{end_frame}")
+    reset_preview()
+    try:
+        if frame_pixels is not None and not frame_range:
+            pipeline = start_array_pipeline(start_frame, frame_pixels, channel_order,
+                                            prepare_result=main.prepare_frame_strokes)
+        else:
+            movie_path, frame_offset = get_movie_source(bpy.context.scene)
+            pipeline = start_frame_pipeline(start_frame, end_frame, batch_size, queue_depth,
+                                            movie_path=movie_path, frame_offset=frame_offset,
+                                            temporal_threshold=temporal_threshold, optical_flow=optical_flow,
+                                            validate_every=validate_every, prepare_result=main.prepare_frame_strokes)
+    except Exception:
+        main.finish_run()
+        raise
+
+    job = {
+        'pipeline': pipeline,
+        'results': iter_frame_results(pipeline, timeout=0),
+        'gp_object': get_or_create_grease_pencil_object("Edge2GP_Result"),
+        'total': pipeline['total'],
+        'done': 0,
+        'start_time': time.perf_counter(),
+    }
+    _active['job'] = job
+    return job
+
+def _finish_job(job):
+    stop_frame_pipeline(job['pipeline'])
+    stats = get_pipeline_stats(job['pipeline'], job['done'])
+    main.last_run_stats.clear()
+    main.last_run_stats.update(stats)
+    main.finish_run()
+    _active['job'] = None
+    return stats
+
+def step_job(job, budget=TICK_BUDGET):
+    """
+    Write the strokes of finished frames on the main thread for up to budget seconds.
+
+    At least one waiting frame is written per call, so the job always makes progress.
+    Raises the first error any pipeline stage hit, after stopping the job.
+
+    :return: True once every frame has been written
+    """
+    deadline = time.perf_counter() + budget
+    try:
+        while True:
+            prepared = next(job['results'], StopIteration)
+            if prepared is StopIteration:
+                _finish_job(job)
+                logger.info(f"Background Edge2GP job completed for {job['done']} frames")
+                return True
+            if prepared is None:
+                return False
+            main.write_prepared_strokes(job['gp_object'], prepared)
+            job['done'] += 1
+            if time.perf_counter() >= deadline:
+                return False
+    except Exception:
+        _finish_job(job)
+        raise
+
+def cancel_job(job):
+    """
+    Stop the pipeline; strokes already written are kept.
+
+    :return: Pipeline statistics of the frames that were written
+    """
+    logger.info(f"Cancelling background Edge2GP job after {job['done']}/{job['total']} frames")
+    return _finish_job(job)
+
+def get_job_progress(job):
+    """
+    :return: Tuple of (frames done, total frames, estimated seconds left or None)
+    """
+    done, total = job['done'], job['total']
+    eta = None
+    if done:
+        eta = (time.perf_counter() - job['start_time']) / done * (total - done)
+    return done, total, eta
+
+def format_job_progress(job):
+    done, total, eta = get_job_progress(job)
+    text = f"Edge2GP: frame {done}/{total}"
+    if eta is not None:
+        text += f", {eta:.0f}s left"
+    return text + " (Esc to cancel)"
+
+def invoke_modal(operator, context, **job_kwargs):
+    """
+    Start a job and drive it from a modal operator; call from the operator's invoke.
+
+    The operator's modal method should return modal_step(self, context, event).
+    """
+    try:
+        operator._job = start_job(**job_kwargs)
+    except Exception as e:
+        operator.report({'ERROR'}, str(e))
+        return {'CANCELLED'}
+    window_manager = context.window_manager
+    operator._timer = window_manager.event_timer_add(TIMER_INTERVAL, window=context.window)
+    window_manager.progress_begin(0, operator._job['total'])
+    window_manager.modal_handler_add(operator)
+    return {'RUNNING_MODAL'}
+
+def _end_modal(operator, context):
+    window_manager = context.window_manager
+    window_manager.event_timer_remove(operator._timer)
+    window_manager.progress_end()
+    if context.workspace is not None:
+        context.workspace.status_text_set(None)
+
+def modal_step(operator, context, event):
+    """
+    Advance the operator's job on timer events and cancel it on Esc.
+    """
+    job = operator._job
+    if event.type == 'ESC':
+        stats = cancel_job(job)
+        _end_modal(operator, context)
+        # Keep the partial result as one undo step
+        operator.report({'WARNING'}, f"Edge2GP cancelled; kept strokes for {stats['frames']}/{job['total']} frames")
+        return {'FINISHED'}
+    if event.type != 'TIMER':
+        return {'PASS_THROUGH'}
+
+    try:
+        finished = step_job(job)
+    except Exception as e:
+        _end_modal(operator, context)
+        operator.report({'ERROR'}, f"Edge2GP failed: {str(e)}")
+        return {'CANCELLED'}
+
+    if finished:
+        _end_modal(operator, context)
+        operator.report({'INFO'}, f"Edge2GP wrote strokes for {job['done']} frames")
+        return {'FINISHED'}
+
+    context.window_manager.progress_update(job['done'])
+    if context.workspace is not None:
+        context.workspace.status_text_set(format_job_progress(job))
+    return {'RUNNING_MODAL'}
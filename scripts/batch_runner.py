@@ -0,0 +1,235 @@
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+import subprocess
+import shutil
+import tempfile
+import numpy as np
+
+# Blender does not put the --python script's directory on sys.path
+scripts_dir = os.path.dirname(os.path.abspath(__file__))
+if scripts_dir not in sys.path:
+    sys.path.append(scripts_dir)
+
+# Setup logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Usage (every Blender process runs without a UI):
+#   blender --background --python scripts/batch_runner.py -- shot.blend --start 1 --end 240 --workers 8
+# The coordinator splits the range into contiguous shards, runs one background Blender per shard,
+# and merges the shards' Grease Pencil frames into one object saved to --output.
+
+GP_OBJECT_NAME = "Edge2GP_Result"
+# Limits every threaded library a worker may load; the coordinator divides the cores between workers
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'VECLIB_MAXIMUM_THREADS')
+# Every worker is a full Blender with its own resident YOLO model, so the default stays small
+MAX_DEFAULT_WORKERS = 4
+WORKER_MEMORY = 4 * 1024 ** 3
+# Lines of a failed worker's log repeated in the coordinator's log before the work directory is removed
+LOG_TAIL_LINES = 20
+
+def shard_ranges(start_frame, end_frame, workers):
+    """
+    Split a frame range into at most workers contiguous, near-equal sub-ranges.
+
+    :return: List of (start_frame, end_frame) tuples, both inclusive
+    """
+    count = end_frame - start_frame + 1
+    workers = max(1, min(workers, count))
+    bounds = np.linspace(0, count, workers + 1).round().astype(int)
+    return [(start_frame + int(first), start_frame + int(last) - 1) for first, last in zip(bounds[:-1], bounds[1:])]
+
+def threads_per_worker(workers, cores=None):
+    return max(1, (cores or os.cpu_count() or 1) // workers)
+
+def _available_memory():
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.virtual_memory().available
+
+def default_worker_count(cores=None, memory=None):
+    """
+    Number of workers when --workers is not given: one per core, but at most MAX_DEFAULT_WORKERS
+    and no more than fit into the available memory (unknown without psutil).
+    """
+    workers = min(cores or os.cpu_count() or 1, MAX_DEFAULT_WORKERS)
+    memory = _available_memory() if memory is None else memory
+    if memory is not None:
+        workers = min(workers, memory // WORKER_MEMORY)
+    return max(1, int(workers))
+
+def export_shard(gp_object, shard_path):
+    """
+    Save every layer frame of a Grease Pencil object as flat stroke arrays.
+    """
+    from stroke_writers import get_stroke_writer
+    writer = get_stroke_writer(gp_object)
+    arrays = {}
+    index = []
+    for layer_name, gp_frame in writer.layer_frames():
+        key = f"f{len(index)}"
+        index.append({'layer': layer_name, 'frame': gp_frame.frame_number, 'key': key})
+        for name, values in writer.read_frame(gp_frame).items():
+            arrays[f"{key}_{name}"] = values
+    np.savez(shard_path, index=json.dumps(index), **arrays)
+    return len(index)
+
+def import_shard(gp_object, shard_path):
+    """
+    Write the frames of a shard into a Grease Pencil object, replacing frames with the same number.
+    """
+    from stroke_writers import get_stroke_writer
+    # Workers and the coordinator run the same Blender, so shards hold the arrays of this object's data model
+    writer = get_stroke_writer(gp_object)
+    with np.load(shard_path) as shard:
+        index = json.loads(str(shard['index']))
+        for entry in index:
+            prefix = entry['key'] + '_'
+            strokes = {name[len(prefix):]: shard[name] for name in shard.files if name.startswith(prefix)}
+            writer.write_frame(entry['layer'], entry['frame'], strokes)
+    return len(index)
+
+def run_worker(args):
+    """
+    Process one shard inside a background Blender that has the .blend open.
+    """
+    from inference_backends import configure_threads
+    from stylization import configure_style
+    from yolo_edge_detection import configure_edge_refinement
+    from polyline_pool import configure_polyline_pool
+    from result_cache import configure_cache
+    from main import edge_to_grease_pencil_range
+    from blender_utils import get_or_create_grease_pencil_object
+    from stroke_writers import get_stroke_writer
+
+    configure_threads(args.threads)
+    # Styling is seeded per frame, so every shard matches a single-process run
+    configure_style(**json.loads(args.style))
+    configure_edge_refinement(**json.loads(args.edges))
+    if args.cache_dir is not None:
+        # Shards share one cache; entries are written atomically
+        configure_cache(enabled=True, directory=os.path.abspath(args.cache_dir))
+    # The workers already divide the cores between them, so tracing stays serial instead of starting a pool
+    configure_polyline_pool(workers=1, use_processes=False, range_processes=False)
+    # Only this shard's frames go into the shard file
+    gp_object = get_or_create_grease_pencil_object(GP_OBJECT_NAME)
+    get_stroke_writer(gp_object).clear_frames()
+
+    edge_to_grease_pencil_range(args.start, args.end, batch_size=args.batch_size,
+                                temporal_threshold=args.temporal_threshold)
+    count = export_shard(gp_object, args.shard)
+    logger.info(f"Worker wrote {count} layer frames for frames {args.start}-{args.end} to {args.shard}")
+
+def worker_command(args, start_frame, end_frame, shard_path, threads):
+    import bpy
+    command = [
+        bpy.app.binary_path, '--background', os.path.abspath(args.blend),
+        '--python-exit-code', '1', '--python', os.path.abspath(__file__), '--',
+        os.path.abspath(args.blend), '--worker', '--start', str(start_frame), '--end', str(end_frame),
+        '--shard', shard_path, '--threads', str(threads), '--batch-size', str(args.batch_size),
+    ]
+    if args.temporal_threshold is not None:
+        command += ['--temporal-threshold', str(args.temporal_threshold)]
+    if args.style != '{}':
+        command += ['--style', args.style]
+    if args.edges != '{}':
+        command += ['--edges', args.edges]
+    if args.cache_dir is not None:
+        command += ['--cache-dir', os.path.abspath(args.cache_dir)]
+    return command
+
+def run_coordinator(args):
+    """
+    Run the shards in parallel background Blender processes and merge their results.
+
+    :return: Process exit code
+    """
+    import bpy
+    from blender_utils import get_or_create_grease_pencil_object
+
+    bpy.ops.wm.open_mainfile(filepath=os.path.abspath(args.blend))
+    scene = bpy.context.scene
+    start_frame = scene.frame_start if args.start is None else args.start
+    end_frame = scene.frame_end if args.end is None else args.end
+    shards = shard_ranges(start_frame, end_frame, args.workers or default_worker_count())
+    threads = args.threads or threads_per_worker(len(shards))
+    work_dir = tempfile.mkdtemp(prefix='edge2gp_batch_')
+    environment = dict(os.environ, **{name: str(threads) for name in THREAD_ENV_VARS})
+    logger.info(f"Running frames {start_frame}-{end_frame} as {len(shards)} shards with {threads} threads each "
+                f"in {work_dir}")
+
+    started = time.perf_counter()
+    processes = []
+    failed = 0
+    try:
+        for number, (first, last) in enumerate(shards):
+            shard_path = os.path.join(work_dir, f"shard_{number:03d}.npz")
+            log = open(os.path.join(work_dir, f"shard_{number:03d}.log"), 'w')
+            process = subprocess.Popen(worker_command(args, first, last, shard_path, threads),
+                                       stdout=log, stderr=subprocess.STDOUT, env=environment)
+            processes.append((process, log, shard_path, first, last))
+
+        gp_object = get_or_create_grease_pencil_object(GP_OBJECT_NAME)
+        for process, log, shard_path, first, last in processes:
+            process.wait()
+            log.close()
+            if process.returncode != 0 or not os.path.exists(shard_path):
+                failed += 1
+                with open(log.name) as lines:
+                    tail = ''.join(lines.readlines()[-LOG_TAIL_LINES:])
+                logger.error(f"Shard {first}-{last} failed with exit code {process.returncode}:\n{tail}")
+                continue
+            import_shard(gp_object, shard_path)
+    finally:
+        # Workers still running when the coordinator fails would write into the removed directory
+        for process, log, _, _, _ in processes:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            log.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    output = os.path.abspath(args.output or os.path.splitext(args.blend)[0] + '_edge2gp.blend')
+    bpy.ops.wm.save_as_mainfile(filepath=output, copy=True)
+    logger.info(f"Merged {len(shards) - failed}/{len(shards)} shards into {output} "
+                f"in {time.perf_counter() - started:.1f}s")
+    return 1 if failed else 0
+
+def parse_arguments(argv):
+    # Blender passes the script's own arguments after '--'
+    argv = argv[argv.index('--') + 1:] if '--' in argv else []
+    parser = argparse.ArgumentParser(prog="batch_runner.py", description="Run Edge2GP headless on a frame range")
+    parser.add_argument('blend', help=".blend file with the movie loaded")
+    parser.add_argument('--start', type=int, default=None, help="First frame; defaults to the scene start")
+    parser.add_argument('--end', type=int, default=None, help="Last frame; defaults to the scene end")
+    parser.add_argument('--workers', type=int, default=None,
+                        help=f"Background Blender processes; defaults to one per core, at most {MAX_DEFAULT_WORKERS} "
+                             "and as many as fit into the available memory")
+    parser.add_argument('--threads', type=int, default=None,
+                        help="Inference threads per worker; defaults to the cores divided by the workers")
+    parser.add_argument('--batch-size', type=int, default=4)
+    parser.add_argument('--temporal-threshold', type=float, default=None,
+                        help="Skip inference on near-static frames, see the panel's Skip Static Frames")
+    parser.add_argument('--style', default='{}',
+                        help='Stroke style as JSON, e.g. \'{"seed": 3, "noise": 0.1, "pressure_taper": 0.5}\'')
+    parser.add_argument('--edges', default='{}',
+                        help='Edge refinement as JSON, e.g. \'{"refine": true, "margin": 0.1, "keep_outlines": false}\'')
+    parser.add_argument('--cache-dir', default=None,
+                        help="Cache detection results in this directory, so re-runs of the shot skip inference")
+    parser.add_argument('--output', default=None, help="Where to save the merged .blend")
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--shard', default=None, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    arguments = parse_arguments(sys.argv)
+    if arguments.worker:
+        run_worker(arguments)
+    else:
+        sys.exit(run_coordinator(arguments))
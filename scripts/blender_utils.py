@@ -2,38 +2,59 @@ import bpy
 import numpy as np
 import bmesh
 from mathutils import Vector
+from instrumentation import traced
+from stroke_writers import grease_pencil_datablocks
 
+@traced('image_upload')
 def create_image_from_numpy(array, name="NumpyImage"):
     """
-    Create a Blender Image from a NumPy array.
+    Create a Blender Image from a NumPy array, or update it in place if one of the same size exists.
     
-    :param array: NumPy array (height, width) or (height, width, channels)
+    :param array: NumPy array (height, width) or (height, width, 1, 3 or 4 channels) with the top row first;
+                  integer arrays are scaled from their full range to 0..1
     :param name: Name for the new image
     :return: Blender Image object
     """
     if array.ndim == 2:
         height, width = array.shape
         channels = 1
+        array = array[:, :, np.newaxis]
     elif array.ndim == 3:
         height, width, channels = array.shape
     else:
         raise ValueError("Input array must be 2D or 3D")
+    # Every channel of the RGBA buffer must be written, or a reused image keeps the previous frame's values
+    if channels not in (1, 3, 4):
+        raise ValueError(f"Input array must have 1, 3 or 4 channels, not {channels}")
 
-    if name in bpy.data.images:
-        bpy.data.images.remove(bpy.data.images[name])
+    image = bpy.data.images.get(name)
+    if image is not None and tuple(image.size) != (width, height):
+        bpy.data.images.remove(image)
+        image = None
+    if image is None:
+        image = bpy.data.images.new(name, width, height, alpha=channels==4)
 
-    image = bpy.data.images.new(name, width, height, alpha=channels==4)
-
-    # Ensure array is flattened and in the correct format
+    # Build the bottom-up RGBA float32 buffer Blender stores internally
+    scale = np.float32(1.0 / np.iinfo(array.dtype).max) if np.issubdtype(array.dtype, np.integer) else np.float32(1.0)
+    rgba = np.empty((height, width, 4), dtype=np.float32)
+    np.multiply(array[::-1], scale, out=rgba[:, :, :channels], casting='unsafe')
     if channels == 1:
-        array = np.repeat(array.flatten(), 4)
+        rgba[:, :, 1:] = rgba[:, :, :1]
     elif channels == 3:
-        array = np.column_stack((array.reshape(-1, 3), np.ones(height*width)))
-    
-    image.pixels = array.flatten()
+        rgba[:, :, 3] = 1.0
+
+    image.pixels.foreach_set(rgba.ravel())
+    image.update()
     
     return image
 
+def get_screen():
+    """
+    Return the active screen, or None in background mode and other contexts without a window.
+    """
+    return getattr(bpy.context, 'screen', None)
+
+@traced('visualization')
 def visualize_numpy_array(array, name="Visualization"):
     """
     Visualize a NumPy array as an image in Blender's Image Editor.
@@ -42,14 +63,19 @@ def visualize_numpy_array(array, name="Visualization"):
     :param name: Name for the visualization
     """
     image = create_image_from_numpy(array, name)
-    
+
+    # Without a UI the image is still created, there is just nowhere to show it
+    screen = get_screen()
+    if screen is None:
+        return
+
     # Find or create an Image Editor area
-    for area in bpy.context.screen.areas:
+    for area in screen.areas:
         if area.type == 'IMAGE_EDITOR':
             break
     else:
         # If no Image Editor is found, create one by splitting the 3D View
-        for area in bpy.context.screen.areas:
+        for area in screen.areas:
             if area.type == 'VIEW_3D':
                 # Create a new context override
                 override = bpy.context.copy()
@@ -60,7 +86,7 @@ def visualize_numpy_array(array, name="Visualization"):
                     bpy.ops.screen.area_split(direction='VERTICAL', factor=0.5)
                 
                 # The new area is the last one in the list
-                area = bpy.context.screen.areas[-1]
+                area = screen.areas[-1]
                 area.type = 'IMAGE_EDITOR'
                 break
 
@@ -70,13 +96,15 @@ def visualize_numpy_array(array, name="Visualization"):
 def get_or_create_grease_pencil_object(name="GPObject"):
     """
     Get an existing Grease Pencil object or create a new one.
+
+    New objects use Grease Pencil v3 data on Blender 4.3 and later, legacy GPencil data before.
     
     :param name: Name for the Grease Pencil object
     :return: Grease Pencil object
     """
     gp_obj = bpy.data.objects.get(name)
     if gp_obj is None:
-        gp_data = bpy.data.grease_pencils.new(name)
+        gp_data = grease_pencil_datablocks().new(name)
         gp_obj = bpy.data.objects.new(name, gp_data)
         bpy.context.scene.collection.objects.link(gp_obj)
     return gp_obj
@@ -87,7 +115,10 @@ def focus_view_on_object(obj):
     
     :param obj: Blender object to focus on
     """
-    for area in bpy.context.screen.areas:
+    screen = get_screen()
+    if screen is None:
+        return
+    for area in screen.areas:
         if area.type == 'VIEW_3D':
             for region in area.regions:
                 if region.type == 'WINDOW':
@@ -1,7 +1,7 @@
 import bpy
 import os
 import sys
-import importlib
+import time
 import logging
 import traceback
 
@@ -25,40 +25,135 @@ logger.info(f"Current working directory: {os.getcwd()}")
 if os.path.exists(scripts_dir):
     logger.info(f"Files in scripts directory: {os.listdir(scripts_dir)}")
 
-# Import other modules
+# Only bpy-level code is imported at registration; the pipeline modules are loaded by import_modules
+from lazy_import import PIPELINE_MODULES, import_timed, reload_if_changed, get_import_times
+
 main = None
 blender_utils = None
+model_registry = None
+inference_worker = None
+result_cache = None
+yolo_detection = None
+instrumentation = None
+background_job = None
+preview = None
+stylization = None
+yolo_edge_detection = None
+polyline_pool = None
+
+# The result cache is configured once, in the preferences of this add-on (edge2gp_operator.py)
+CACHE_ADDON = 'edge2gp_operator'
 
 def import_modules():
-    global main, blender_utils
-    try:
-        logger.info("Attempting to import main")
-        import main
-        logger.info("Successfully imported main module")
-    except ImportError as e:
-        logger.error(f"Error importing main module: {str(e)}")
-        logger.error(traceback.format_exc())
+    """
+    Import the pipeline modules on first use; registering the add-on does not load them.
 
-    try:
-        logger.info("Attempting to import blender_utils")
-        import blender_utils
-        logger.info("Successfully imported blender_utils module")
-    except ImportError as e:
-        logger.error(f"Error importing blender_utils module: {str(e)}")
-        logger.error(traceback.format_exc())
+    main and blender_utils are reloaded when their source changed, to pick up edits while developing.
+    model_registry is never reloaded so the resident model survives, nor are instrumentation,
+    background_job, preview, stylization, yolo_edge_detection and polyline_pool, so the last trace,
+    a running job, the preview and edge settings, the strokes kept for restyling and the worker pool survive.
+    """
+    for name in PIPELINE_MODULES:
+        module = globals()[name]
+        if module is not None:
+            if name in ('main', 'blender_utils'):
+                globals()[name] = reload_if_changed(module)
+            continue
+        try:
+            logger.info(f"Attempting to import {name}")
+            globals()[name] = import_timed(name)
+            logger.info(f"Successfully imported {name} module")
+        except ImportError as e:
+            logger.error(f"Error importing {name} module: {str(e)}")
+            logger.error(traceback.format_exc())
 
-    # Ensure modules are reloaded in case of changes
-    if 'main' in sys.modules:
-        importlib.reload(main)
-    if 'blender_utils' in sys.modules:
-        importlib.reload(blender_utils)
+def get_cache_preferences(context):
+    """
+    Return the preferences of the Edge to Grease Pencil add-on, which hold the result cache settings
+    for the whole installation, or None when the add-on is not enabled.
+    """
+    addon = context.preferences.addons.get(CACHE_ADDON)
+    return addon.preferences if addon is not None else None
 
-def run_edge2gp():
+def apply_settings(settings):
+    """
+    Push the panel settings into the pipeline modules.
+    """
+    if inference_worker is not None:
+        inference_worker.enable_worker(settings.use_inference_worker)
+    prefs = get_cache_preferences(bpy.context)
+    if result_cache is not None and prefs is not None:
+        result_cache.configure_cache(
+            enabled=prefs.cache_enabled,
+            directory=bpy.path.abspath(prefs.cache_directory) or result_cache.DEFAULT_CACHE_DIR,
+            max_bytes=prefs.cache_max_mb * 1024 * 1024,
+        )
+    if instrumentation is not None:
+        instrumentation.configure_instrumentation(enabled=settings.record_trace)
+    if preview is not None:
+        preview.configure_preview(
+            enabled=settings.show_preview and not bpy.app.background,
+            source=settings.preview_source,
+            max_size=settings.preview_size,
+            interval=settings.preview_interval,
+        )
+    if stylization is not None:
+        stylization.configure_style(
+            seed=settings.style_seed,
+            noise=settings.style_noise,
+            variation=settings.style_variation,
+            pressure_taper=settings.pressure_taper,
+            strength_taper=settings.strength_taper,
+            width_jitter=settings.width_jitter,
+        )
+    if yolo_edge_detection is not None:
+        yolo_edge_detection.configure_edge_refinement(
+            refine=settings.refine_edges,
+            margin=settings.edge_margin,
+            use_masks=settings.edge_use_masks,
+            pyramid_levels=settings.edge_pyramid_levels,
+            low_threshold=settings.edge_low_threshold,
+            high_threshold=settings.edge_high_threshold,
+            keep_outlines=settings.edge_keep_outlines,
+        )
+    if polyline_pool is not None:
+        polyline_pool.configure_polyline_pool(
+            workers=settings.polyline_workers,
+            range_processes=settings.polyline_processes,
+        )
+    if yolo_detection is not None:
+        yolo_detection.configure_detection(
+            input_size=settings.input_size,
+            tiled=settings.tiled_inference,
+            tile_overlap=settings.tile_overlap,
+            backend=settings.inference_backend,
+            precision=get_precision(settings),
+        )
+
+def get_precision(settings):
+    # A precision picked for an exported backend may linger after switching back to torch, which runs FP32
+    return settings.precision if settings.inference_backend != 'torch' else 'float32'
+
+def get_run_arguments(settings):
+    return {
+        'frame_range': settings.frame_range,
+        'batch_size': settings.batch_size,
+        'queue_depth': settings.queue_depth,
+        'temporal_threshold': settings.temporal_threshold if settings.use_temporal else None,
+        'optical_flow': settings.use_optical_flow,
+        'validate_every': settings.validate_every,
+    }
+
+def run_edge2gp(settings=None):
     import_modules()
     try:
         logger.info("Starting Edge2GP process")
         if main is not None:
-            main.edge_to_grease_pencil()
+            if settings is not None:
+                apply_settings(settings)
+                main.edge_to_grease_pencil(**get_run_arguments(settings))
+            else:
+                main.edge_to_grease_pencil()
             logger.info("Edge2GP process completed successfully")
         else:
             logger.error("Cannot run edge_to_grease_pencil: main module not imported")
@@ -67,13 +162,315 @@ def run_edge2gp():
         logger.error(traceback.format_exc())
 
 # Addon Classes (for future use)
+class EDGE2GP_PG_settings(bpy.types.PropertyGroup):
+    frame_range: bpy.props.BoolProperty(
+        name="Frame Range",
+        description="Process the scene frame range instead of the current frame",
+        default=False,
+    )
+    batch_size: bpy.props.IntProperty(
+        name="Batch Size",
+        description="Number of frames per YOLO forward pass",
+        default=4, min=1, max=64,
+    )
+    queue_depth: bpy.props.IntProperty(
+        name="Queue Depth",
+        description="Maximum number of frames buffered between decode, inference and stroke writing",
+        default=8, min=1, max=256,
+    )
+    polyline_workers: bpy.props.IntProperty(
+        name="Tracing Workers",
+        description="Workers simplifying traced edge contours into strokes (0 uses up to 4 cores)",
+        default=0, min=0, max=256,
+    )
+    polyline_processes: bpy.props.BoolProperty(
+        name="Trace Ranges in Processes",
+        description="While a frame range runs, simplify in worker processes that read the contours from "
+                    "shared memory; single frames always use threads, which contend for the Python interpreter",
+        default=True,
+    )
+    input_size: bpy.props.IntProperty(
+        name="Input Size",
+        description="Model input size frames are letterboxed to (rounded up to a multiple of 32)",
+        default=640, min=32, max=2048, step=32,
+    )
+    inference_backend: bpy.props.EnumProperty(
+        name="Backend",
+        description="Runtime the YOLO model is executed with",
+        items=[
+            ('torch', "PyTorch", "Eager PyTorch on the checkpoint"),
+            ('onnxruntime', "ONNX Runtime", "ONNX export, run on the CPU with ONNX Runtime"),
+            ('openvino', "OpenVINO", "ONNX export, compiled for the CPU with OpenVINO"),
+        ],
+        default='torch',
+    )
+    precision: bpy.props.EnumProperty(
+        name="Precision",
+        description="INT8 needs a calibrated model, see Calibrate INT8",
+        items=[
+            ('float32', "FP32", "Full precision"),
+            ('int8', "INT8", "Statically quantized ONNX model calibrated on frames of the loaded movie"),
+        ],
+        default='float32',
+    )
+    tiled_inference: bpy.props.BoolProperty(
+        name="Tiled Inference",
+        description="Also run overlapping native-resolution tiles to find small objects in large plates",
+        default=False,
+    )
+    tile_overlap: bpy.props.FloatProperty(
+        name="Tile Overlap",
+        description="Fraction of a tile shared with its neighbour",
+        default=0.2, min=0.0, max=0.9,
+    )
+    use_temporal: bpy.props.BoolProperty(
+        name="Skip Static Frames",
+        description="Reuse the last detection for frames that barely changed",
+        default=False,
+    )
+    temporal_threshold: bpy.props.FloatProperty(
+        name="Change Threshold",
+        description="Mean grayscale difference below which a frame reuses the previous detection",
+        default=0.02, min=0.0, max=1.0, precision=3,
+    )
+    use_optical_flow: bpy.props.BoolProperty(
+        name="Optical Flow",
+        description="Move reused detections with sparse optical flow",
+        default=False,
+    )
+    validate_every: bpy.props.IntProperty(
+        name="Validate Every",
+        description="Fully infer every n-th skipped frame to measure the reuse error (0 disables)",
+        default=0, min=0,
+    )
+    use_inference_worker: bpy.props.BoolProperty(
+        name="Inference Worker",
+        description="Run YOLO in a separate process that keeps the model loaded across add-on reloads",
+        default=False,
+    )
+    show_preview: bpy.props.BoolProperty(
+        name="Preview",
+        description="Show a downsampled intermediate in an open Image Editor while running; off in background mode",
+        default=True,
+    )
+    preview_source: bpy.props.EnumProperty(
+        name="Show",
+        items=[
+            ('FRAME', "Frame", "The input frame"),
+            ('EDGE_MASK', "Edge Mask", "Instance outlines the edge strokes are traced from"),
+            ('SEGMENTATION_MASK', "Segmentation Mask", "Filled instance masks"),
+            ('OVERLAY', "Overlay", "Segmentation mask and labelled boxes over the frame"),
+        ],
+        default='OVERLAY',
+    )
+    preview_size: bpy.props.IntProperty(
+        name="Preview Size",
+        description="Longest side of the preview image in pixels",
+        default=512, min=64, max=4096,
+    )
+    preview_interval: bpy.props.IntProperty(
+        name="Preview Every",
+        description="Refresh the preview at most once per this many frames",
+        default=10, min=1,
+    )
+    refine_edges: bpy.props.BoolProperty(
+        name="Image Edges",
+        description="Trace Canny edges of the plate inside the detected objects instead of only their outlines",
+        default=False,
+    )
+    edge_margin: bpy.props.FloatProperty(
+        name="Margin",
+        description="How far beyond each object, as a fraction of its size, edges are searched",
+        default=0.1, min=0.0, max=1.0, subtype='FACTOR',
+    )
+    edge_use_masks: bpy.props.BoolProperty(
+        name="Within Masks",
+        description="Only keep edges inside the grown instance masks rather than the whole boxes",
+        default=True,
+    )
+    edge_pyramid_levels: bpy.props.IntProperty(
+        name="Coarse Levels",
+        description="Halvings for the coarse edge search; full resolution only runs where it finds edges "
+                    "(0 runs every region at full resolution)",
+        default=2, min=0, max=5,
+    )
+    edge_low_threshold: bpy.props.IntProperty(
+        name="Low Threshold",
+        description="Canny hysteresis low threshold",
+        default=50, min=0, max=1000,
+    )
+    edge_high_threshold: bpy.props.IntProperty(
+        name="High Threshold",
+        description="Canny hysteresis high threshold",
+        default=150, min=0, max=1000,
+    )
+    edge_keep_outlines: bpy.props.BoolProperty(
+        name="Keep Outlines",
+        description="Also draw the instance outlines",
+        default=True,
+    )
+    style_seed: bpy.props.IntProperty(
+        name="Seed",
+        description="Seed of the stroke style; the same seed gives the same strokes on every run and worker",
+        default=0, min=0,
+    )
+    style_noise: bpy.props.FloatProperty(
+        name="Noise",
+        description="Per-point jitter; 1.0 is about 1% of the frame",
+        default=0.0, min=0.0, max=10.0,
+    )
+    style_variation: bpy.props.FloatProperty(
+        name="Variation",
+        description="Random offset of whole strokes; 1.0 is up to 1% of the frame",
+        default=0.0, min=0.0, max=10.0,
+    )
+    pressure_taper: bpy.props.FloatProperty(
+        name="Pressure Taper",
+        description="Thin open strokes out towards their ends",
+        default=0.0, min=0.0, max=1.0, subtype='FACTOR',
+    )
+    strength_taper: bpy.props.FloatProperty(
+        name="Strength Taper",
+        description="Fade open strokes out towards their ends",
+        default=0.0, min=0.0, max=1.0, subtype='FACTOR',
+    )
+    width_jitter: bpy.props.FloatProperty(
+        name="Width Jitter",
+        description="Random relative change of every stroke's line width",
+        default=0.0, min=0.0, max=1.0, subtype='FACTOR',
+    )
+    record_trace: bpy.props.BoolProperty(
+        name="Record Trace",
+        description="Time every pipeline stage and write a Chrome trace (chrome://tracing, Perfetto) per run",
+        default=True,
+    )
+
 class EDGE2GP_OT_run(bpy.types.Operator):
     bl_idname = "edge2gp.run"
     bl_label = "Run Edge2GP"
-    bl_description = "Run the Edge2GP process"
+    bl_description = "Run the Edge2GP process in the background; Esc cancels and keeps the frames done so far"
+
+    @classmethod
+    def poll(cls, context):
+        return background_job is None or background_job.get_active_job() is None
+
+    def invoke(self, context, event):
+        import_modules()
+        if background_job is None:
+            self.report({'ERROR'}, "background_job module not imported")
+            return {'CANCELLED'}
+        settings = context.scene.edge2gp
+        apply_settings(settings)
+        return background_job.invoke_modal(self, context, **get_run_arguments(settings))
+
+    def modal(self, context, event):
+        return background_job.modal_step(self, context, event)
+
+    def execute(self, context):
+        # Blocking run, used from scripts and in background mode
+        run_edge2gp(context.scene.edge2gp)
+        return {'FINISHED'}
+
+class EDGE2GP_OT_restyle(bpy.types.Operator):
+    bl_idname = "edge2gp.restyle"
+    bl_label = "Restyle Strokes"
+    bl_description = "Apply the style settings to the strokes written this session without running detection again"
+
+    @classmethod
+    def poll(cls, context):
+        return background_job is None or background_job.get_active_job() is None
+
+    def execute(self, context):
+        import_modules()
+        if main is None:
+            self.report({'ERROR'}, "main module not imported")
+            return {'CANCELLED'}
+        settings = context.scene.edge2gp
+        apply_settings(settings)
+        count = main.restyle_grease_pencil(frame_range=settings.frame_range)
+        if count == 0:
+            self.report({'WARNING'}, "No strokes written this session to restyle; run Edge2GP first")
+            return {'CANCELLED'}
+        self.report({'INFO'}, f"Restyled {count} layer frames")
+        return {'FINISHED'}
+
+class EDGE2GP_OT_evict_model(bpy.types.Operator):
+    bl_idname = "edge2gp.evict_model"
+    bl_label = "Evict YOLO Model"
+    bl_description = "Free the resident YOLO model"
 
     def execute(self, context):
-        run_edge2gp()
+        import_modules()
+        if model_registry is None:
+            self.report({'ERROR'}, "model_registry module not imported")
+            return {'CANCELLED'}
+        count = model_registry.evict_model()
+        if inference_worker is not None:
+            count += inference_worker.evict_worker_model() or 0
+        self.report({'INFO'}, f"Evicted {count} YOLO model(s)")
+        return {'FINISHED'}
+
+class EDGE2GP_OT_reload_model(bpy.types.Operator):
+    bl_idname = "edge2gp.reload_model"
+    bl_label = "Reload YOLO Model"
+    bl_description = "Load the YOLO weights from disk again and keep them resident"
+
+    def execute(self, context):
+        import_modules()
+        if model_registry is None or yolo_detection is None:
+            self.report({'ERROR'}, "model_registry or yolo_detection module not imported")
+            return {'CANCELLED'}
+        settings = context.scene.edge2gp
+        apply_settings(settings)
+        try:
+            options = yolo_detection.get_detection_config()
+            model_registry.reload_model(yolo_detection.MODEL_PATH, dtype=options['precision'],
+                                        backend=options['backend'], input_size=options['input_size'])
+        except Exception as e:
+            self.report({'ERROR'}, str(e))
+            return {'CANCELLED'}
+        self.report({'INFO'}, "YOLO model reloaded")
+        return {'FINISHED'}
+
+class EDGE2GP_OT_calibrate_int8(bpy.types.Operator):
+    bl_idname = "edge2gp.calibrate_int8"
+    bl_label = "Calibrate INT8"
+    bl_description = "Export the model to ONNX and quantize it to INT8 using frames of the loaded movie"
+
+    def execute(self, context):
+        import_modules()
+        import inference_backends
+        import frame_pipeline
+        settings = context.scene.edge2gp
+        movie_path = frame_pipeline.get_movie_path()
+        if movie_path is None:
+            self.report({'ERROR'}, "No movie loaded")
+            return {'CANCELLED'}
+        try:
+            # Round the input size to the stride the same way detection does
+            yolo_detection.configure_detection(input_size=settings.input_size)
+            input_size = yolo_detection.get_detection_config()['input_size']
+            frames = inference_backends.sample_movie_frames(movie_path)
+            path = inference_backends.quantize_int8(model_registry.MODEL_PATH, frames, input_size,
+                                                    channel_order='BGR')
+        except Exception as e:
+            self.report({'ERROR'}, str(e))
+            return {'CANCELLED'}
+        self.report({'INFO'}, f"INT8 model written to {path}")
+        return {'FINISHED'}
+
+class EDGE2GP_OT_stop_worker(bpy.types.Operator):
+    bl_idname = "edge2gp.stop_worker"
+    bl_label = "Stop Inference Worker"
+    bl_description = "Shut down the inference worker process and free its memory"
+
+    def execute(self, context):
+        import_modules()
+        if inference_worker is None:
+            self.report({'ERROR'}, "inference_worker module not imported")
+            return {'CANCELLED'}
+        inference_worker.shutdown_worker()
+        self.report({'INFO'}, "Inference worker stopped")
         return {'FINISHED'}
 
 class EDGE2GP_PT_panel(bpy.types.Panel):
@@ -85,23 +482,139 @@ class EDGE2GP_PT_panel(bpy.types.Panel):
 
     def draw(self, context):
         layout = self.layout
+        settings = context.scene.edge2gp
+        layout.prop(settings, "frame_range")
+        col = layout.column(align=True)
+        col.enabled = settings.frame_range
+        col.prop(settings, "batch_size")
+        col.prop(settings, "queue_depth")
+        col.prop(settings, "use_temporal")
+        sub = col.column(align=True)
+        sub.enabled = settings.use_temporal
+        sub.prop(settings, "temporal_threshold")
+        sub.prop(settings, "use_optical_flow")
+        sub.prop(settings, "validate_every")
+        col = layout.column(align=True)
+        col.prop(settings, "polyline_workers")
+        col.prop(settings, "polyline_processes")
         layout.operator("edge2gp.run")
 
+        temporal_stats = main.last_run_stats.get('temporal') if main is not None else None
+        if temporal_stats:
+            box = layout.box()
+            box.label(text=f"Skipped {temporal_stats['skipped']}/{temporal_stats['frames']} frames "
+                           f"({temporal_stats['skip_ratio']:.0%})")
+            if temporal_stats['mean_error'] is not None:
+                box.label(text=f"Reuse error: mean {temporal_stats['mean_error']:.3f}, "
+                               f"max {temporal_stats['max_error']:.3f}")
+
+        box = layout.box()
+        box.label(text="YOLO Model")
+        if model_registry is not None:
+            for (path, backend, device, dtype, _), stats in model_registry.get_load_stats().items():
+                box.label(text=f"{os.path.basename(path)} ({backend}, {device}, {dtype})")
+                box.label(text=f"Load {stats['load_time']:.2f}s, warm-up {stats['warmup_time']:.2f}s")
+        row = box.row()
+        row.operator("edge2gp.evict_model")
+        row.operator("edge2gp.reload_model")
+        box.prop(settings, "inference_backend")
+        row = box.row()
+        row.enabled = settings.inference_backend != 'torch'
+        row.prop(settings, "precision")
+        row.operator("edge2gp.calibrate_int8")
+        box.prop(settings, "input_size")
+        box.prop(settings, "tiled_inference")
+        row = box.row()
+        row.enabled = settings.tiled_inference
+        row.prop(settings, "tile_overlap")
+        box.prop(settings, "use_inference_worker")
+        if settings.use_inference_worker:
+            box.operator("edge2gp.stop_worker")
+
+        box = layout.box()
+        prefs = get_cache_preferences(context)
+        if prefs is None:
+            box.label(text="Enable the Edge to Grease Pencil add-on to cache detection results")
+        else:
+            box.prop(prefs, "cache_enabled")
+            col = box.column(align=True)
+            col.enabled = prefs.cache_enabled
+            col.prop(prefs, "cache_directory")
+            col.prop(prefs, "cache_max_mb")
+        if result_cache is not None and result_cache.is_cache_enabled():
+            stats = result_cache.get_cache_stats()
+            box.label(text=f"{stats['hits']} hits, {stats['misses']} misses, {stats['evictions']} evicted")
+
+        box = layout.box()
+        box.prop(settings, "refine_edges")
+        col = box.column(align=True)
+        col.enabled = settings.refine_edges
+        col.prop(settings, "edge_margin")
+        col.prop(settings, "edge_use_masks")
+        col.prop(settings, "edge_pyramid_levels")
+        col.prop(settings, "edge_low_threshold")
+        col.prop(settings, "edge_high_threshold")
+        col.prop(settings, "edge_keep_outlines")
+
+        box = layout.box()
+        box.label(text="Stroke Style")
+        col = box.column(align=True)
+        col.prop(settings, "style_noise")
+        col.prop(settings, "style_variation")
+        col.prop(settings, "pressure_taper")
+        col.prop(settings, "strength_taper")
+        col.prop(settings, "width_jitter")
+        col.prop(settings, "style_seed")
+        box.operator("edge2gp.restyle")
+
+        box = layout.box()
+        box.prop(settings, "show_preview")
+        col = box.column(align=True)
+        col.enabled = settings.show_preview
+        col.prop(settings, "preview_source")
+        col.prop(settings, "preview_size")
+        col.prop(settings, "preview_interval")
+
+        box = layout.box()
+        box.label(text="Last Run")
+        box.prop(settings, "record_trace")
+        import_times = get_import_times()
+        if import_times:
+            box.label(text=f"Pipeline import: {sum(import_times.values()):.2f}s")
+        summary = instrumentation.get_last_summary() if instrumentation is not None else None
+        if summary:
+            for line in instrumentation.format_summary(summary):
+                box.label(text=line)
+            trace_path = instrumentation.get_last_trace_path()
+            if trace_path:
+                box.label(text=f"Trace: {trace_path}")
+
 # Registration functions (for future addon use)
 def register():
     logger.info("Registering Edge2GP classes")
+    start = time.perf_counter()
+    bpy.utils.register_class(EDGE2GP_PG_settings)
+    bpy.types.Scene.edge2gp = bpy.props.PointerProperty(type=EDGE2GP_PG_settings)
     bpy.utils.register_class(EDGE2GP_OT_run)
+    bpy.utils.register_class(EDGE2GP_OT_restyle)
+    bpy.utils.register_class(EDGE2GP_OT_evict_model)
+    bpy.utils.register_class(EDGE2GP_OT_reload_model)
+    bpy.utils.register_class(EDGE2GP_OT_calibrate_int8)
+    bpy.utils.register_class(EDGE2GP_OT_stop_worker)
     bpy.utils.register_class(EDGE2GP_PT_panel)
-    import_modules()
-    if blender_utils is not None:
-        blender_utils.register_image_viewer()
+    logger.info(f"Registered Edge2GP in {(time.perf_counter() - start) * 1000:.1f} ms")
 
 def unregister():
     logger.info("Unregistering Edge2GP classes")
     bpy.utils.unregister_class(EDGE2GP_OT_run)
+    bpy.utils.unregister_class(EDGE2GP_OT_restyle)
+    bpy.utils.unregister_class(EDGE2GP_OT_evict_model)
+    bpy.utils.unregister_class(EDGE2GP_OT_reload_model)
+    bpy.utils.unregister_class(EDGE2GP_OT_calibrate_int8)
+    bpy.utils.unregister_class(EDGE2GP_OT_stop_worker)
     bpy.utils.unregister_class(EDGE2GP_PT_panel)
-    if blender_utils is not None:
-        blender_utils.unregister_image_viewer()
+    del bpy.types.Scene.edge2gp
+    bpy.utils.unregister_class(EDGE2GP_PG_settings)
 
 if __name__ == "__main__":
     logger.info("Running edge2gp.py as main")
@@ -1,7 +1,61 @@
 import bpy
+import cv2
+import time
 import numpy as np
+from instrumentation import span, get_peak_rss_bytes
 
-def get_movie_frame_pixels():
+# Reusable RGBA readback buffers keyed by (width, height, dtype)
+_frame_buffers = {}
+
+def _get_frame_buffer(width, height, dtype):
+    key = (width, height, np.dtype(dtype).str)
+    buffer = _frame_buffers.get(key)
+    if buffer is None:
+        buffer = np.empty((height, width, 4), dtype=dtype)
+        _frame_buffers[key] = buffer
+    return buffer
+
+def clear_frame_buffers():
+    """
+    Release all pooled readback buffers, e.g. after switching to a smaller plate.
+    """
+    _frame_buffers.clear()
+
+def read_image_pixels(image, dtype=np.float32):
+    """
+    Read an image's pixels into a pooled buffer without building Python lists.
+
+    The returned array is reused by the next call with the same resolution and dtype,
+    so copy it if it has to outlive the current frame. Blender stores rows bottom-up;
+    the result is a flipped view with the top row first, like frames decoded by OpenCV,
+    which is the orientation detection and stroke creation expect (image.pixels reshaped
+    as is would be upside down).
+
+    :param image: Blender image with loaded pixel data
+    :param dtype: np.float32 for 0..1 values, or np.uint8 for 0..255 values
+    :return: NumPy array (height, width, 4) in RGBA format
+    """
+    width, height = image.size
+    pixels = _get_frame_buffer(width, height, np.float32)
+    image.pixels.foreach_get(pixels.ravel())
+
+    if np.dtype(dtype) == np.uint8:
+        frame = _get_frame_buffer(width, height, np.uint8)
+        # Scale in place and truncate, matching (pixels * 255).astype(np.uint8)
+        np.multiply(pixels, 255, out=pixels)
+        np.copyto(frame, pixels, casting='unsafe')
+        return frame[::-1]
+    return pixels[::-1]
+
+def get_movie_frame_pixels(dtype=np.float32, return_stats=False):
+    """
+    Read the current frame of the first loaded movie.
+
+    :param dtype: np.float32 for 0..1 values, or np.uint8 for 0..255 values
+    :param return_stats: Also return a dictionary with readback time and memory figures
+    :return: NumPy array (height, width, 4) in RGBA format with the top row first, or None;
+             a (pixels, stats) tuple when return_stats is set
+    """
     print("Attempting to get movie frame pixels")
     for image in bpy.data.images:
         if image.source == 'MOVIE':
@@ -11,14 +65,137 @@ def get_movie_frame_pixels():
             print(f"Processing frame {frame} of movie {image.name}")
             
             if image.has_data:
-                pixels = np.array(image.pixels[:])
-                width, height = image.size
-                print(f"Successfully got movie frame pixels: {width}x{height}")
-                return pixels.reshape((height, width, 4))  # RGBA format
+                start = time.perf_counter()
+                with span('frame_extraction', pixels=image.size[0] * image.size[1]):
+                    pixels = read_image_pixels(image, dtype)
+                stats = {
+                    'readback_ms': (time.perf_counter() - start) * 1000,
+                    'buffer_bytes': sum(buffer.nbytes for buffer in _frame_buffers.values()),
+                    'peak_rss_bytes': get_peak_rss_bytes(),
+                }
+                height, width = pixels.shape[:2]
+                print(f"Successfully got movie frame pixels: {width}x{height} in {stats['readback_ms']:.1f} ms")
+                if return_stats:
+                    return pixels, stats
+                return pixels  # RGBA format
     
     print("Failed to get movie frame pixels")
+    if return_stats:
+        return None, None
     return None
 
+def image_user_frame(image_user, scene_frame, frame_duration):
+    """
+    Return the 1-based movie frame an image user shows at a scene frame, as Blender computes it.
+
+    :param image_user: The image user, e.g. of a camera background image
+    :param scene_frame: Scene frame number
+    :param frame_duration: Number of frames of the movie
+    """
+    duration = image_user.frame_duration or frame_duration
+    frame = scene_frame - image_user.frame_start + 1
+    if image_user.use_cyclic and duration:
+        frame %= duration
+        if frame <= 0:
+            frame += duration
+    else:
+        frame = min(max(frame, 1), duration)
+    return frame + image_user.frame_offset
+
+def movie_clip_frame(clip, scene_frame):
+    """
+    Return the 1-based file frame of a movie clip at a scene frame, honoring its start and offset.
+    """
+    return scene_frame - clip.frame_start + 1 + clip.frame_offset
+
+def read_movie_file_frame(movie_path, frame):
+    """
+    Decode one frame of a movie file into memory.
+
+    :param movie_path: Absolute path of the movie
+    :param frame: 1-based frame number
+    :return: uint8 BGR array (height, width, 3), or None if it cannot be decoded
+    """
+    capture = cv2.VideoCapture(movie_path)
+    try:
+        if not capture.isOpened():
+            return None
+        capture.set(cv2.CAP_PROP_POS_FRAMES, max(frame - 1, 0))
+        ok, frame_bgr = capture.read()
+        return frame_bgr if ok else None
+    finally:
+        capture.release()
+
+def get_background_images(scene):
+    """
+    Return the visible background images of the scene camera.
+    """
+    camera = scene.camera
+    if camera is None or camera.type != 'CAMERA':
+        return []
+    return [background for background in camera.data.background_images if background.show_background_image]
+
+def read_background_frame(background, scene, dtype=np.uint8):
+    """
+    Read the frame a camera background image shows at the current scene frame straight into memory.
+
+    Still images are read from their pixel buffer; movies and movie clips are decoded at the frame
+    their image user or clip maps the scene frame to.
+
+    :param background: Camera background image
+    :param scene: The scene, for the current frame and the active clip
+    :param dtype: np.float32 or np.uint8 for still images; decoded movies are always uint8
+    :return: Tuple of (pixels, channel_order), or (None, None) when the source cannot be read in memory
+    """
+    scene_frame = scene.frame_current
+    if background.source == 'MOVIE_CLIP':
+        clip = scene.active_clip if background.use_camera_clip else background.clip
+        if clip is None:
+            return None, None
+        with span('frame_extraction', frames=1):
+            frame_bgr = read_movie_file_frame(bpy.path.abspath(clip.filepath), movie_clip_frame(clip, scene_frame))
+        return (frame_bgr, 'BGR') if frame_bgr is not None else (None, None)
+
+    image = background.image
+    if image is None:
+        return None, None
+    if image.source == 'MOVIE':
+        frame = image_user_frame(background.image_user, scene_frame, image.frame_duration)
+        with span('frame_extraction', frames=1):
+            frame_bgr = read_movie_file_frame(bpy.path.abspath(image.filepath), frame)
+        return (frame_bgr, 'BGR') if frame_bgr is not None else (None, None)
+    if image.source in ('FILE', 'GENERATED') and image.has_data:
+        with span('frame_extraction', pixels=image.size[0] * image.size[1]):
+            # Copy out of the pooled buffer, the frame may outlive the next readback
+            return read_image_pixels(image, dtype).copy(), 'RGB'
+    # Image sequences, UDIM tiles and the like
+    return None, None
+
+def get_movie_source(scene):
+    """
+    Return the movie the frame-range pipeline decodes and how scene frames map onto it.
+
+    The movie shown as a camera background is preferred, mapped by its image user or clip; otherwise
+    the first loaded movie is used with scene frame 1 as its first frame. Cyclic image users are
+    decoded as if they were not cyclic.
+
+    :param scene: The scene, for its camera and active clip
+    :return: Tuple of (absolute movie path, frame offset) where movie frame = scene frame + offset,
+             both 1-based; (None, 0) without a loaded movie
+    """
+    for background in get_background_images(scene):
+        if background.source == 'MOVIE_CLIP':
+            clip = scene.active_clip if background.use_camera_clip else background.clip
+            if clip is not None:
+                return bpy.path.abspath(clip.filepath), movie_clip_frame(clip, 0)
+        elif background.image is not None and background.image.source == 'MOVIE':
+            image_user = background.image_user
+            return bpy.path.abspath(background.image.filepath), image_user.frame_offset - image_user.frame_start + 1
+    for image in bpy.data.images:
+        if image.source == 'MOVIE':
+            return bpy.path.abspath(image.filepath), 0
+    return None, 0
+
 def get_frame_info():
     scene = bpy.context.scene
     return {
@@ -0,0 +1,337 @@
+import bpy
+import cv2
+import queue
+import threading
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from instrumentation import span
+from yolo_detection import run_yolo_detection_batch, preprocess_frame
+from temporal import new_temporal_state, temporal_detect_batch, get_temporal_stats
+from polyline_pool import begin_frame_range, end_frame_range
+
+# Setup logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 4
+DEFAULT_QUEUE_DEPTH = 8
+# Frames prepared concurrently; tracing fans out further over polyline_pool
+DEFAULT_PREPARE_WORKERS = 2
+
+# Marks the end of a stage's output
+_END = object()
+
+def get_movie_path():
+    """
+    Return the absolute file path of the first loaded movie, or None.
+    """
+    for image in bpy.data.images:
+        if image.source == 'MOVIE':
+            return bpy.path.abspath(image.filepath)
+    return None
+
+def _put(target_queue, item, stop_event):
+    # Block on a full queue, but give up once the pipeline is stopped
+    while not stop_event.is_set():
+        try:
+            target_queue.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _get(source_queue, stop_event):
+    # Block on an empty queue, but report the end once the pipeline is stopped
+    while not stop_event.is_set():
+        try:
+            return source_queue.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _END
+
+def movie_frame_range(movie_path, start_frame, end_frame, frame_offset=0):
+    """
+    Clamp a scene frame range to the frames the movie has.
+
+    :param frame_offset: Offset from scene frames to movie frames, see frame_extraction.get_movie_source
+    :return: Tuple of (first, last) scene frame that will be decoded; empty when last < first.
+             The end is only clamped when the container reports its frame count.
+    """
+    capture = cv2.VideoCapture(movie_path)
+    try:
+        count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT)) if capture.isOpened() else 0
+    finally:
+        capture.release()
+    start_frame = max(start_frame, 1 - frame_offset)
+    if count > 0:
+        end_frame = min(end_frame, count - frame_offset)
+    return start_frame, end_frame
+
+def _read_frames(movie_path, start_frame, end_frame, frame_offset, frame_queue, stop_event, errors):
+    """
+    Decode frames start_frame..end_frame from the movie file into frame_queue.
+    Scene frames before the first movie frame are skipped.
+    """
+    capture = cv2.VideoCapture(movie_path)
+    try:
+        if not capture.isOpened():
+            raise IOError(f"Could not open movie: {movie_path}")
+        start_frame = max(start_frame, 1 - frame_offset)
+        # Blender frames are 1-based, movie frames 0-based
+        capture.set(cv2.CAP_PROP_POS_FRAMES, start_frame - 1 + frame_offset)
+        for frame_number in range(start_frame, end_frame + 1):
+            if stop_event.is_set():
+                break
+            with span('frame_decode', frames=1):
+                ok, frame_bgr = capture.read()
+            if not ok:
+                logger.warning(f"Movie ended before frame {frame_number}")
+                break
+            if not _put(frame_queue, (frame_number, frame_bgr), stop_event):
+                break
+    except Exception as e:
+        logger.error(f"Error decoding frames: {str(e)}")
+        errors.append(e)
+    finally:
+        capture.release()
+        _put(frame_queue, _END, stop_event)
+
+def _detect_bgr_batch(frames):
+    return run_yolo_detection_batch(frames, channel_order='BGR')
+
+def _infer_batches(frame_queue, result_queue, batch_size, stop_event, errors, temporal_state=None):
+    """
+    Group decoded frames into batches, run YOLO on each batch and queue per-frame results.
+
+    With a temporal state, frames that barely changed since the last keyframe reuse its detection.
+    """
+    finished = False
+    try:
+        while not finished and not stop_event.is_set():
+            batch = []
+            while len(batch) < batch_size:
+                item = _get(frame_queue, stop_event)
+                if item is _END:
+                    finished = True
+                    break
+                batch.append(item)
+            if not batch:
+                break
+
+            frames = [frame for _, frame in batch]
+            if temporal_state is not None:
+                detections = temporal_detect_batch(temporal_state, frames, _detect_bgr_batch, 'BGR')
+            else:
+                detections = _detect_bgr_batch(frames)
+            if detections is None:
+                raise RuntimeError(f"YOLO detection failed for frames {batch[0][0]}-{batch[-1][0]}")
+            for (frame_number, frame_bgr), result in zip(batch, detections):
+                if not _put(result_queue, (frame_number, frame_bgr, result), stop_event):
+                    return
+    except Exception as e:
+        logger.error(f"Error during batched inference: {str(e)}")
+        errors.append(e)
+    finally:
+        _put(result_queue, _END, stop_event)
+
+def _prepare_results(result_queue, prepared_queue, prepare_result, stop_event, errors, workers=1):
+    """
+    Apply prepare_result to every inferred frame off the main thread, up to workers frames at a time.
+    Results are handed on in frame order.
+    """
+    try:
+        with ThreadPoolExecutor(workers, thread_name_prefix="Edge2GP-prepare") as executor:
+            pending = deque()
+            while True:
+                item = _get(result_queue, stop_event)
+                if item is _END:
+                    break
+                pending.append(executor.submit(prepare_result, *item))
+                if len(pending) >= workers and not _put(prepared_queue, pending.popleft().result(), stop_event):
+                    return
+            while pending:
+                if not _put(prepared_queue, pending.popleft().result(), stop_event):
+                    return
+    except Exception as e:
+        logger.error(f"Error preparing frame results: {str(e)}")
+        errors.append(e)
+    finally:
+        _put(prepared_queue, _END, stop_event)
+
+def start_frame_pipeline(start_frame, end_frame, batch_size=DEFAULT_BATCH_SIZE, queue_depth=DEFAULT_QUEUE_DEPTH,
+                         movie_path=None, frame_offset=0, temporal_threshold=None, optical_flow=False,
+                         validate_every=0, prepare_result=None, prepare_workers=DEFAULT_PREPARE_WORKERS):
+    """
+    Start the decode and inference threads for a frame range.
+
+    Frames are decoded straight from the movie file on a reader thread, inferred in batches
+    on a second thread, and handed back through a bounded queue so the caller can write
+    strokes on Blender's main thread while the next frames are still being processed.
+
+    :param start_frame: First scene frame to process
+    :param end_frame: Last scene frame to process
+    :param batch_size: Number of frames per forward pass
+    :param queue_depth: Maximum number of frames buffered between stages
+    :param movie_path: Movie file to decode; defaults to the first loaded movie
+    :param frame_offset: Offset from scene frames to movie frames, see frame_extraction.get_movie_source
+    :param temporal_threshold: Reuse the last keyframe's detection for frames that differ less than this;
+                               None disables temporal skipping
+    :param optical_flow: Move reused detections with sparse optical flow
+    :param validate_every: Fully infer every n-th reused frame to measure the reuse error; 0 disables
+    :param prepare_result: Optional callable (frame_number, frame_bgr, detections) run on a third thread;
+                           its return value is what iter_frame_results yields. It must not touch bpy.
+    :param prepare_workers: Number of frames prepare_result may work on at once
+    :return: Pipeline dictionary for iter_frame_results / stop_frame_pipeline
+    """
+    movie_path = movie_path or get_movie_path()
+    if movie_path is None:
+        raise ValueError("No movie loaded")
+    # Progress is measured against the frames that will be decoded, not the requested range
+    start_frame, end_frame = movie_frame_range(movie_path, start_frame, end_frame, frame_offset)
+
+    pipeline = {
+        'frames': queue.Queue(maxsize=queue_depth),
+        'results': queue.Queue(maxsize=queue_depth),
+        'stop': threading.Event(),
+        'errors': [],
+        'total': max(0, end_frame - start_frame + 1),
+        'temporal': None,
+    }
+    if temporal_threshold is not None:
+        pipeline['temporal'] = new_temporal_state(temporal_threshold, optical_flow, validate_every)
+    # Without a prepare stage the inference thread feeds the results queue directly
+    inferred = queue.Queue(maxsize=queue_depth) if prepare_result is not None else pipeline['results']
+    pipeline['threads'] = [
+        threading.Thread(
+            target=_read_frames, name="Edge2GP-decode", daemon=True,
+            args=(movie_path, start_frame, end_frame, frame_offset,
+                  pipeline['frames'], pipeline['stop'], pipeline['errors'])),
+        threading.Thread(
+            target=_infer_batches, name="Edge2GP-infer", daemon=True,
+            args=(pipeline['frames'], inferred, batch_size, pipeline['stop'], pipeline['errors'],
+                  pipeline['temporal'])),
+    ]
+    if prepare_result is not None:
+        pipeline['threads'].append(threading.Thread(
+            target=_prepare_results, name="Edge2GP-prepare", daemon=True,
+            args=(inferred, pipeline['results'], prepare_result, pipeline['stop'], pipeline['errors'],
+                  prepare_workers)))
+    # Tracing a whole range may use worker processes, which a single frame does not pay back
+    pipeline['frame_range'] = prepare_result is not None and end_frame > start_frame
+    if pipeline['frame_range']:
+        begin_frame_range()
+    for thread in pipeline['threads']:
+        thread.start()
+    logger.info(f"Started frame pipeline for frames {start_frame}-{end_frame} "
+                f"(batch size {batch_size}, queue depth {queue_depth})")
+    return pipeline
+
+def _infer_frame(frame_number, frame_pixels, channel_order, result_queue, stop_event, errors):
+    """
+    Run YOLO on a single frame that is already in memory.
+    """
+    try:
+        # Results carry BGR frames, like the ones decoded from the movie
+        frame_pixels = preprocess_frame(frame_pixels, channel_order)
+        detections = run_yolo_detection_batch([frame_pixels], channel_order='BGR')
+        if detections is None:
+            raise RuntimeError(f"YOLO detection failed for frame {frame_number}")
+        _put(result_queue, (frame_number, frame_pixels, detections[0]), stop_event)
+    except Exception as e:
+        logger.error(f"Error during inference: {str(e)}")
+        errors.append(e)
+    finally:
+        _put(result_queue, _END, stop_event)
+
+def start_array_pipeline(frame_number, frame_pixels, channel_order='RGB', prepare_result=None):
+    """
+    Start inference on a frame that was already read into memory, e.g. a camera background image.
+
+    Returns the same pipeline dictionary as start_frame_pipeline, with one frame in total.
+
+    :param frame_number: Scene frame the strokes are written to
+    :param frame_pixels: NumPy array (height, width, 3 or 4); must not be modified until the pipeline ends
+    :param channel_order: 'RGB' for Blender pixels, 'BGR' for frames decoded by OpenCV
+    :param prepare_result: See start_frame_pipeline
+    """
+    pipeline = {
+        'results': queue.Queue(maxsize=1),
+        'stop': threading.Event(),
+        'errors': [],
+        'total': 1,
+        'temporal': None,
+    }
+    inferred = queue.Queue(maxsize=1) if prepare_result is not None else pipeline['results']
+    pipeline['threads'] = [threading.Thread(
+        target=_infer_frame, name="Edge2GP-infer", daemon=True,
+        args=(frame_number, frame_pixels, channel_order, inferred, pipeline['stop'], pipeline['errors']))]
+    if prepare_result is not None:
+        pipeline['threads'].append(threading.Thread(
+            target=_prepare_results, name="Edge2GP-prepare", daemon=True,
+            args=(inferred, pipeline['results'], prepare_result, pipeline['stop'], pipeline['errors'])))
+    for thread in pipeline['threads']:
+        thread.start()
+    return pipeline
+
+def iter_frame_results(pipeline, timeout=None):
+    """
+    Yield (frame_number, frame_bgr, detections) as results arrive.
+
+    With a timeout, yields None whenever no result arrived in time, so callers can poll.
+    Raises the first error any stage hit.
+    """
+    while True:
+        try:
+            item = pipeline['results'].get(timeout=timeout)
+        except queue.Empty:
+            yield None
+            continue
+        if item is _END:
+            break
+        yield item
+    if pipeline['errors']:
+        raise pipeline['errors'][0]
+
+def stop_frame_pipeline(pipeline):
+    """
+    Ask all stages to stop and wait for their threads to exit.
+    """
+    pipeline['stop'].set()
+    for thread in pipeline['threads']:
+        thread.join()
+    if pipeline.pop('frame_range', False):
+        end_frame_range()
+
+def get_pipeline_stats(pipeline, processed):
+    return {
+        'frames': processed,
+        'temporal': get_temporal_stats(pipeline['temporal']) if pipeline['temporal'] is not None else None,
+    }
+
+def run_frame_range(process_result, start_frame, end_frame, batch_size=DEFAULT_BATCH_SIZE,
+                    queue_depth=DEFAULT_QUEUE_DEPTH, movie_path=None, frame_offset=0, temporal_threshold=None,
+                    optical_flow=False, validate_every=0, prepare_result=None,
+                    prepare_workers=DEFAULT_PREPARE_WORKERS):
+    """
+    Process a frame range, calling process_result on the calling (main) thread for every frame.
+
+    :param process_result: Callable (frame_number, frame_bgr, detections), or called with the items of
+                           prepare_result's tuple when one is given
+    :param prepare_result: See start_frame_pipeline
+    :return: Dictionary with the number of frames processed and temporal skip statistics
+    """
+    pipeline = start_frame_pipeline(start_frame, end_frame, batch_size, queue_depth, movie_path, frame_offset,
+                                    temporal_threshold, optical_flow, validate_every, prepare_result,
+                                    prepare_workers)
+    processed = 0
+    try:
+        for item in iter_frame_results(pipeline):
+            process_result(*item)
+            processed += 1
+    finally:
+        stop_frame_pipeline(pipeline)
+    return get_pipeline_stats(pipeline, processed)
+
+if __name__ == "__main__":
+    logger.debug("Frame pipeline module loaded")
@@ -0,0 +1,412 @@
+import os
+import sys
+import json
+import importlib
+import time
+import logging
+import numpy as np
+
+# Setup logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('torch', 'onnxruntime', 'openvino')
+# Dtypes eager PyTorch runs in; INT8 is only available as a quantized ONNX export
+TORCH_DTYPES = ('float32', 'float16')
+BACKEND_LIBRARIES = {'torch': 'torch', 'onnxruntime': 'onnxruntime', 'openvino': 'openvino'}
+ONNX_OPSET = 12
+# Frames used to calibrate the INT8 activation ranges
+CALIBRATION_FRAMES = 8
+
+# CPU threads per model; None leaves every library at its default of one thread per core
+_config = {'threads': None}
+
+def configure_threads(threads=None):
+    """
+    Limit the CPU threads inference uses, e.g. when several Blender processes share one machine.
+
+    Applies to models loaded afterwards, and to PyTorch and OpenCV right away.
+    """
+    _config['threads'] = threads
+    if not threads:
+        return
+    if 'torch' in sys.modules:
+        sys.modules['torch'].set_num_threads(threads)
+    try:
+        import cv2
+        cv2.setNumThreads(threads)
+    except ImportError:
+        pass
+
+# Every backend model is called with a float32 NumPy batch (N, 3, H, W) in 0..1 and returns
+# (predictions (N, 4 + classes + coefficients, anchors), [protos (N, coefficients, ph, pw)]),
+# which is what yolo_detection.decode_yolo_output reads.
+
+class TorchBackend:
+    """
+    Eager PyTorch model.
+    """
+    name = 'torch'
+
+    def __init__(self, module, device='cpu', dtype='float32'):
+        import torch
+        if _config['threads']:
+            torch.set_num_threads(_config['threads'])
+        self.module = module
+        self.device = device
+        self.dtype = getattr(torch, dtype)
+        self.names = getattr(module, 'names', None)
+
+    def __call__(self, batch):
+        import torch
+        with torch.no_grad():
+            output = self.module(torch.from_numpy(batch).to(device=self.device, dtype=self.dtype))
+        predictions, extra = output if isinstance(output, (list, tuple)) else (output, None)
+        protos = extra[-1] if isinstance(extra, (list, tuple)) else extra
+        outputs = [predictions.detach().cpu().float().numpy()]
+        if protos is not None:
+            outputs.append([protos.detach().cpu().float().numpy()])
+        return tuple(outputs)
+
+class OnnxRuntimeBackend:
+    """
+    ONNX Runtime CPU session of an exported model.
+    """
+    name = 'onnxruntime'
+
+    def __init__(self, onnx_path, threads=None):
+        import onnxruntime
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(onnx_path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        self.names = _read_names(self.session.get_modelmeta().custom_metadata_map)
+
+    def __call__(self, batch):
+        outputs = self.session.run(None, {self.input_name: np.ascontiguousarray(batch, dtype=np.float32)})
+        return (outputs[0], outputs[1:]) if len(outputs) > 1 else (outputs[0],)
+
+class OpenVINOBackend:
+    """
+    OpenVINO CPU compilation of an exported model.
+    """
+    name = 'openvino'
+
+    def __init__(self, onnx_path, threads=None):
+        import openvino
+        core = openvino.Core()
+        config = {'INFERENCE_NUM_THREADS': threads} if threads else {}
+        self.compiled = core.compile_model(core.read_model(onnx_path), 'CPU', config)
+        self.request = self.compiled.create_infer_request()
+        with open(_names_path(onnx_path)) as f:
+            self.names = _read_names(json.load(f))
+
+    def __call__(self, batch):
+        results = self.request.infer({0: np.ascontiguousarray(batch, dtype=np.float32)})
+        outputs = [results[output] for output in self.compiled.outputs]
+        return (outputs[0], outputs[1:]) if len(outputs) > 1 else (outputs[0],)
+
+def _read_names(metadata):
+    if 'names' not in metadata:
+        return None
+    return {int(class_id): name for class_id, name in json.loads(metadata['names']).items()}
+
+def _names_path(onnx_path):
+    return os.path.splitext(onnx_path)[0] + '.names.json'
+
+def preload_backend_library(backend):
+    """
+    Import the library behind a backend ahead of the first model load; raises ImportError if it is missing.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {backend}")
+    importlib.import_module(BACKEND_LIBRARIES[backend])
+
+def export_path(weights_path, input_size, precision='float32'):
+    """
+    Return where the ONNX export of a checkpoint is cached, next to the weights.
+    """
+    stem = os.path.splitext(weights_path)[0]
+    suffix = '.int8' if precision == 'int8' else ''
+    return f"{stem}.{input_size}{suffix}.onnx"
+
+def _is_fresh(path, weights_path):
+    return os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(weights_path)
+
+def _load_torch_module(weights_path):
+    import torch
+    # Ultralytics checkpoints pickle the whole nn.Module, so weights_only must be off
+    checkpoint = torch.load(weights_path, map_location='cpu', weights_only=False)
+    if isinstance(checkpoint, dict):
+        return checkpoint.get('ema') or checkpoint['model']
+    return checkpoint
+
+def export_onnx(weights_path, input_size=640, force=False):
+    """
+    Export a YOLOv8-seg checkpoint to ONNX once and cache it next to the weights.
+
+    The export has a dynamic batch axis and a fixed square input of input_size.
+    Class names are stored in the model metadata and in a side-car JSON file.
+
+    :param weights_path: Path to the .pt checkpoint
+    :param input_size: Square model input size
+    :param force: Export again even if a cached export is newer than the weights
+    :return: Path of the ONNX file
+    """
+    onnx_path = export_path(weights_path, input_size)
+    if not force and _is_fresh(onnx_path, weights_path):
+        return onnx_path
+
+    import torch
+    import onnx
+
+    module = _load_torch_module(weights_path).float().eval()
+    names = getattr(module, 'names', None) or {}
+
+    class SegmentationExport(torch.nn.Module):
+        # Flatten the head output to exactly (predictions, protos)
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, images):
+            predictions, extra = self.model(images)
+            return predictions, extra[-1] if isinstance(extra, (list, tuple)) else extra
+
+    logger.info(f"Exporting {weights_path} to ONNX ({input_size}x{input_size})")
+    start = time.perf_counter()
+    dummy = torch.zeros((1, 3, input_size, input_size))
+    torch.onnx.export(
+        SegmentationExport(module), dummy, onnx_path,
+        opset_version=ONNX_OPSET,
+        input_names=['images'],
+        output_names=['predictions', 'protos'],
+        dynamic_axes={'images': {0: 'batch'}, 'predictions': {0: 'batch'}, 'protos': {0: 'batch'}},
+    )
+
+    names_json = json.dumps({str(class_id): name for class_id, name in dict(names).items()})
+    model = onnx.load(onnx_path)
+    model.metadata_props.add(key='names', value=names_json)
+    onnx.save(model, onnx_path)
+    with open(_names_path(onnx_path), 'w') as f:
+        json.dump({'names': names_json}, f)
+    logger.info(f"ONNX export written to {onnx_path} in {time.perf_counter() - start:.1f}s")
+    return onnx_path
+
+def quantize_int8(weights_path, calibration_frames, input_size=640, channel_order='RGB'):
+    """
+    Statically quantize the ONNX export to INT8, calibrating activations on a few real frames.
+
+    :param weights_path: Path to the .pt checkpoint
+    :param calibration_frames: Sequence of NumPy frames (height, width, 3 or 4)
+    :param input_size: Square model input size
+    :param channel_order: 'RGB' for Blender pixels, 'BGR' for frames decoded by OpenCV
+    :return: Path of the INT8 ONNX file
+    """
+    from onnxruntime.quantization import (
+        CalibrationDataReader, QuantFormat, QuantType, quantize_static, quant_pre_process
+    )
+    from yolo_detection import preprocess_frame, letterbox, frames_to_tensor
+
+    if not calibration_frames:
+        raise ValueError("INT8 quantization needs at least one calibration frame")
+
+    onnx_path = export_onnx(weights_path, input_size)
+    int8_path = export_path(weights_path, input_size, 'int8')
+    batches = [
+        frames_to_tensor([letterbox(preprocess_frame(frame, channel_order), input_size)[0]])
+        for frame in calibration_frames
+    ]
+
+    class FrameReader(CalibrationDataReader):
+        def __init__(self):
+            self.batches = iter(batches)
+
+        def get_next(self):
+            batch = next(self.batches, None)
+            return None if batch is None else {'images': batch}
+
+    logger.info(f"Quantizing {onnx_path} to INT8 on {len(batches)} calibration frame(s)")
+    start = time.perf_counter()
+    prepared_path = os.path.splitext(int8_path)[0] + '.prep.onnx'
+    quant_pre_process(onnx_path, prepared_path)
+    try:
+        quantize_static(
+            prepared_path, int8_path, FrameReader(),
+            quant_format=QuantFormat.QDQ,
+            per_channel=True,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+        )
+    finally:
+        os.remove(prepared_path)
+
+    import onnx
+    metadata = onnx.load(onnx_path, load_external_data=False).metadata_props
+    model = onnx.load(int8_path)
+    for prop in metadata:
+        model.metadata_props.add(key=prop.key, value=prop.value)
+    onnx.save(model, int8_path)
+    with open(_names_path(onnx_path)) as src, open(_names_path(int8_path), 'w') as dst:
+        dst.write(src.read())
+    logger.info(f"INT8 model written to {int8_path} in {time.perf_counter() - start:.1f}s")
+    return int8_path
+
+def load_backend(weights_path, backend='torch', device='cpu', dtype='float32', input_size=640):
+    """
+    Load a model for the given backend.
+
+    :param weights_path: Path to the .pt checkpoint
+    :param backend: One of BACKENDS
+    :param device: Torch device string (torch backend only)
+    :param dtype: 'float32' or 'float16' for torch; 'float32' or 'int8' for the exported backends
+    :param input_size: Square input the exported backends are built for
+    :return: Backend model callable on a float32 NumPy batch
+    """
+    if backend == 'torch':
+        if dtype not in TORCH_DTYPES:
+            logger.warning(f"{dtype} is not available with the torch backend, loading float32 instead")
+            dtype = 'float32'
+        module = _load_torch_module(weights_path)
+        import torch
+        module = module.to(device=device, dtype=getattr(torch, dtype))
+        module.eval()
+        return TorchBackend(module, device, dtype)
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {backend}")
+    if dtype == 'int8':
+        onnx_path = export_path(weights_path, input_size, 'int8')
+        if not _is_fresh(onnx_path, weights_path):
+            raise FileNotFoundError(f"No INT8 model at {onnx_path}; calibrate one with quantize_int8 first")
+    else:
+        onnx_path = export_onnx(weights_path, input_size)
+
+    if backend == 'onnxruntime':
+        return OnnxRuntimeBackend(onnx_path, _config['threads'])
+    return OpenVINOBackend(onnx_path, _config['threads'])
+
+def sample_movie_frames(movie_path, count=CALIBRATION_FRAMES):
+    """
+    Decode count frames spread evenly over a movie, e.g. for INT8 calibration.
+
+    :return: List of BGR uint8 frames
+    """
+    import cv2
+    capture = cv2.VideoCapture(movie_path)
+    try:
+        total = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        frames = []
+        for position in np.linspace(0, max(total - 1, 0), count).astype(int):
+            capture.set(cv2.CAP_PROP_POS_FRAMES, int(position))
+            ok, frame = capture.read()
+            if ok:
+                frames.append(frame)
+        return frames
+    finally:
+        capture.release()
+
+def _rss_bytes():
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss
+
+def _mask_iou(mask_a, mask_b):
+    union = np.count_nonzero(mask_a | mask_b)
+    return 1.0 if union == 0 else np.count_nonzero(mask_a & mask_b) / union
+
+def compare_backends(weights_path, frames, configurations, input_size=640, channel_order='BGR', repeats=3):
+    """
+    Compare latency, memory and segmentation mask IoU of backends against the PyTorch baseline.
+
+    :param weights_path: Path to the .pt checkpoint
+    :param frames: Sequence of NumPy frames to run
+    :param configurations: Sequence of (backend, dtype); the first entry is the baseline
+    :param input_size: Square model input size
+    :param channel_order: Channel order of frames
+    :param repeats: Timed passes over the frames per backend
+    :return: List of report dictionaries, one per configuration
+    """
+    from yolo_detection import preprocess_frame, letterbox, frames_to_tensor, decode_yolo_output
+    from yolo_segmentation import segmentation_from_detections
+
+    views = [letterbox(preprocess_frame(frame, channel_order), input_size) for frame in frames]
+    shapes = [frame.shape[:2] for frame in frames]
+    baseline_masks = None
+    report = []
+    for backend, dtype in configurations:
+        rss_before = _rss_bytes()
+        start = time.perf_counter()
+        model = load_backend(weights_path, backend, 'cpu', dtype, input_size)
+        load_time = time.perf_counter() - start
+
+        masks = []
+        latencies = []
+        for repeat in range(repeats + 1):
+            for (image, (scale, pad_x, pad_y)), shape in zip(views, shapes):
+                start = time.perf_counter()
+                output = model(frames_to_tensor([image]))
+                elapsed = time.perf_counter() - start
+                # The first pass is warm-up and only used for the masks
+                if repeat == 0:
+                    detections = decode_yolo_output(output, shape, names=model.names,
+                                                    transform=(scale, float(pad_x), float(pad_y)))
+                    masks.append(segmentation_from_detections(detections)[0] > 0)
+                else:
+                    latencies.append(elapsed)
+        rss_after = _rss_bytes()
+
+        if baseline_masks is None:
+            baseline_masks = masks
+        entry = {
+            'backend': backend,
+            'dtype': dtype,
+            'load_time': load_time,
+            'latency_ms': float(np.mean(latencies) * 1000),
+            'latency_p95_ms': float(np.percentile(latencies, 95) * 1000),
+            'memory_mb': (rss_after - rss_before) / 2 ** 20 if rss_before is not None else None,
+            'mask_iou': float(np.mean([_mask_iou(a, b) for a, b in zip(masks, baseline_masks)])),
+        }
+        report.append(entry)
+        logger.info(f"{backend} ({dtype}): {entry['latency_ms']:.1f} ms/frame, "
+                    f"IoU {entry['mask_iou']:.3f} vs {configurations[0][0]}")
+        del model
+    return report
+
+if __name__ == "__main__":
+    import argparse
+    from model_registry import MODEL_PATH
+
+    parser = argparse.ArgumentParser(description="Compare Edge2GP inference backends on frames of a movie")
+    parser.add_argument('movie')
+    parser.add_argument('--weights', default=MODEL_PATH)
+    parser.add_argument('--input-size', type=int, default=640)
+    parser.add_argument('--frames', type=int, default=CALIBRATION_FRAMES)
+    parser.add_argument('--int8', action='store_true', help="Calibrate and include the INT8 ONNX Runtime model")
+    parser.add_argument('--openvino', action='store_true', help="Include OpenVINO")
+    parser.add_argument('--output', default=None, help="Write the report as JSON to this path")
+    args = parser.parse_args()
+
+    movie_frames = sample_movie_frames(args.movie, args.frames)
+    configurations = [('torch', 'float32'), ('onnxruntime', 'float32')]
+    if args.openvino:
+        configurations.append(('openvino', 'float32'))
+    if args.int8:
+        quantize_int8(args.weights, movie_frames, args.input_size, channel_order='BGR')
+        configurations.append(('onnxruntime', 'int8'))
+        if args.openvino:
+            configurations.append(('openvino', 'int8'))
+
+    results = compare_backends(args.weights, movie_frames, configurations, args.input_size)
+    print(f"{'backend':<12} {'dtype':<8} {'ms/frame':>9} {'p95':>9} {'memory MB':>10} {'mask IoU':>9}")
+    for entry in results:
+        memory = f"{entry['memory_mb']:.0f}" if entry['memory_mb'] is not None else '-'
+        print(f"{entry['backend']:<12} {entry['dtype']:<8} {entry['latency_ms']:>9.1f} "
+              f"{entry['latency_p95_ms']:>9.1f} {memory:>10} {entry['mask_iou']:>9.3f}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,387 @@
+import os
+import sys
+import time
+import secrets
+import logging
+import argparse
+import tempfile
+import threading
+import subprocess
+import numpy as np
+from multiprocessing import shared_memory
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+# Setup logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+WORKER_HOST = '127.0.0.1'
+STARTUP_TIMEOUT = 120.0
+
+# Settings live in the environment so they survive importlib.reload of the add-on modules
+ENABLE_ENV = 'EDGE2GP_INFERENCE_WORKER'
+AUTHKEY_ENV = 'EDGE2GP_WORKER_AUTHKEY'
+PORT_ENV = 'EDGE2GP_WORKER_PORT'
+PYTHON_ENV = 'EDGE2GP_WORKER_PYTHON'
+IN_WORKER_ENV = 'EDGE2GP_IN_WORKER'
+
+_connection = None
+_connection_lock = threading.Lock()
+
+def _authkey():
+    if AUTHKEY_ENV not in os.environ:
+        os.environ[AUTHKEY_ENV] = secrets.token_hex(16)
+    return os.environ[AUTHKEY_ENV].encode()
+
+def _address():
+    # Each Blender process starts its own worker on a free port, see _start_worker_process
+    return (WORKER_HOST, int(os.environ[PORT_ENV]))
+
+def is_worker_enabled():
+    """
+    Return True when detection should be routed to the inference worker process.
+    """
+    return os.environ.get(ENABLE_ENV) == '1' and os.environ.get(IN_WORKER_ENV) != '1'
+
+def enable_worker(enabled=True):
+    os.environ[ENABLE_ENV] = '1' if enabled else '0'
+
+def _pack_arrays(arrays):
+    """
+    Copy arrays back to back into a new shared memory block.
+
+    :param arrays: Dictionary of name to NumPy array
+    :return: Tuple of (SharedMemory or None, dictionary of name to (offset, shape, dtype))
+    """
+    layout = {}
+    size = 0
+    for name, array in arrays.items():
+        layout[name] = (size, array.shape, array.dtype.str)
+        size += array.nbytes
+    if size == 0:
+        return None, layout
+
+    block = shared_memory.SharedMemory(create=True, size=size)
+    for name, array in arrays.items():
+        offset, shape, dtype = layout[name]
+        np.ndarray(shape, dtype=dtype, buffer=block.buf, offset=offset)[...] = array
+    return block, layout
+
+def _pack_frames(frames):
+    """
+    Write same-sized frames straight into a new shared memory block as one (frames, ...) array.
+
+    :return: Tuple of (SharedMemory, layout) as returned by _pack_arrays
+    """
+    shape = (len(frames),) + frames[0].shape
+    dtype = np.result_type(*frames)
+    block = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * dtype.itemsize, 1))
+    batch = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+    for index, frame in enumerate(frames):
+        batch[index] = frame
+    # Views into the block must be gone before it can be closed
+    del batch
+    return block, {'frames': (0, shape, dtype.str)}
+
+def _view_arrays(block, layout):
+    return {
+        name: np.ndarray(shape, dtype=dtype, buffer=block.buf if block is not None else b'', offset=offset)
+        for name, (offset, shape, dtype) in layout.items()
+    }
+
+# Client side
+
+def _start_worker_process():
+    """
+    Start a worker listening on a free port and wait until it reports that port.
+
+    :return: The worker's port
+    """
+    python = os.environ.get(PYTHON_ENV, sys.executable)
+    port_file = os.path.join(tempfile.gettempdir(), f"edge2gp_worker_{os.getpid()}_{secrets.token_hex(4)}.port")
+    command = [python, os.path.abspath(__file__), '--port', '0', '--port-file', port_file,
+               '--parent-pid', str(os.getpid())]
+    logger.info(f"Starting inference worker: {' '.join(command)}")
+    # The worker inherits the authkey through the environment
+    process = subprocess.Popen(command, env=dict(os.environ, **{AUTHKEY_ENV: _authkey().decode()}),
+                               cwd=os.path.dirname(os.path.abspath(__file__)))
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    try:
+        while time.monotonic() < deadline:
+            if os.path.exists(port_file):
+                with open(port_file) as file:
+                    return int(file.read())
+            if process.poll() is not None:
+                raise RuntimeError(f"Inference worker exited during startup with code {process.returncode}")
+            time.sleep(0.25)
+    finally:
+        if os.path.exists(port_file):
+            os.remove(port_file)
+    raise TimeoutError(f"Inference worker did not start within {STARTUP_TIMEOUT:.0f}s")
+
+def _connect(start=True):
+    """
+    Connect to this process's worker, starting one if it is not running.
+    """
+    if PORT_ENV in os.environ:
+        try:
+            return Client(_address(), authkey=_authkey())
+        except (ConnectionRefusedError, AuthenticationError, EOFError) as e:
+            # The worker exited, and its port may since belong to another Blender's worker
+            logger.info(f"Inference worker on port {os.environ[PORT_ENV]} is gone ({type(e).__name__})")
+            del os.environ[PORT_ENV]
+    if not start:
+        return None
+
+    os.environ[PORT_ENV] = str(_start_worker_process())
+    return Client(_address(), authkey=_authkey())
+
+def _request(message, start=True):
+    global _connection
+    with _connection_lock:
+        for attempt in range(2):
+            if _connection is None:
+                _connection = _connect(start)
+                if _connection is None:
+                    return None
+            try:
+                _connection.send(message)
+                reply = _connection.recv()
+                break
+            except (EOFError, OSError):
+                # Worker restarted or the socket went stale; reconnect once
+                _connection = None
+                if attempt:
+                    raise
+    if not reply.get('ok'):
+        raise RuntimeError(f"Inference worker error: {reply.get('error')}")
+    return reply
+
+def detect_batch_in_worker(frames, confidence_threshold, iou_threshold, channel_order='RGB', options=None):
+    """
+    Run yolo_detection.run_yolo_detection_batch in the worker process.
+
+    Frames and result arrays travel through shared memory; only their layout is pickled.
+    Frames of different sizes are sent one per block.
+
+    :param options: Preprocessing options (input_size, tiled, tile_overlap) forwarded to the worker
+    """
+    if len({frame.shape for frame in frames}) > 1:
+        results = []
+        for frame in frames:
+            result = detect_batch_in_worker([frame], confidence_threshold, iou_threshold, channel_order, options)
+            if result is None:
+                return None
+            results.extend(result)
+        return results
+
+    block, layout = _pack_frames(frames)
+    try:
+        reply = _request({
+            'cmd': 'detect',
+            'frames': (block.name, layout),
+            'confidence_threshold': confidence_threshold,
+            'iou_threshold': iou_threshold,
+            'channel_order': channel_order,
+            'options': options or {},
+        })
+    finally:
+        block.close()
+        block.unlink()
+
+    if reply['results'] is None:
+        return None
+
+    result_block = shared_memory.SharedMemory(name=reply['arrays'][0]) if reply['arrays'][0] else None
+    try:
+        arrays = {name: np.array(view) for name, view in _view_arrays(result_block, reply['arrays'][1]).items()}
+    finally:
+        if result_block is not None:
+            result_block.close()
+            result_block.unlink()
+
+    results = []
+    for index, fields in enumerate(reply['results']):
+        result = dict(fields)
+        for key in reply['array_keys'][index]:
+            result[key] = arrays[f"{index}/{key}"]
+        results.append(result)
+    return results
+
+def evict_worker_model():
+    """
+    Evict all models inside a running worker.
+
+    :return: Number of models evicted, or None when no worker is running
+    """
+    reply = _request({'cmd': 'evict'}, start=False)
+    return None if reply is None else reply['count']
+
+def shutdown_worker():
+    """
+    Stop a running worker, if any.
+    """
+    global _connection
+    try:
+        _request({'cmd': 'shutdown'}, start=False)
+    except (EOFError, OSError):
+        pass
+    with _connection_lock:
+        if _connection is not None:
+            _connection.close()
+            _connection = None
+
+# Worker side
+
+def _parent_alive(pid):
+    if os.name == 'nt':
+        import ctypes
+        process = ctypes.windll.kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not process:
+            return False
+        exit_code = ctypes.c_ulong()
+        ctypes.windll.kernel32.GetExitCodeProcess(process, ctypes.byref(exit_code))
+        ctypes.windll.kernel32.CloseHandle(process)
+        return exit_code.value == 259  # STILL_ACTIVE
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _release_result_block(state):
+    # The client copies results out and unlinks the block; this only drops the worker's handle
+    if state.get('result_block') is not None:
+        state['result_block'].close()
+        try:
+            state['result_block'].unlink()
+        except FileNotFoundError:
+            pass
+        state['result_block'] = None
+
+def _handle_detect(message, state):
+    from yolo_detection import run_yolo_detection_batch
+
+    # The previous result block is no longer needed once the client sends a new request
+    _release_result_block(state)
+
+    name, layout = message['frames']
+    frame_block = shared_memory.SharedMemory(name=name)
+    try:
+        frames = _view_arrays(frame_block, layout)['frames']
+        results = run_yolo_detection_batch(list(frames), message['confidence_threshold'],
+                                           message['iou_threshold'], message['channel_order'],
+                                           **message.get('options', {}))
+        # Views into the block must be gone before it can be closed
+        del frames
+    finally:
+        frame_block.close()
+
+    if results is None:
+        return {'ok': True, 'results': None}
+
+    arrays = {}
+    fields = []
+    array_keys = []
+    for index, result in enumerate(results):
+        keys = [key for key, value in result.items() if isinstance(value, np.ndarray)]
+        arrays.update({f"{index}/{key}": result[key] for key in keys})
+        fields.append({key: value for key, value in result.items() if key not in keys})
+        array_keys.append(keys)
+
+    block, layout = _pack_arrays(arrays)
+    state['result_block'] = block
+    return {
+        'ok': True,
+        'results': fields,
+        'array_keys': array_keys,
+        'arrays': (block.name if block is not None else None, layout),
+    }
+
+def _serve_connection(connection, lock, stop_event):
+    state = {}
+    try:
+        while not stop_event.is_set():
+            try:
+                message = connection.recv()
+            except EOFError:
+                break
+            try:
+                with lock:
+                    if message['cmd'] == 'detect':
+                        reply = _handle_detect(message, state)
+                    elif message['cmd'] == 'evict':
+                        from model_registry import evict_model
+                        reply = {'ok': True, 'count': evict_model()}
+                    elif message['cmd'] == 'shutdown':
+                        stop_event.set()
+                        reply = {'ok': True}
+                    else:
+                        reply = {'ok': True}
+            except Exception as e:
+                logger.error(f"Error handling {message.get('cmd')} request: {str(e)}", exc_info=True)
+                reply = {'ok': False, 'error': str(e)}
+            connection.send(reply)
+    finally:
+        _release_result_block(state)
+        connection.close()
+
+def serve(port=0, parent_pid=None, preload=True, port_file=None):
+    """
+    Run the inference worker loop until shut down or until the parent process exits.
+
+    :param port: Port to listen on; 0 picks a free one
+    :param port_file: File the port actually listened on is written to, once connections are accepted
+    """
+    os.environ[IN_WORKER_ENV] = '1'
+    if preload:
+        from yolo_detection import load_yolo_model
+        load_yolo_model()
+
+    listener = Listener((WORKER_HOST, port), authkey=_authkey())
+    stop_event = threading.Event()
+    lock = threading.Lock()
+
+    def watch_parent():
+        while not stop_event.wait(2.0):
+            if parent_pid is not None and not _parent_alive(parent_pid):
+                logger.info("Parent process exited; stopping inference worker")
+                stop_event.set()
+        # accept() does not notice a closed listener, so wake it with a last connection
+        try:
+            Client(listener.address, authkey=_authkey()).close()
+        except OSError:
+            pass
+
+    threading.Thread(target=watch_parent, daemon=True).start()
+    port = listener.address[1]
+    if port_file is not None:
+        # Write then rename, so the client never reads a partial port
+        with open(port_file + '.tmp', 'w') as file:
+            file.write(str(port))
+        os.replace(port_file + '.tmp', port_file)
+    logger.info(f"Inference worker listening on {WORKER_HOST}:{port}")
+    while not stop_event.is_set():
+        try:
+            connection = listener.accept()
+        except OSError:
+            break
+        if stop_event.is_set():
+            connection.close()
+            break
+        # One thread per client so a stale connection from a reloaded add-on cannot block new ones
+        threading.Thread(target=_serve_connection, args=(connection, lock, stop_event), daemon=True).start()
+    listener.close()
+    logger.info("Inference worker stopped")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Edge2GP inference worker")
+    parser.add_argument('--port', type=int, default=0, help="Port to listen on; 0 picks a free one")
+    parser.add_argument('--port-file', default=None, help="Write the port listened on to this file")
+    parser.add_argument('--parent-pid', type=int, default=None)
+    parser.add_argument('--no-preload', action='store_true')
+    args = parser.parse_args()
+    serve(args.port, args.parent_pid, not args.no_preload, args.port_file)
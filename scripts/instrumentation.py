@@ -0,0 +1,189 @@
+import os
+import sys
+import json
+import time
+import logging
+import tempfile
+import threading
+import functools
+from contextlib import contextmanager
+
+# Setup logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+DEFAULT_TRACE_DIR = os.path.join(tempfile.gettempdir(), 'edge2gp_traces')
+# Spans kept per run; later ones are only counted so long sessions cannot grow without bound
+MAX_EVENTS = 200000
+
+# Spans of the current run. list.append is atomic, so pipeline threads record without a lock.
+# This module must not be importlib.reload()-ed, otherwise a running trace is lost.
+_state = {
+    'enabled': True,
+    'trace_dir': DEFAULT_TRACE_DIR,
+    'run': None,
+    'origin': time.perf_counter(),
+    'events': [],
+    'dropped': 0,
+    'last_summary': None,
+    'last_trace_path': None,
+}
+_thread_names = {}
+
+def get_peak_rss_bytes():
+    """
+    Return the process peak resident set size in bytes, or None where unsupported.
+    """
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def configure_instrumentation(enabled=None, trace_dir=None):
+    """
+    Turn span recording on or off and set where Chrome traces are written.
+    """
+    if enabled is not None:
+        _state['enabled'] = bool(enabled)
+    if trace_dir is not None:
+        _state['trace_dir'] = trace_dir
+
+def is_enabled():
+    return _state['enabled']
+
+@contextmanager
+def span(name, **counts):
+    """
+    Time a pipeline stage.
+
+    Records wall time, CPU time of the calling thread and the process peak RSS at the end.
+    Counts passed in, or added to the yielded dictionary, are summed per stage.
+
+    :param name: Stage name, e.g. 'inference'
+    :param counts: Initial counts, e.g. frames=4
+    """
+    if not _state['enabled']:
+        yield counts
+        return
+
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+    try:
+        yield counts
+    finally:
+        wall_end = time.perf_counter()
+        thread = threading.current_thread()
+        _thread_names.setdefault(thread.ident, thread.name)
+        if len(_state['events']) >= MAX_EVENTS:
+            _state['dropped'] += 1
+            return
+        _state['events'].append((
+            name, thread.ident, wall_start - _state['origin'], wall_end - wall_start,
+            time.thread_time() - cpu_start, get_peak_rss_bytes(), counts,
+        ))
+
+def traced(name):
+    """
+    Decorator that records every call of a function as a span.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def start_run(name="Edge2GP"):
+    """
+    Start collecting spans for a new run, dropping those of the previous one.
+    """
+    _state['run'] = name
+    _state['origin'] = time.perf_counter()
+    _state['events'] = []
+    _state['dropped'] = 0
+
+def summarize(events=None):
+    """
+    Aggregate spans per stage.
+
+    :return: Dictionary of stage name to calls, wall/cpu seconds, peak RSS and summed counts,
+             in order of first appearance
+    """
+    summary = {}
+    for name, _, _, wall, cpu, peak_rss, counts in _state['events'] if events is None else events:
+        stage = summary.setdefault(name, {'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'peak_rss_bytes': None,
+                                          'counts': {}})
+        stage['calls'] += 1
+        stage['wall_s'] += wall
+        stage['cpu_s'] += cpu
+        if peak_rss is not None:
+            stage['peak_rss_bytes'] = max(stage['peak_rss_bytes'] or 0, peak_rss)
+        for key, value in counts.items():
+            stage['counts'][key] = stage['counts'].get(key, 0) + value
+    return summary
+
+def to_chrome_trace(events=None):
+    """
+    Convert spans to the Chrome trace event format (chrome://tracing, Perfetto).
+    """
+    events = _state['events'] if events is None else events
+    pid = os.getpid()
+    trace = [
+        {'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': thread_name}}
+        for tid, thread_name in _thread_names.items()
+    ]
+    for name, tid, start, wall, cpu, peak_rss, counts in events:
+        args = {'cpu_ms': round(cpu * 1000, 3), **counts}
+        if peak_rss is not None:
+            args['peak_rss_mb'] = round(peak_rss / 2 ** 20, 1)
+        trace.append({
+            'name': name, 'cat': 'edge2gp', 'ph': 'X', 'pid': pid, 'tid': tid,
+            'ts': round(start * 1e6, 1), 'dur': round(wall * 1e6, 1), 'args': args,
+        })
+    return {'traceEvents': trace, 'displayTimeUnit': 'ms',
+            'otherData': {'run': _state['run'], 'dropped_spans': _state['dropped']}}
+
+def end_run(export=True):
+    """
+    Finish the current run, keep its per-stage summary and optionally write a Chrome trace.
+
+    :param export: Write the trace to the trace directory
+    :return: Per-stage summary dictionary
+    """
+    events = list(_state['events'])
+    _state['last_summary'] = summarize(events)
+    _state['last_trace_path'] = None
+    if export and _state['enabled'] and events:
+        try:
+            os.makedirs(_state['trace_dir'], exist_ok=True)
+            file_name = f"edge2gp_{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}.json"
+            path = os.path.join(_state['trace_dir'], file_name)
+            with open(path, 'w') as f:
+                json.dump(to_chrome_trace(events), f)
+            _state['last_trace_path'] = path
+            logger.info(f"Wrote trace with {len(events)} spans to {path}")
+        except OSError as e:
+            logger.error(f"Could not write trace: {str(e)}")
+    _state['run'] = None
+    return _state['last_summary']
+
+def get_last_summary():
+    return _state['last_summary']
+
+def get_last_trace_path():
+    return _state['last_trace_path']
+
+def format_summary(summary):
+    """
+    Render a per-stage summary as text lines, slowest stage first.
+    """
+    lines = []
+    for name, stage in sorted(summary.items(), key=lambda item: -item[1]['wall_s']):
+        counts = ', '.join(f"{value} {key}" for key, value in stage['counts'].items())
+        lines.append(f"{name}: {stage['wall_s'] * 1000:.1f} ms wall, {stage['cpu_s'] * 1000:.1f} ms cpu, "
+                     f"{stage['calls']}x" + (f" ({counts})" if counts else ""))
+    return lines
@@ -0,0 +1,92 @@
+import os
+import sys
+import time
+import logging
+import importlib
+import threading
+
+# Setup logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Pipeline modules the operators need. Importing them pulls in OpenCV, the stroke code and,
+# once a model is loaded, the inference library, so the add-on only imports them on first use.
+PIPELINE_MODULES = (
+    'main', 'blender_utils', 'model_registry', 'inference_worker', 'result_cache', 'yolo_detection',
+    'instrumentation', 'background_job', 'preview', 'stylization', 'yolo_edge_detection', 'polyline_pool',
+)
+
+# Seconds each module took to import the first time, including what it imported in turn.
+# This module must not be importlib.reload()-ed, otherwise the timings are lost.
+_import_times = {}
+_source_times = {}
+_preload = {'thread': None}
+
+def import_timed(name):
+    """
+    Import a module, recording how long the first import took.
+
+    A module the preload thread is still importing is already in sys.modules, but only partially
+    initialised; importlib waits on the module's import lock until it is complete.
+    """
+    loaded = name in sys.modules
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    if not loaded and name not in _import_times:
+        _import_times[name] = time.perf_counter() - start
+        _source_times[name] = _source_mtime(module)
+        logger.info(f"Imported {name} in {_import_times[name]:.2f}s")
+    return module
+
+def _source_mtime(module):
+    path = getattr(module, '__file__', None)
+    return os.path.getmtime(path) if path and os.path.exists(path) else None
+
+def reload_if_changed(module):
+    """
+    Reload a module only when its source file changed since it was imported, e.g. while developing.
+    """
+    mtime = _source_mtime(module)
+    if mtime is not None and mtime != _source_times.setdefault(module.__name__, mtime):
+        _source_times[module.__name__] = mtime
+        logger.info(f"Reloading changed module {module.__name__}")
+        return importlib.reload(module)
+    return module
+
+def get_import_times():
+    return dict(_import_times)
+
+def format_import_times():
+    """
+    :return: Text such as "main 1.84s, preview 0.01s", or None before anything was imported
+    """
+    if not _import_times:
+        return None
+    return ', '.join(f"{name} {seconds:.2f}s" for name, seconds in _import_times.items())
+
+def _preload_modules(names, backend):
+    for name in names:
+        try:
+            import_timed(name)
+        except ImportError as e:
+            logger.error(f"Error preloading {name}: {str(e)}")
+    if backend is not None:
+        try:
+            start = time.perf_counter()
+            import_timed('inference_backends').preload_backend_library(backend)
+            _import_times[backend] = time.perf_counter() - start
+        except ImportError as e:
+            logger.error(f"Error preloading the {backend} backend: {str(e)}")
+
+def start_preload(names=PIPELINE_MODULES, backend=None):
+    """
+    Import the pipeline modules, and optionally the inference library of a backend, on a background thread.
+
+    Imports hold a per-module lock, so an operator invoked meanwhile simply waits for the module it needs.
+    """
+    if _preload['thread'] is not None:
+        return _preload['thread']
+    _preload['thread'] = threading.Thread(target=_preload_modules, args=(names, backend),
+                                          name="Edge2GP-preload", daemon=True)
+    _preload['thread'].start()
+    return _preload['thread']
@@ -1,12 +1,25 @@
 import bpy
 import logging
-from frame_extraction import get_movie_frame_pixels, get_frame_info
+import numpy as np
+from frame_extraction import get_movie_frame_pixels, get_frame_info, get_movie_source
+from frame_pipeline import run_frame_range, DEFAULT_BATCH_SIZE, DEFAULT_QUEUE_DEPTH, DEFAULT_PREPARE_WORKERS
+from result_cache import is_cache_enabled, get_cache_stats
+from instrumentation import start_run, end_run, format_summary, span
+from preview import update_preview, reset_preview
+from yolo_detection import run_yolo_detection
 from yolo_edge_detection import perform_yolo_edge_detection
-from yolo_segmentation import perform_yolo_segmentation, draw_segmentation_results
-from stroke_creation import create_grease_pencil_strokes, create_grease_pencil_from_segments
+from yolo_segmentation import perform_yolo_segmentation, draw_segmentation_results, instance_polygons
+from polyline_store import PolylineStore
+from stroke_creation import (
+    create_grease_pencil_strokes,
+    create_grease_pencil_from_segments,
+    edge_polylines,
+    segment_polylines,
+    write_polyline_store,
+    restyle_polyline_frames,
+)
 from blender_utils import (
     create_image_from_numpy,
-    visualize_numpy_array,
     get_or_create_grease_pencil_object,
     focus_view_on_object
 )
@@ -14,50 +27,218 @@ from blender_utils import (
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-def edge_to_grease_pencil():
+# Statistics of the most recent frame-range run, shown in the Edge2GP panel
+last_run_stats = {}
+
+def shared_instance_polygons(detections):
+    """
+    Decode and trace a frame's instance masks once, for both the edge and the segmentation mask.
+
+    :return: Object dictionaries at the segmentation threshold, the lower of the two
+    """
+    with span('instance_polygons') as counts:
+        object_data = instance_polygons(detections)
+        counts['objects'] = len(object_data)
+    return object_data
+
+def prepare_frame_strokes(frame_number, frame_pixels, detections):
+    """
+    Derive the edge and segmentation masks from a detection result and trace both into polylines.
+
+    Only NumPy/OpenCV work happens here, so it may run on a worker thread.
+
+    :param frame_number: Scene frame the detections belong to
+    :param frame_pixels: The BGR frame the detections came from
+    :param detections: Result of yolo_detection.run_yolo_detection
+    :return: Tuple of (frame_number, frame_pixels, edge_mask, segmentation_mask, object_data, polylines)
+             for write_prepared_strokes, where polylines is a PolylineStore of both layers
+    """
+    # Both masks are drawn from the same instance polygons, decoded and traced once
+    object_data = shared_instance_polygons(detections)
+    edge_mask = perform_yolo_edge_detection(frame_pixels, detections=detections, channel_order='BGR',
+                                            object_data=object_data)
+    if edge_mask is None:
+        raise ValueError(f"Failed to perform YOLO edge detection on frame {frame_number}")
+    segmentation_mask, object_data = perform_yolo_segmentation(frame_pixels, detections=detections,
+                                                               object_data=object_data)
+    if segmentation_mask is None:
+        raise ValueError(f"Failed to perform YOLO segmentation on frame {frame_number}")
+    polylines = PolylineStore.concatenate([edge_polylines(edge_mask, engine='contours'),
+                                           segment_polylines(segmentation_mask, object_data)])
+    return frame_number, frame_pixels, edge_mask, segmentation_mask, object_data, polylines
+
+def write_prepared_strokes(gp_object, prepared):
+    """
+    Write both stroke layers of a frame prepared by prepare_frame_strokes and refresh the preview.
+    Main thread only.
+    """
+    frame_number, frame_pixels, edge_mask, segmentation_mask, object_data, polylines = prepared
+    with span('stroke_writing', strokes=len(polylines), points=polylines.num_points):
+        write_polyline_store(gp_object, polylines, frame_number)
+    update_preview(frame_number, frame_pixels, edge_mask, segmentation_mask, object_data)
+
+def write_frame_strokes(gp_object, frame_number, frame_pixels, detections):
+    """
+    Derive the edge and segmentation masks from a detection result and write both stroke layers.
+
+    :param gp_object: Grease Pencil object to write to
+    :param frame_number: Scene frame to write
+    :param frame_pixels: The BGR frame the detections came from
+    :param detections: Result of yolo_detection.run_yolo_detection
+    """
+    write_prepared_strokes(gp_object, prepare_frame_strokes(frame_number, frame_pixels, detections))
+
+def restyle_grease_pencil(frame_range=False):
+    """
+    Apply the current style settings to strokes written this session, without running detection.
+
+    :param frame_range: Restyle every kept frame instead of only the current frame
+    :return: Number of layer frames rewritten
+    """
+    gp_object = get_or_create_grease_pencil_object("Edge2GP_Result")
+    frame_numbers = None if frame_range else {bpy.context.scene.frame_current}
+    count = restyle_polyline_frames(gp_object, frame_numbers)
+    logger.info(f"Restyled {count} layer frames")
+    return count
+
+def finish_run():
+    """
+    Close the instrumentation run and log its per-stage summary.
+    """
+    summary = end_run()
+    for line in format_summary(summary):
+        logger.info(f"Stage {line}")
+
+def edge_to_grease_pencil_range(start_frame=None, end_frame=None, batch_size=DEFAULT_BATCH_SIZE,
+                                queue_depth=DEFAULT_QUEUE_DEPTH, temporal_threshold=None, optical_flow=False,
+                                validate_every=0, prepare_workers=DEFAULT_PREPARE_WORKERS):
+    """
+    Run Edge2GP on a frame range, decoding, inferring and tracing polylines in background threads.
+
+    :param start_frame: First frame; defaults to the scene start
+    :param end_frame: Last frame; defaults to the scene end
+    :param batch_size: Number of frames per forward pass
+    :param queue_depth: Maximum number of frames buffered between stages
+    :param temporal_threshold: Skip inference on frames that differ less than this from the last keyframe
+    :param optical_flow: Move reused detections with sparse optical flow
+    :param validate_every: Fully infer every n-th skipped frame to measure the reuse error
+    :param prepare_workers: Frames whose masks and polylines are prepared concurrently
+    :return: The Grease Pencil object
+    """
+    frame_info = get_frame_info()
+    start_frame = frame_info['start_frame'] if start_frame is None else start_frame
+    end_frame = frame_info['end_frame'] if end_frame is None else end_frame
+    logger.info(f"Starting Edge2GP process for frames {start_frame}-{end_frame}")
+    start_run(f"Edge2GP frames {start_frame}-{end_frame}")
+    reset_preview()
+
+    try:
+        gp_object = get_or_create_grease_pencil_object("Edge2GP_Result")
+
+        def process_result(*prepared):
+            # Runs on the main thread, so it is safe to touch bpy here; masks and polylines were
+            # prepared on the pipeline's worker threads
+            write_prepared_strokes(gp_object, prepared)
+            logger.debug(f"Wrote strokes for frame {prepared[0]}")
+
+        # Decode the movie at the frames its image user or clip shows them
+        movie_path, frame_offset = get_movie_source(bpy.context.scene)
+        stats = run_frame_range(process_result, start_frame, end_frame, batch_size, queue_depth,
+                                movie_path=movie_path, frame_offset=frame_offset,
+                                temporal_threshold=temporal_threshold, optical_flow=optical_flow,
+                                validate_every=validate_every, prepare_result=prepare_frame_strokes,
+                                prepare_workers=prepare_workers)
+        last_run_stats.clear()
+        last_run_stats.update(stats)
+        logger.info(f"Edge2GP process completed successfully for {stats['frames']} frames")
+        if stats['temporal'] is not None:
+            logger.info(f"Temporal skipping: {stats['temporal']}")
+        if is_cache_enabled():
+            logger.info(f"Result cache: {get_cache_stats()}")
+        return gp_object
+
+    except Exception as e:
+        logger.error(f"Error in Edge2GP process: {str(e)}", exc_info=True)
+        raise
+    finally:
+        finish_run()
+
+def edge_to_grease_pencil(debug_images=False, frame_range=False, batch_size=DEFAULT_BATCH_SIZE,
+                          queue_depth=DEFAULT_QUEUE_DEPTH, temporal_threshold=None, optical_flow=False,
+                          validate_every=0, frame_pixels=None, channel_order='RGB'):
+    """
+    Run Edge2GP on the current frame.
+
+    :param debug_images: Also store the edge and segmentation masks as Blender images
+    :param frame_range: Process the scene frame range instead, see edge_to_grease_pencil_range
+    :param batch_size: Frames per forward pass in frame-range mode
+    :param queue_depth: Frames buffered between stages in frame-range mode
+    :param temporal_threshold: Temporal skip threshold in frame-range mode; None disables it
+    :param optical_flow: Propagate skipped detections with optical flow in frame-range mode
+    :param validate_every: Reuse-error sampling interval in frame-range mode
+    :param frame_pixels: Current frame already read into memory, e.g. a camera background image;
+                         defaults to the current frame of the loaded movie
+    :param channel_order: Channel order of frame_pixels, 'RGB' or 'BGR'
+    :return: The Grease Pencil object
+    """
+    if frame_range:
+        return edge_to_grease_pencil_range(batch_size=batch_size, queue_depth=queue_depth,
+                                           temporal_threshold=temporal_threshold, optical_flow=optical_flow,
+                                           validate_every=validate_every)
+
     logger.info("Starting Edge2GP process")
+    start_run("Edge2GP frame")
+    reset_preview()
 
     try:
-        # Step 1: Extract frame pixels
-        frame_pixels = get_movie_frame_pixels()
+        # Step 1: Extract frame pixels unless the caller already has them
         if frame_pixels is None:
-            raise ValueError("Failed to extract frame pixels")
+            frame_pixels, readback_stats = get_movie_frame_pixels(dtype=np.uint8, return_stats=True)
+            if frame_pixels is None:
+                raise ValueError("Failed to extract frame pixels")
+            logger.debug(f"Frame readback: {readback_stats}")
+            channel_order = 'RGB'
         
         frame_info = get_frame_info()
         logger.info(f"Processing frame: {frame_info}")
-        
-        # Visualize frame pixels (optional)
-        visualize_numpy_array(frame_pixels, "Frame Pixels")
 
-        # Step 2: Perform YOLO edge detection
+        # Step 2: Run YOLO once; edge and segmentation masks are derived from this result
+        logger.debug("About to perform YOLO detection")
+        detections = run_yolo_detection(frame_pixels, channel_order=channel_order)
+        if detections is None:
+            raise ValueError("Failed to perform YOLO detection")
+
+        object_data = shared_instance_polygons(detections)
+
         logger.debug("About to perform YOLO edge detection")
-        edge_mask = perform_yolo_edge_detection(frame_pixels)
+        edge_mask = perform_yolo_edge_detection(frame_pixels, detections=detections, channel_order=channel_order,
+                                                object_data=object_data)
         if edge_mask is None:
             raise ValueError("Failed to perform YOLO edge detection")
         logger.debug("YOLO edge detection completed successfully")
-        
-        # Visualize edge mask (optional)
-        visualize_numpy_array(edge_mask, "YOLO Edge Mask")
 
         # Step 3: Perform YOLO segmentation
         logger.debug("About to perform YOLO segmentation")
-        segmentation_mask, object_data = perform_yolo_segmentation(frame_pixels)
+        segmentation_mask, object_data = perform_yolo_segmentation(frame_pixels, detections=detections,
+                                                                   object_data=object_data)
         if segmentation_mask is None:
             raise ValueError("Failed to perform YOLO segmentation")
         logger.debug("YOLO segmentation completed successfully")
-        
-        # Visualize segmentation mask (optional)
-        visualize_numpy_array(segmentation_mask, "YOLO Segmentation Mask")
 
-        # Step 4: Create Blender images from masks
-        edge_image = create_image_from_numpy(edge_mask, "YOLO_Edge_Mask")
-        seg_image = create_image_from_numpy(segmentation_mask, "YOLO_Segmentation_Mask")
+        # Refresh the preview image with the intermediate chosen in the panel (optional)
+        update_preview(frame_info['current_frame'], frame_pixels, edge_mask, segmentation_mask, object_data,
+                       channel_order)
+
+        # Step 4: Optionally keep the masks as Blender images for inspection
+        if debug_images:
+            create_image_from_numpy(edge_mask, "YOLO_Edge_Mask")
+            create_image_from_numpy(segmentation_mask, "YOLO_Segmentation_Mask")
 
         # Step 5: Create or get Grease Pencil object
         gp_object = get_or_create_grease_pencil_object("Edge2GP_Result")
 
         # Step 6: Create Grease Pencil strokes from edge detection
-        success_edge = create_grease_pencil_strokes(gp_object, edge_image)
+        success_edge = create_grease_pencil_strokes(gp_object, edge_mask, engine='contours')
         if not success_edge:
             raise ValueError("Failed to create Grease Pencil strokes from edge detection")
 
@@ -71,9 +252,13 @@ def edge_to_grease_pencil():
         # Optional: Focus view on the Grease Pencil object
         focus_view_on_object(gp_object)
 
+        return gp_object
+
     except Exception as e:
         logger.error(f"Error in Edge2GP process: {str(e)}", exc_info=True)
         raise
+    finally:
+        finish_run()
 
 if __name__ == "__main__":
     try:
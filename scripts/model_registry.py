@@ -0,0 +1,144 @@
+import os
+import sys
+import time
+import logging
+import threading
+import numpy as np
+from instrumentation import span
+
+# Setup logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Path to the YOLO model file
+MODEL_NAME = 'yolov8x-seg.pt'
+EDGE2GP_DIR = r"C:\Users\DanTh\Documents\Blender\edge2gp"  # Update this path if necessary
+MODEL_PATH = os.path.join(EDGE2GP_DIR, MODEL_NAME)
+
+# Square input used for the warm-up forward pass and by the exported backends
+WARMUP_SIZE = 640
+
+# Loaded models and their load timings, keyed by (weights path, backend, device, dtype, input size).
+# This module must not be importlib.reload()-ed, otherwise the cache is lost.
+_models = {}
+_load_stats = {}
+_lock = threading.Lock()
+
+def _model_key(weights_path, backend, device, dtype, input_size):
+    # Eager PyTorch accepts any input size, so it shares one entry across sizes
+    return (os.path.abspath(weights_path), backend, str(device), str(dtype),
+            None if backend == 'torch' else int(input_size))
+
+def _load_weights(weights_path, backend, device, dtype, input_size):
+    """
+    Load a YOLOv8 checkpoint through the requested inference backend.
+
+    :param weights_path: Path to the .pt checkpoint
+    :param backend: One of inference_backends.BACKENDS
+    :param device: Torch device string, e.g. 'cpu' or 'cuda:0'
+    :param dtype: Torch dtype name, or 'int8' for a quantized export
+    :param input_size: Square input the exported backends are built for
+    :return: Backend model callable on a float32 NumPy batch
+    """
+    from inference_backends import load_backend
+    return load_backend(weights_path, backend, device, dtype, input_size)
+
+def _warmup(model, input_size):
+    model(np.zeros((1, 3, input_size, input_size), dtype=np.float32))
+
+def get_model(weights_path=MODEL_PATH, device='cpu', dtype='float32', warmup=True, backend='torch',
+              input_size=WARMUP_SIZE):
+    """
+    Return a resident YOLO model, loading it on first use.
+
+    :param weights_path: Path to the .pt checkpoint
+    :param device: Torch device string
+    :param dtype: Torch dtype name, or 'int8' for the exported backends
+    :param warmup: Run one dummy forward pass right after loading
+    :param backend: 'torch', 'onnxruntime' or 'openvino'
+    :param input_size: Square model input size
+    :return: The cached backend model
+    """
+    key = _model_key(weights_path, backend, device, dtype, input_size)
+    model = _models.get(key)
+    if model is not None:
+        return model
+
+    with _lock:
+        model = _models.get(key)
+        if model is not None:
+            return model
+
+        logger.debug(f"Attempting to load YOLO model from: {weights_path}")
+        if not os.path.exists(weights_path):
+            logger.error(f"YOLO model not found at: {weights_path}")
+            raise FileNotFoundError(f"YOLO model not found at: {weights_path}")
+
+        logger.info(f"Loading YOLO model from: {weights_path} ({backend}, {device}, {dtype})")
+        start = time.perf_counter()
+        try:
+            with span('model_load'):
+                model = _load_weights(weights_path, backend, device, dtype, input_size)
+        except Exception as e:
+            logger.error(f"Error loading YOLO model: {str(e)}")
+            raise
+        load_time = time.perf_counter() - start
+
+        warmup_time = 0.0
+        if warmup:
+            start = time.perf_counter()
+            with span('model_warmup'):
+                _warmup(model, input_size)
+            warmup_time = time.perf_counter() - start
+
+        _models[key] = model
+        _load_stats[key] = {'load_time': load_time, 'warmup_time': warmup_time}
+        logger.info(f"YOLO model loaded in {load_time:.2f}s (warm-up {warmup_time:.2f}s)")
+        return model
+
+def evict_model(weights_path=None, device='cpu', dtype='float32', backend='torch', input_size=WARMUP_SIZE):
+    """
+    Drop a resident model so its memory can be reclaimed.
+
+    :param weights_path: Checkpoint to evict; None evicts every loaded model
+    :param device: Torch device string of the entry to evict
+    :param dtype: Dtype name of the entry to evict
+    :param backend: Backend of the entry to evict
+    :param input_size: Input size of the entry to evict
+    :return: Number of models evicted
+    """
+    with _lock:
+        if weights_path is None:
+            keys = list(_models)
+        else:
+            keys = [key for key in [_model_key(weights_path, backend, device, dtype, input_size)] if key in _models]
+        for key in keys:
+            del _models[key]
+            _load_stats.pop(key, None)
+
+    # Only touch torch if a torch model was ever loaded
+    torch = sys.modules.get('torch')
+    if keys and torch is not None and torch.cuda.is_available():
+        torch.cuda.empty_cache()
+    logger.info(f"Evicted {len(keys)} YOLO model(s)")
+    return len(keys)
+
+def reload_model(weights_path=MODEL_PATH, device='cpu', dtype='float32', warmup=True, backend='torch',
+                 input_size=WARMUP_SIZE):
+    """
+    Evict and load a model again, e.g. after the weights file changed on disk.
+    """
+    evict_model(weights_path, device, dtype, backend, input_size)
+    return get_model(weights_path, device, dtype, warmup, backend, input_size)
+
+def get_load_stats():
+    """
+    Return load and warm-up times in seconds for every resident model.
+
+    :return: Dictionary mapping (weights path, backend, device, dtype, input size) to timing dictionaries
+    """
+    return {key: dict(stats) for key, stats in _load_stats.items()}
+
+if __name__ == "__main__":
+    model = get_model()
+    print(f"Loaded model stats: {get_load_stats()}")
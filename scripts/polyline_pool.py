@@ -0,0 +1,288 @@
+import os
+import atexit
+import logging
+import threading
+import multiprocessing
+import numpy as np
+from multiprocessing import shared_memory
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from instrumentation import span
+from stroke_geometry import trace_contours, contours_to_strokes, mask_outlines
+
+# Setup logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Frames with fewer contour points are simplified in the calling thread, where dispatching would cost more
+MIN_PARALLEL_POINTS = 20000
+# Frames with fewer instance masks are traced in the calling thread
+MIN_PARALLEL_INSTANCES = 8
+# Contour ranges per worker, so ranges with uneven contours still balance out
+TASKS_PER_WORKER = 4
+
+# Pool size when none is configured; a single frame gains little from more, and Blender keeps the other cores
+DEFAULT_WORKERS = 4
+
+# Tracing (cv2.findContours) and simplification (cv2.approxPolyDP) release the GIL, so threads
+# scale for a single frame. Worker processes also take the per-contour Python work off the calling
+# process but only pay off over a frame range, so frame ranges switch to processes while they run.
+# This module must not be importlib.reload()-ed, otherwise the running pool is orphaned.
+_config = {'workers': 0, 'use_processes': False, 'range_processes': True}
+_pool = {'executor': None, 'key': None, 'ranges': 0}
+_pool_lock = threading.Lock()
+
+def configure_polyline_pool(workers=None, use_processes=None, range_processes=None):
+    """
+    :param workers: Pool size; 0 uses DEFAULT_WORKERS, or fewer on smaller machines
+    :param use_processes: Always work in worker processes (contours and masks go through shared memory)
+    :param range_processes: Simplify in worker processes while a frame range runs, see begin_frame_range
+    """
+    if workers is not None:
+        _config['workers'] = workers
+    if use_processes is not None:
+        _config['use_processes'] = use_processes
+    if range_processes is not None:
+        _config['range_processes'] = range_processes
+
+def get_worker_count():
+    return _config['workers'] or min(DEFAULT_WORKERS, os.cpu_count() or 1)
+
+def _use_processes():
+    return _config['use_processes'] or (_config['range_processes'] and _pool['ranges'] > 0)
+
+def begin_frame_range():
+    """
+    Mark the start of a frame range, which may simplify in worker processes; pair with end_frame_range.
+    """
+    with _pool_lock:
+        _pool['ranges'] += 1
+
+def end_frame_range():
+    """
+    Mark the end of a frame range; once none is left, worker processes started for ranges are stopped.
+    """
+    with _pool_lock:
+        _pool['ranges'] -= 1
+        if _pool['ranges'] == 0 and _pool['key'] is not None and _pool['key'][1] and not _config['use_processes']:
+            shutdown_pool(lock=False)
+
+def _get_executor():
+    key = (get_worker_count(), _use_processes())
+    with _pool_lock:
+        if _pool['key'] != key:
+            shutdown_pool(lock=False)
+            if key[1]:
+                # Spawned workers only import this module's dependencies, never bpy
+                _pool['executor'] = ProcessPoolExecutor(key[0], mp_context=multiprocessing.get_context('spawn'))
+            else:
+                _pool['executor'] = ThreadPoolExecutor(key[0], thread_name_prefix="Edge2GP-polylines")
+            _pool['key'] = key
+            logger.info(f"Started polyline pool with {key[0]} {'processes' if key[1] else 'threads'}")
+        return _pool['executor']
+
+def shutdown_pool(lock=True):
+    """
+    Stop the pool's workers; the next conversion starts a new pool.
+    """
+    if lock:
+        with _pool_lock:
+            return shutdown_pool(lock=False)
+    if _pool['executor'] is not None:
+        _pool['executor'].shutdown(wait=True, cancel_futures=True)
+    _pool['executor'], _pool['key'] = None, None
+
+atexit.register(shutdown_pool)
+
+def contour_ranges(point_offsets, parts):
+    """
+    Cut a sequence of contours into contiguous ranges of about equal point count.
+
+    :param point_offsets: int64 NumPy array (contours + 1,) of contour start offsets
+    :param parts: Number of ranges to aim for
+    :return: List of (first contour, last contour exclusive)
+    """
+    count = len(point_offsets) - 1
+    if count == 0:
+        return []
+    targets = point_offsets[-1] * np.arange(1, parts) / parts
+    cuts = np.searchsorted(point_offsets[1:], targets, side='right') + 1
+    bounds = np.unique(np.concatenate([[0], np.minimum(cuts, count), [count]]))
+    return list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+def simplify_contour_range(points, point_offsets, tolerance, frame_shape):
+    """
+    Convert and simplify the contours stored back to back in points.
+
+    :param points: int32 NumPy array (points, 2) of x, y pixel coordinates
+    :param point_offsets: Start offsets of the contours in points, plus the end of the last one
+    :return: Tuple of (float32 stroke-space coordinates (points, 3), int64 offsets (strokes + 1,))
+    """
+    contours = (points[start:end] for start, end in zip(point_offsets[:-1], point_offsets[1:]))
+    return contours_to_strokes(contours, frame_shape, tolerance)
+
+def _simplify_shared_contour_range(name, total_points, point_offsets, tolerance, frame_shape):
+    # Runs in a worker process; only the compact stroke arrays are sent back
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        points = np.ndarray((total_points, 2), dtype=np.int32, buffer=block.buf)
+        result = simplify_contour_range(points, point_offsets, tolerance, frame_shape)
+        # Views into the block must be gone before it can be closed
+        del points
+        return result
+    finally:
+        block.close()
+
+def _join_strokes(results):
+    lengths = np.concatenate([np.diff(offsets) for _, offsets in results])
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return np.concatenate([coords for coords, _ in results]), offsets
+
+def mask_to_contour_strokes_parallel(mask, tolerance=0.0):
+    """
+    stroke_geometry.mask_to_contour_strokes with the per-contour work fanned out over the pool.
+
+    The contours are traced here, packed back to back and simplified in ranges by the workers;
+    the strokes and their order are the same as in a serial pass.
+
+    :param mask: Boolean NumPy array (height, width)
+    :param tolerance: RDP tolerance as a fraction of the mask width; 0 disables simplification
+    :return: Tuple of (float32 coordinates (points, 3), int64 offsets (strokes + 1,))
+    """
+    contours = trace_contours(mask)
+    point_offsets = np.zeros(len(contours) + 1, dtype=np.int64)
+    np.cumsum([len(contour) for contour in contours], out=point_offsets[1:])
+    workers = get_worker_count()
+    if workers == 1 or tolerance <= 0 or point_offsets[-1] < MIN_PARALLEL_POINTS:
+        return contours_to_strokes(contours, mask.shape, tolerance)
+
+    ranges = contour_ranges(point_offsets, workers * TASKS_PER_WORKER)
+    executor = _get_executor()
+    with span('polyline_simplification', tasks=len(ranges), workers=workers, points=int(point_offsets[-1])):
+        if isinstance(executor, ThreadPoolExecutor):
+            points = np.concatenate(contours).astype(np.int32, copy=False)
+            futures = [executor.submit(simplify_contour_range, points, point_offsets[first:last + 1],
+                                       tolerance, mask.shape)
+                       for first, last in ranges]
+            return _join_strokes([future.result() for future in futures])
+
+        block = shared_memory.SharedMemory(create=True, size=int(point_offsets[-1]) * 2 * 4)
+        try:
+            points = np.ndarray((int(point_offsets[-1]), 2), dtype=np.int32, buffer=block.buf)
+            np.concatenate(contours, out=points)
+            del points
+            futures = [executor.submit(_simplify_shared_contour_range, block.name, int(point_offsets[-1]),
+                                       point_offsets[first:last + 1], tolerance, mask.shape)
+                       for first, last in ranges]
+            return _join_strokes([future.result() for future in futures])
+        finally:
+            block.close()
+            block.unlink()
+
+def _instance_ranges(count, parts):
+    bounds = np.unique(np.linspace(0, count, min(count, parts) + 1).astype(np.int64))
+    return list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+def trace_mask_range(masks, transforms, frame_shape, mask_stride=1, min_area=0.0, tolerance=0.0):
+    """
+    Trace and simplify the outlines of instance masks, holes included, and map them to source pixels.
+
+    :param masks: Boolean NumPy array (instances, mh, mw)
+    :param transforms: NumPy array (instances, 3) of (scale, offset_x, offset_y) from source pixels
+                       to the space the masks were sampled from, see yolo_segmentation.decode_instance_masks
+    :param frame_shape: (height, width) of the source frame
+    :param mask_stride: Size of a mask pixel in that space
+    :param min_area: Outlines enclosing fewer mask pixels are dropped, see stroke_geometry.mask_outlines
+    :param tolerance: Douglas-Peucker tolerance in mask pixels; 0 keeps every corner
+    :return: Tuple of (float32 source coordinates (points, 2), int64 polygon offsets (polygons + 1,),
+             int64 polygons per instance (instances,), int64 outer boundaries per instance (instances,))
+    """
+    height, width = frame_shape[:2]
+    counts = np.zeros(len(masks), dtype=np.int64)
+    outer = np.zeros(len(masks), dtype=np.int64)
+    points = np.zeros(len(masks), dtype=np.int64)
+    polygons = []
+    for index, mask in enumerate(masks):
+        outlines, outer[index] = mask_outlines(mask, min_area, tolerance)
+        counts[index] = len(outlines)
+        points[index] = sum(len(outline) for outline in outlines)
+        polygons.extend(outlines)
+
+    offsets = np.zeros(len(polygons) + 1, dtype=np.int64)
+    np.cumsum([len(polygon) for polygon in polygons], out=offsets[1:])
+    if not polygons:
+        return np.zeros((0, 2), dtype=np.float32), offsets, counts, outer
+
+    # All vertices are mapped at once, each with the transform of its instance
+    scale, offset_x, offset_y = np.repeat(np.asarray(transforms, dtype=np.float32), points, axis=0).T
+    coords = (np.concatenate(polygons).astype(np.float32) + 0.5) * mask_stride
+    coords[:, 0] = ((coords[:, 0] - offset_x) / scale).clip(0, width - 1)
+    coords[:, 1] = ((coords[:, 1] - offset_y) / scale).clip(0, height - 1)
+    return coords, offsets, counts, outer
+
+def _trace_shared_mask_range(name, shape, first, last, transforms, frame_shape, mask_stride, min_area, tolerance):
+    # Runs in a worker process; the masks are read in place and only the packed polygons are sent back
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        masks = np.ndarray(shape, dtype=np.bool_, buffer=block.buf)
+        result = trace_mask_range(masks[first:last], transforms, frame_shape, mask_stride, min_area, tolerance)
+        # Views into the block must be gone before it can be closed
+        del masks
+        return result
+    finally:
+        block.close()
+
+def _split_polygons(results):
+    polygons = []
+    for coords, offsets, counts, outer in results:
+        instance_offsets = np.concatenate([[0], np.cumsum(counts)])
+        for first, last, outer_count in zip(instance_offsets[:-1], instance_offsets[1:], outer.tolist()):
+            polygons.append(([coords[offsets[index]:offsets[index + 1]] for index in range(first, last)],
+                             outer_count))
+    return polygons
+
+def masks_to_polygons(masks, transforms, frame_shape, mask_stride=1, min_area=0.0, tolerance=0.0):
+    """
+    Trace the instance masks of a frame into source-pixel polygons, with the instances fanned out over the pool.
+
+    Every worker traces, simplifies and maps a contiguous range of instances. Worker processes read
+    the masks from shared memory and send back packed coordinates and offsets.
+
+    :param masks: Boolean NumPy array (instances, mh, mw)
+    :param transforms: NumPy array (instances, 3), see trace_mask_range
+    :param frame_shape: (height, width) of the source frame
+    :param mask_stride: Size of a mask pixel in the space the transforms map to
+    :param min_area: Outlines enclosing fewer mask pixels are dropped
+    :param tolerance: Douglas-Peucker tolerance in mask pixels; 0 keeps every corner
+    :return: List with one (list of float32 arrays (points, 2) of x, y source coordinates, number of outer
+             boundaries) per instance; outer boundaries come first, largest first, followed by the holes
+    """
+    transforms = np.asarray(transforms, dtype=np.float32)
+    workers = get_worker_count()
+    if workers == 1 or len(masks) < MIN_PARALLEL_INSTANCES:
+        return _split_polygons([trace_mask_range(masks, transforms, frame_shape, mask_stride, min_area, tolerance)])
+
+    ranges = _instance_ranges(len(masks), workers * TASKS_PER_WORKER)
+    executor = _get_executor()
+    with span('instance_tracing', tasks=len(ranges), workers=workers, instances=len(masks)):
+        if isinstance(executor, ThreadPoolExecutor):
+            futures = [executor.submit(trace_mask_range, masks[first:last], transforms[first:last], frame_shape,
+                                       mask_stride, min_area, tolerance)
+                       for first, last in ranges]
+            return _split_polygons([future.result() for future in futures])
+
+        block = shared_memory.SharedMemory(create=True, size=max(1, masks.size))
+        try:
+            shared = np.ndarray(masks.shape, dtype=np.bool_, buffer=block.buf)
+            shared[...] = masks
+            del shared
+            futures = [executor.submit(_trace_shared_mask_range, block.name, masks.shape, first, last,
+                                       transforms[first:last], frame_shape, mask_stride, min_area, tolerance)
+                       for first, last in ranges]
+            return _split_polygons([future.result() for future in futures])
+        finally:
+            block.close()
+            block.unlink()
+
+if __name__ == "__main__":
+    logger.debug("Polyline pool module loaded")
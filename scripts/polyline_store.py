@@ -0,0 +1,199 @@
+import os
+import json
+import numpy as np
+
+# Per-stroke attribute columns and their dtypes. 'layer' indexes PolylineStore.layers.
+COLUMNS = {
+    'class_id': np.int32,
+    'confidence': np.float32,
+    'layer': np.int16,
+    'width': np.float32,
+    'cyclic': np.bool_,
+}
+DEFAULTS = {'class_id': -1, 'confidence': 1.0, 'layer': 0, 'width': 10.0, 'cyclic': False}
+
+class PolylineStore:
+    """
+    Columnar container of polylines.
+
+    All points live back to back in one float32 array (points, dims); stroke i spans
+    coords[offsets[i]:offsets[i + 1]]. Per-stroke attributes are one NumPy column each,
+    so a dense frame costs a few bytes per point instead of Python lists of lists.
+    """
+
+    def __init__(self, coords, offsets, layers=("Default",), **columns):
+        self.coords = np.asarray(coords, dtype=np.float32)
+        self.offsets = np.asarray(offsets, dtype=np.int32)
+        self.layers = tuple(layers)
+        count = len(self.offsets) - 1
+        self.columns = {}
+        for name, dtype in COLUMNS.items():
+            values = columns.pop(name, DEFAULTS[name])
+            column = np.asarray(values, dtype=dtype)
+            self.columns[name] = np.full(count, column, dtype=dtype) if column.ndim == 0 else column
+        if columns:
+            raise ValueError(f"Unknown polyline columns: {', '.join(columns)}")
+        if any(len(column) != count for column in self.columns.values()):
+            raise ValueError("Every column needs one value per stroke")
+
+    @classmethod
+    def empty(cls, dims=2, layers=("Default",)):
+        return cls(np.zeros((0, dims), dtype=np.float32), np.zeros(1, dtype=np.int32), layers)
+
+    @classmethod
+    def from_polylines(cls, polylines, layers=("Default",), **columns):
+        """
+        Build a store from a list of (points, dims) arrays or nested [[x, y], ...] lists.
+        """
+        polylines = [np.asarray(points, dtype=np.float32) for points in polylines]
+        if not polylines:
+            return cls.empty(layers=layers)
+        offsets = np.zeros(len(polylines) + 1, dtype=np.int32)
+        np.cumsum([len(points) for points in polylines], out=offsets[1:])
+        return cls(np.concatenate(polylines), offsets, layers, **columns)
+
+    @classmethod
+    def concatenate(cls, stores):
+        """
+        Join stores back to back; layers are merged by name.
+        """
+        stores = list(stores)
+        if not stores:
+            return cls.empty()
+        layers = list(dict.fromkeys(name for store in stores for name in store.layers))
+        offsets = [np.zeros(1, dtype=np.int32)]
+        base = 0
+        for store in stores:
+            offsets.append(store.offsets[1:] - store.offsets[0] + base)
+            base += store.num_points
+        columns = {name: np.concatenate([store.columns[name] for store in stores]) for name in COLUMNS}
+        # Remap every store's layer indices into the merged layer list
+        columns['layer'] = np.concatenate([
+            np.array([layers.index(name) for name in store.layers], dtype=np.int16)[store.columns['layer']]
+            if len(store) else store.columns['layer']
+            for store in stores
+        ])
+        coords = np.concatenate([store.coords[store.offsets[0]:store.offsets[-1]] for store in stores])
+        return cls(coords, np.concatenate(offsets), layers, **columns)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def num_points(self):
+        return int(self.offsets[-1] - self.offsets[0])
+
+    @property
+    def dims(self):
+        return self.coords.shape[1]
+
+    @property
+    def nbytes(self):
+        return self.coords.nbytes + self.offsets.nbytes + sum(column.nbytes for column in self.columns.values())
+
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    def polyline(self, index):
+        """
+        Return the points of one stroke as a view.
+        """
+        return self.coords[self.offsets[index]:self.offsets[index + 1]]
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.polyline(index)
+
+    def __getitem__(self, selection):
+        """
+        Select strokes. A slice shares the coordinate array; index arrays and boolean masks copy.
+        """
+        if isinstance(selection, (int, np.integer)):
+            return self.polyline(selection)
+        columns = {name: column[selection] for name, column in self.columns.items()}
+        if isinstance(selection, slice):
+            start, stop, step = selection.indices(len(self))
+            if step == 1:
+                offsets = self.offsets[start:max(stop, start) + 1]
+                return PolylineStore(self.coords, offsets, self.layers, **columns)
+            selection = np.arange(start, stop, step)
+        selection = np.asarray(selection)
+        if selection.dtype == np.bool_:
+            selection = np.flatnonzero(selection)
+        starts, ends = self.offsets[selection], self.offsets[selection + 1]
+        lengths = ends - starts
+        offsets = np.zeros(len(selection) + 1, dtype=np.int32)
+        np.cumsum(lengths, out=offsets[1:])
+        # Gather every selected point with one fancy index
+        point_index = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+        return PolylineStore(self.coords[point_index], offsets, self.layers, **columns)
+
+    def compact(self):
+        """
+        Return a store whose coordinates start at 0 and hold only its own points.
+        """
+        if self.offsets[0] == 0 and len(self.coords) == self.offsets[-1]:
+            return self
+        coords = self.coords[self.offsets[0]:self.offsets[-1]]
+        return PolylineStore(coords, self.offsets - self.offsets[0], self.layers, **self.columns)
+
+    def transformed(self, scale=1.0, offset=0.0, matrix=None):
+        """
+        Apply points @ matrix.T * scale + offset to every point at once.
+
+        :param scale: Scalar or per-axis scale
+        :param offset: Scalar or per-axis offset
+        :param matrix: Optional (dims, dims) linear map applied before scale and offset
+        :return: New store with the same strokes and attributes
+        """
+        store = self.compact()
+        coords = store.coords if matrix is None else store.coords @ np.asarray(matrix, dtype=np.float32).T
+        coords = coords * np.asarray(scale, dtype=np.float32) + np.asarray(offset, dtype=np.float32)
+        return PolylineStore(coords, store.offsets, store.layers, **store.columns)
+
+    def to_stroke_space(self, width, height):
+        """
+        Map top-down x, y pixel coordinates to Grease Pencil stroke space: x / width, 1 - y / height, z = 0.
+        """
+        store = self.compact()
+        coords = np.zeros((len(store.coords), 3), dtype=np.float32)
+        coords[:, 0] = store.coords[:, 0] / width
+        coords[:, 1] = 1 - store.coords[:, 1] / height
+        return PolylineStore(coords, store.offsets, store.layers, **store.columns)
+
+    def layer_strokes(self, layer_name):
+        """
+        Return the strokes on one layer.
+        """
+        if layer_name not in self.layers:
+            return self[0:0]
+        return self[self.columns['layer'] == self.layers.index(layer_name)]
+
+    def save(self, directory):
+        """
+        Save as one .npy file per array plus a small JSON header, so load can memory-map them.
+        """
+        os.makedirs(directory, exist_ok=True)
+        store = self.compact()
+        np.save(os.path.join(directory, 'coords.npy'), store.coords)
+        np.save(os.path.join(directory, 'offsets.npy'), store.offsets)
+        for name, column in store.columns.items():
+            np.save(os.path.join(directory, f'{name}.npy'), column)
+        with open(os.path.join(directory, 'layers.json'), 'w') as f:
+            json.dump(list(store.layers), f)
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        """
+        Load a saved store; with mmap_mode the arrays are memory-mapped instead of read.
+        """
+        def load_array(name):
+            return np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode)
+        with open(os.path.join(directory, 'layers.json')) as f:
+            layers = json.load(f)
+        # The arrays already have the column dtypes, so the constructor keeps the mappings without copying
+        return cls(load_array('coords'), load_array('offsets'), layers,
+                   **{name: load_array(name) for name in COLUMNS})
+
+    def __repr__(self):
+        return f"PolylineStore({len(self)} strokes, {self.num_points} points, layers={list(self.layers)})"
@@ -0,0 +1,113 @@
+import bpy
+import cv2
+import logging
+from instrumentation import span
+from blender_utils import create_image_from_numpy, get_screen
+from yolo_detection import preprocess_frame
+from yolo_segmentation import draw_segmentation_results
+
+# Setup logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+PREVIEW_SOURCES = ('FRAME', 'EDGE_MASK', 'SEGMENTATION_MASK', 'OVERLAY')
+PREVIEW_IMAGE_NAME = "Edge2GP Preview"
+DEFAULT_MAX_SIZE = 512
+DEFAULT_INTERVAL = 10
+
+# Off in background mode, where there is nobody to look at it.
+# This module must not be importlib.reload()-ed, otherwise the settings are lost.
+_config = {
+    'enabled': not bpy.app.background,
+    'source': 'OVERLAY',
+    'max_size': DEFAULT_MAX_SIZE,
+    'interval': DEFAULT_INTERVAL,
+}
+_state = {'last_frame': None}
+
+def configure_preview(enabled=None, source=None, max_size=None, interval=None):
+    """
+    Set which intermediate the preview image shows and how often it is refreshed.
+
+    :param enabled: Update the preview at all
+    :param source: One of PREVIEW_SOURCES
+    :param max_size: Longest side of the preview image in pixels
+    :param interval: Refresh at most once per this many frames in frame-range mode
+    """
+    if source is not None and source not in PREVIEW_SOURCES:
+        raise ValueError(f"Unknown preview source: {source}")
+    for key, value in (('enabled', enabled), ('source', source), ('max_size', max_size), ('interval', interval)):
+        if value is not None:
+            _config[key] = value
+
+def get_preview_config():
+    return dict(_config)
+
+def reset_preview():
+    """
+    Forget the last previewed frame, so the first frame of the next run is always shown.
+    """
+    _state['last_frame'] = None
+
+def _downsample(array, max_size):
+    height, width = array.shape[:2]
+    scale = max_size / max(height, width)
+    if scale >= 1:
+        return array, 1.0
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return cv2.resize(array, size, interpolation=cv2.INTER_AREA), scale
+
+def build_preview(source, frame_pixels, edge_mask, segmentation_mask, object_data, channel_order='BGR',
+                  max_size=DEFAULT_MAX_SIZE):
+    """
+    Build the downsampled preview of one intermediate.
+
+    The overlay is drawn on the downsampled frame, so its cost does not grow with the plate resolution.
+
+    :return: NumPy array (height, width) or (height, width, 3) in RGB order with the top row first
+    """
+    if source == 'EDGE_MASK':
+        return _downsample(edge_mask, max_size)[0]
+    if source == 'SEGMENTATION_MASK':
+        return _downsample(segmentation_mask, max_size)[0]
+
+    frame_bgr, scale = _downsample(preprocess_frame(frame_pixels, channel_order), max_size)
+    if source == 'OVERLAY':
+        mask = cv2.resize(segmentation_mask, frame_bgr.shape[1::-1], interpolation=cv2.INTER_NEAREST)
+        scaled = [dict(obj, bbox=[value * scale for value in obj['bbox']]) for obj in object_data]
+        frame_bgr = draw_segmentation_results(frame_bgr, mask, scaled)
+    return cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
+
+def _show_preview(image):
+    # Only reuse Image Editors that are empty or already show the preview; never split areas
+    screen = get_screen()
+    if screen is None:
+        return
+    for area in screen.areas:
+        if area.type == 'IMAGE_EDITOR' and area.spaces.active.image in (None, image):
+            area.spaces.active.image = image
+            area.tag_redraw()
+            return
+
+def update_preview(frame_number, frame_pixels, edge_mask, segmentation_mask, object_data, channel_order='BGR'):
+    """
+    Refresh the preview image in place, at most once per configured interval of frames. Main thread only.
+
+    :return: The preview image, or None if it was not updated
+    """
+    if not _config['enabled']:
+        return None
+    last_frame = _state['last_frame']
+    if last_frame is not None and abs(frame_number - last_frame) < _config['interval']:
+        return None
+    _state['last_frame'] = frame_number
+
+    with span('preview'):
+        array = build_preview(_config['source'], frame_pixels, edge_mask, segmentation_mask, object_data,
+                              channel_order, _config['max_size'])
+        image = create_image_from_numpy(array, PREVIEW_IMAGE_NAME)
+        _show_preview(image)
+    return image
+
+if __name__ == "__main__":
+    logger.debug("Preview module loaded")
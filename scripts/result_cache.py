@@ -0,0 +1,203 @@
+import os
+import io
+import json
+import hashlib
+import logging
+import threading
+import numpy as np
+
+# Setup logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'edge2gp')
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+_config = {
+    'enabled': False,
+    'directory': DEFAULT_CACHE_DIR,
+    'max_bytes': DEFAULT_MAX_BYTES,
+}
+_stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+# Bytes currently on disk; None until the directory has been scanned
+_size = None
+_weights_hashes = {}
+_lock = threading.Lock()
+
+def configure_cache(enabled=None, directory=None, max_bytes=None):
+    """
+    Update the cache settings, e.g. from the add-on preferences.
+
+    :param enabled: Turn the cache on or off
+    :param directory: Directory the cache entries live in
+    :param max_bytes: Size bound; the least recently used entries are evicted beyond it
+    """
+    global _size
+    with _lock:
+        if enabled is not None:
+            _config['enabled'] = bool(enabled)
+        if directory is not None and directory != _config['directory']:
+            _config['directory'] = directory
+            _size = None
+        if max_bytes is not None:
+            _config['max_bytes'] = int(max_bytes)
+
+def is_cache_enabled():
+    return _config['enabled']
+
+def get_cache_stats():
+    return dict(_stats)
+
+def reset_cache_stats():
+    for key in _stats:
+        _stats[key] = 0
+
+def hash_weights(weights_path):
+    """
+    Return a content hash of a weights file, computed once per (path, size, mtime).
+    """
+    stat = os.stat(weights_path)
+    key = (os.path.abspath(weights_path), stat.st_size, stat.st_mtime_ns)
+    digest = _weights_hashes.get(key)
+    if digest is None:
+        hasher = hashlib.blake2b(digest_size=20)
+        with open(weights_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                hasher.update(chunk)
+        digest = hasher.hexdigest()
+        _weights_hashes[key] = digest
+    return digest
+
+def make_cache_key(frame, weights_path, params):
+    """
+    Build a cache key from the frame pixels, the model weights and the detection parameters.
+
+    :param frame: NumPy array of the frame as passed to the detector
+    :param weights_path: Path of the model weights
+    :param params: Dictionary of JSON-serializable detection parameters
+    :return: Hex digest string
+    """
+    hasher = hashlib.blake2b(digest_size=20)
+    hasher.update(f"{frame.shape}{frame.dtype.str}".encode())
+    hasher.update(np.ascontiguousarray(frame).data)
+    hasher.update(hash_weights(weights_path).encode())
+    hasher.update(json.dumps(params, sort_keys=True).encode())
+    return hasher.hexdigest()
+
+def _entry_path(key):
+    return os.path.join(_config['directory'], key[:2], key + '.npz')
+
+def _encode_fields(result):
+    arrays = {}
+    fields = {}
+    for key, value in result.items():
+        if isinstance(value, np.ndarray):
+            arrays[key] = value
+        elif key == 'names':
+            # JSON object keys are strings; keep class ids as ints
+            fields[key] = [[int(class_id), name] for class_id, name in value.items()]
+        elif isinstance(value, tuple):
+            fields[key] = {'tuple': list(value)}
+        else:
+            fields[key] = value
+    return arrays, fields
+
+def _decode_fields(arrays, fields):
+    result = dict(arrays)
+    for key, value in fields.items():
+        if key == 'names':
+            result[key] = {class_id: name for class_id, name in value}
+        elif isinstance(value, dict) and 'tuple' in value:
+            result[key] = tuple(value['tuple'])
+        else:
+            result[key] = value
+    return result
+
+def load_cached_result(key):
+    """
+    Load a cached detection result.
+
+    :param key: Key from make_cache_key
+    :return: Detection result dictionary, or None on a miss
+    """
+    path = _entry_path(key)
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            fields = json.loads(str(data['__fields__']))
+            arrays = {name: data[name] for name in data.files if name != '__fields__'}
+        # Bump the modification time so eviction sees this entry as recently used
+        os.utime(path)
+    except FileNotFoundError:
+        _stats['misses'] += 1
+        return None
+    except Exception as e:
+        logger.warning(f"Discarding unreadable cache entry {path}: {str(e)}")
+        _stats['misses'] += 1
+        return None
+    _stats['hits'] += 1
+    return _decode_fields(arrays, fields)
+
+def store_cached_result(key, result):
+    """
+    Store a detection result and evict old entries if the cache grew beyond its bound.
+    """
+    global _size
+    arrays, fields = _encode_fields(result)
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, __fields__=np.array(json.dumps(fields)), **arrays)
+
+    path = _entry_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(buffer.getbuffer())
+    os.replace(temp_path, path)
+    _stats['stores'] += 1
+
+    with _lock:
+        if _size is None:
+            _size = _scan_size()
+        else:
+            _size += buffer.getbuffer().nbytes
+        if _size > _config['max_bytes']:
+            _evict()
+
+def _iter_entries():
+    directory = _config['directory']
+    if not os.path.isdir(directory):
+        return
+    for bucket in os.scandir(directory):
+        if bucket.is_dir():
+            for entry in os.scandir(bucket.path):
+                if entry.name.endswith('.npz'):
+                    yield entry
+
+def _scan_size():
+    return sum(entry.stat().st_size for entry in _iter_entries())
+
+def _evict():
+    """
+    Delete least recently used entries until the cache is back under its bound.
+    """
+    global _size
+    entries = sorted(((entry.stat().st_mtime_ns, entry.stat().st_size, entry.path) for entry in _iter_entries()))
+    _size = sum(size for _, size, _ in entries)
+    for _, size, path in entries:
+        if _size <= _config['max_bytes']:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        _size -= size
+        _stats['evictions'] += 1
+
+def clear_cache():
+    """
+    Delete every cache entry.
+    """
+    global _size
+    with _lock:
+        for entry in list(_iter_entries()):
+            os.remove(entry.path)
+        _size = 0
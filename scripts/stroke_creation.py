@@ -1,102 +1,215 @@
 import bpy
+import zlib
 import numpy as np
 import bmesh
 from mathutils import Vector
+from instrumentation import span
+from polyline_store import PolylineStore
+from stylization import stylize_layer_frame, remember_base_strokes, get_base_strokes
+from stroke_writers import get_stroke_writer, read_frame_arrays, grease_pencil_datablocks
+from stroke_geometry import mask_to_run_strokes
+from polyline_pool import mask_to_contour_strokes_parallel
+
+def write_polyline_store(gpencil_object, store, frame_number=None):
+    """
+    Replace the given frame of every layer in a store with the store's strokes, stylized as configured
+    in the stylization module. The unstyled strokes are kept, see restyle_polyline_frames.
+
+    :param gpencil_object: The Grease Pencil object to write to
+    :param store: PolylineStore with (points, 3) stroke-space coordinates, see PolylineStore.to_stroke_space
+    :param frame_number: Scene frame to write; defaults to the current frame
+    :return: Dictionary of layer name to the written Grease Pencil frame
+    """
+    if frame_number is None:
+        frame_number = bpy.context.scene.frame_current
+
+    # Ensure we're in OBJECT mode
+    if bpy.context.mode != 'OBJECT':
+        bpy.ops.object.mode_set(mode='OBJECT')
+
+    writer = get_stroke_writer(gpencil_object)
+    gp_frames = {}
+    for layer_name in store.layers:
+        strokes = store.layer_strokes(layer_name)
+        remember_base_strokes(gpencil_object.name, layer_name, frame_number, strokes)
+        gp_frames[layer_name] = _write_layer_frame(writer, layer_name, frame_number, strokes)
+    return gp_frames
+
+def _write_layer_frame(writer, layer_name, frame_number, strokes):
+    strokes, pressure, strength = stylize_layer_frame(strokes.compact(), frame_number, layer_name)
+    return writer.write_frame(layer_name, frame_number, writer.stroke_arrays(strokes, pressure, strength))
+
+def restyle_polyline_frames(gpencil_object, frame_numbers=None):
+    """
+    Rewrite layer frames from their kept unstyled strokes with the current style settings,
+    without running detection again. Frames written in an earlier session are not kept and stay as they are.
+
+    :param gpencil_object: The Grease Pencil object to rewrite
+    :param frame_numbers: Frames to rewrite; defaults to every kept frame of the object
+    :return: Number of layer frames rewritten
+    """
+    writer = get_stroke_writer(gpencil_object)
+    base_strokes = get_base_strokes(gpencil_object.name, frame_numbers)
+    with span('restyle', frames=len(base_strokes)):
+        for (layer_name, frame_number), strokes in base_strokes.items():
+            _write_layer_frame(writer, layer_name, frame_number, strokes)
+    return len(base_strokes)
+
+STROKE_ENGINES = ('runs', 'contours')
+
+def _threshold_mask(edge_mask, threshold):
+    """
+    Binarize a NumPy mask or a Blender image.
+
+    :param edge_mask: NumPy array (height, width[, channels]) with the top row first, or Blender image;
+                      the first channel is used
+    :param threshold: Threshold in 0..1; integer masks are compared against their scaled range
+    :return: Boolean NumPy array (height, width)
+    """
+    if isinstance(edge_mask, np.ndarray):
+        values = edge_mask if edge_mask.ndim == 2 else edge_mask[:, :, 0]
+        if np.issubdtype(values.dtype, np.integer):
+            threshold = threshold * np.iinfo(values.dtype).max
+        return values > threshold
+
+    width, height = edge_mask.size
+    pixels = np.empty(width * height * 4, dtype=np.float32)
+    edge_mask.pixels.foreach_get(pixels)
+    # Blender stores rows bottom-up
+    return pixels.reshape((height, width, 4))[::-1, :, 0] > threshold
+
+def edge_polylines(edge_mask, threshold=0.5, simplify=True, simplify_factor=0.01, engine='runs'):
+    """
+    Trace an edge mask into Edge_Layer polylines. Does not touch bpy for NumPy masks,
+    so it may run on a worker thread.
+
+    :param edge_mask: NumPy array or Blender image containing the edge data
+    :param threshold: Threshold for edge detection (0.0 to 1.0)
+    :param simplify: Whether to simplify contour strokes; run strokes are simplified after writing
+    :param simplify_factor: RDP tolerance as a fraction of the frame width (lower is more detailed)
+    :param engine: 'runs' for one stroke per horizontal pixel run, or 'contours' for traced
+                   contour polylines, fanned out over the polyline pool
+    :return: PolylineStore in stroke space
+    """
+    if engine not in STROKE_ENGINES:
+        raise ValueError(f"Unknown stroke engine: {engine}")
+
+    with span('stroke_tracing'):
+        mask = _threshold_mask(edge_mask, threshold)  # Assuming edge is white on black
+        if engine == 'contours':
+            coords, offsets = mask_to_contour_strokes_parallel(mask, simplify_factor if simplify else 0.0)
+        else:
+            # One stroke per horizontal run of edge pixels
+            coords, offsets = mask_to_run_strokes(mask)
+        return PolylineStore(coords, offsets, layers=("Edge_Layer",), width=10)  # Adjust line width as needed
+
+def segment_polylines(segmentation_mask, object_data):
+    """
+    One closed Segmentation_Layer stroke per polygon of each detected object, colored by class
+    via the material slots. Pure NumPy, so it may run on a worker thread.
+
+    :param segmentation_mask: NumPy array of the segmentation mask; only its shape is used
+    :param object_data: List of dictionaries containing object information
+    :return: PolylineStore in stroke space
+    """
+    height, width = segmentation_mask.shape[:2]
+    return object_polylines(object_data, layer_name="Segmentation_Layer").to_stroke_space(width, height)
 
-def create_grease_pencil_strokes(gpencil_object, edge_image, threshold=0.5, simplify=True, simplify_factor=0.01):
+def create_grease_pencil_strokes(gpencil_object, edge_mask, threshold=0.5, simplify=True, simplify_factor=0.01,
+                                 engine='runs', frame_number=None):
     """
-    Create Grease Pencil strokes from an edge image.
+    Create Grease Pencil strokes from an edge mask.
     
     :param gpencil_object: The Grease Pencil object to add strokes to
-    :param edge_image: A Blender image containing the edge data
+    :param edge_mask: NumPy array or Blender image containing the edge data
     :param threshold: Threshold for edge detection (0.0 to 1.0)
     :param simplify: Whether to simplify the strokes
     :param simplify_factor: Factor for stroke simplification (lower is more detailed)
+    :param engine: 'runs' for one stroke per horizontal pixel run, or 'contours' for traced
+                   contour polylines simplified in NumPy without any operator calls
+    :param frame_number: Scene frame to write; defaults to the current frame
     """
     print("Creating Grease Pencil strokes")
 
-    # Ensure we're in OBJECT mode
-    bpy.ops.object.mode_set(mode='OBJECT')
-
-    # Get pixel data from the edge image
-    pixels = np.array(edge_image.pixels)
-    width, height = edge_image.size
-    pixels = pixels.reshape((height, width, 4))
-
-    # Create a new layer for our strokes
-    gp_layer = gpencil_object.data.layers.new("Edge_Layer", set_active=True)
-    gp_frame = gp_layer.frames.new(bpy.context.scene.frame_current)
-
-    # Create strokes
-    for y in range(height):
-        stroke = None
-        for x in range(width):
-            if pixels[y, x, 0] > threshold:  # Assuming edge is white on black
-                if stroke is None:
-                    stroke = gp_frame.strokes.new()
-                    stroke.display_mode = '3DSPACE'
-                    stroke.line_width = 10  # Adjust as needed
-                point = stroke.points.add(1)
-                point.co = Vector((x / width, 1 - y / height, 0))
-            elif stroke is not None:
-                stroke = None
-
-    print(f"Created {len(gp_frame.strokes)} strokes")
-
-    # Simplify strokes if requested
-    if simplify:
-        bpy.context.view_layer.objects.active = gpencil_object
-        bpy.ops.object.mode_set(mode='EDIT_GPENCIL')
-        bpy.ops.gpencil.select_all(action='SELECT')
-        bpy.ops.gpencil.stroke_simplify(factor=simplify_factor)
-        bpy.ops.object.mode_set(mode='OBJECT')
+    store = edge_polylines(edge_mask, threshold, simplify, simplify_factor, engine)
+    with span('stroke_writing', strokes=len(store), points=store.num_points):
+        write_polyline_store(gpencil_object, store, frame_number)
+
+    print(f"Created {len(store)} strokes with {store.num_points} points")
+
+    # Simplify run strokes if requested; contour strokes are already simplified
+    if simplify and engine == 'runs':
+        with span('simplification', strokes=len(store)):
+            get_stroke_writer(gpencil_object).simplify(simplify_factor)
         print("Simplified strokes")
 
     return True
 
-def create_grease_pencil_from_segments(gpencil_object, segmentation_mask, object_data):
+def create_grease_pencil_from_segments(gpencil_object, segmentation_mask, object_data, frame_number=None):
     """
     Create Grease Pencil strokes from segmentation data.
     
     :param gpencil_object: The Grease Pencil object to add strokes to
     :param segmentation_mask: NumPy array of the segmentation mask
     :param object_data: List of dictionaries containing object information
+    :param frame_number: Scene frame to write; defaults to the current frame
     """
     print("Creating Grease Pencil strokes from segmentation data")
 
-    # Ensure we're in OBJECT mode
-    bpy.ops.object.mode_set(mode='OBJECT')
+    store = segment_polylines(segmentation_mask, object_data)
+    with span('segment_stroke_writing', strokes=len(store), points=store.num_points):
+        write_polyline_store(gpencil_object, store, frame_number)
 
-    # Create a new layer for our strokes
-    gp_layer = gpencil_object.data.layers.new("Segmentation_Layer", set_active=True)
-    gp_frame = gp_layer.frames.new(bpy.context.scene.frame_current)
+    print(f"Created {len(store)} strokes from segmentation data")
 
-    height, width = segmentation_mask.shape[:2]
+    return True
 
-    # Create strokes for each detected object
-    for obj in object_data:
-        stroke = gp_frame.strokes.new()
-        stroke.display_mode = '3DSPACE'
-        stroke.line_width = 10  # Adjust as needed
+def object_polylines(object_data, layer_name="Segmentation_Layer", line_width=10):
+    """
+    Flatten the polygons of detected objects into a PolylineStore of closed strokes.
 
-        # Convert segmentation points to Grease Pencil points
-        for point in obj['segmentation']:
-            gp_point = stroke.points.add(1)
-            x, y = point
-            gp_point.co = Vector((x / width, 1 - y / height, 0))
+    :param object_data: List of object dictionaries, see yolo_segmentation.instance_polygons
+    :param layer_name: Layer the strokes belong to
+    :param line_width: Line width of the strokes
+    :return: PolylineStore in top-down pixel coordinates with class_id and confidence columns
+    """
+    polygons, class_ids, confidences = [], [], []
+    for obj in object_data:
+        # Objects without a class id fall back to a CRC32 of the class name, which unlike hash() is the same in every process
+        class_id = obj.get('class_id', zlib.crc32(obj['class'].encode()) & 0x7fffffff)
+        for polygon in obj['polygons'] if 'polygons' in obj else [obj['segmentation']]:
+            polygons.append(np.asarray(polygon, dtype=np.float32).reshape(-1, 2))
+            class_ids.append(class_id)
+            confidences.append(obj.get('confidence', 1.0))
+    return PolylineStore.from_polylines(polygons, layers=(layer_name,), class_id=class_ids,
+                                        confidence=confidences, width=line_width, cyclic=True)
+
+def read_frame_stroke_arrays(gp_frame):
+    """
+    Read every stroke of a Grease Pencil frame into flat NumPy arrays with bulk reads.
 
-        # Set stroke color based on object class (you can customize this)
-        stroke.material_index = hash(obj['class']) % len(gpencil_object.material_slots)
+    :param gp_frame: Legacy or v3 Grease Pencil frame to read
+    :return: Dictionary with 'coords' (points, 3), 'offsets' (strokes + 1,) and the per-stroke and
+             per-point attributes of the frame's data model, see stroke_writers
+    """
+    return read_frame_arrays(gp_frame)
 
-    print(f"Created {len(gp_frame.strokes)} strokes from segmentation data")
+def write_frame_stroke_arrays(gpencil_object, layer_name, frame_number, strokes):
+    """
+    Replace a layer frame with strokes read by read_frame_stroke_arrays.
 
-    return True
+    :param gpencil_object: The Grease Pencil object to write to
+    :param layer_name: Layer to write; created if missing
+    :param frame_number: Scene frame to write
+    :param strokes: Dictionary as returned by read_frame_stroke_arrays
+    """
+    return get_stroke_writer(gpencil_object).write_frame(layer_name, frame_number, strokes)
 
 if __name__ == "__main__":
     # Test the functions (this will only work when run in Blender)
     try:
         # Create a new Grease Pencil object
-        gp_data = bpy.data.grease_pencils.new("TestGP")
+        gp_data = grease_pencil_datablocks().new("TestGP")
         gp_obj = bpy.data.objects.new("TestGP", gp_data)
         bpy.context.scene.collection.objects.link(gp_obj)
 
@@ -0,0 +1,203 @@
+import cv2
+import numpy as np
+
+def find_horizontal_runs(mask):
+    """
+    Find every horizontal run of lit pixels in a mask.
+
+    :param mask: Boolean NumPy array (height, width)
+    :return: Tuple of (rows, starts, ends) arrays; ends are exclusive
+    """
+    height, width = mask.shape
+    padded = np.zeros((height, width + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    transitions = np.diff(padded, axis=1)
+
+    # np.nonzero walks row-major, so the n-th rise and the n-th fall belong to the same run
+    rows, starts = np.nonzero(transitions == 1)
+    _, ends = np.nonzero(transitions == -1)
+    return rows, starts, ends
+
+def runs_to_points(rows, starts, ends, width, height):
+    """
+    Expand runs into one flat array of stroke points in normalized coordinates.
+
+    :param rows: Row of each run
+    :param starts: First column of each run
+    :param ends: Column after the last pixel of each run
+    :param width: Mask width, used to normalize x
+    :param height: Mask height, used to normalize y
+    :return: Tuple of (float32 coordinates (points, 3), int64 offsets (runs + 1,))
+    """
+    lengths = ends - starts
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+
+    run_index = np.repeat(np.arange(len(lengths)), lengths)
+    xs = np.arange(offsets[-1]) - offsets[run_index] + starts[run_index]
+    ys = rows[run_index]
+
+    # Same arithmetic as Vector((x / width, 1 - y / height, 0)), rounded to float32 once
+    coords = np.zeros((offsets[-1], 3), dtype=np.float32)
+    coords[:, 0] = xs / width
+    coords[:, 1] = 1 - ys / height
+    return coords, offsets
+
+def mask_to_run_strokes(mask):
+    """
+    Convert a boolean mask into one stroke per horizontal run.
+
+    :param mask: Boolean NumPy array (height, width)
+    :return: Tuple of (float32 coordinates (points, 3), int64 offsets (strokes + 1,))
+    """
+    height, width = mask.shape
+    rows, starts, ends = find_horizontal_runs(mask)
+    return runs_to_points(rows, starts, ends, width, height)
+
+def simplify_polyline(points, tolerance):
+    """
+    Simplify a polyline with the Ramer-Douglas-Peucker algorithm.
+
+    :param points: NumPy array (points, 2 or 3); only x and y are used for distances
+    :param tolerance: Maximum distance a removed point may lie from the simplified line
+    :return: The kept points, in order; the first and last point are always kept
+    """
+    count = len(points)
+    if count < 3 or tolerance <= 0:
+        return points
+
+    xy = points[:, :2].astype(np.float64)
+    keep = np.zeros(count, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, count - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        origin = xy[first]
+        direction = xy[last] - origin
+        offsets = xy[first + 1:last] - origin
+        length = np.hypot(direction[0], direction[1])
+        if length == 0:
+            # Closed loop: measure from the shared end point
+            distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        else:
+            distances = np.abs(direction[0] * offsets[:, 1] - direction[1] * offsets[:, 0]) / length
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            split = first + 1 + farthest
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return points[keep]
+
+def simplify_contour(contour, tolerance):
+    """
+    Simplify a traced contour with OpenCV's Douglas-Peucker, which runs without holding the GIL,
+    so contours simplified on pool threads proceed in parallel.
+
+    A contour whose last point repeats its first is simplified as a closed loop and stays closed.
+
+    :param contour: NumPy array (points, 2) of x, y pixel coordinates
+    :param tolerance: Maximum distance in pixels a removed point may lie from the simplified line
+    :return: The kept points, in order
+    """
+    if tolerance <= 0 or len(contour) < 3:
+        return contour
+    if contour.dtype != np.int32 and contour.dtype != np.float32:
+        contour = contour.astype(np.float32)
+    if np.array_equal(contour[0], contour[-1]):
+        ring = cv2.approxPolyDP(np.ascontiguousarray(contour[:-1]), tolerance, True)[:, 0]
+        return np.concatenate([ring, ring[:1]])
+    return cv2.approxPolyDP(np.ascontiguousarray(contour), tolerance, False)[:, 0]
+
+def mask_outlines(mask, min_area=0.0, tolerance=0.0):
+    """
+    Trace the outer boundaries and the holes of a filled mask as closed polygons.
+
+    Filling all of them with one cv2.fillPoly call restores the mask, holes included.
+
+    :param mask: Boolean NumPy array (height, width)
+    :param min_area: Boundaries enclosing less area in pixels are dropped, with the holes of dropped ones
+    :param tolerance: Douglas-Peucker tolerance in pixels; 0 keeps every corner
+    :return: Tuple of (list of int32 arrays (points, 2) of x, y pixel coordinates, number of outer
+             boundaries); the outer boundaries come first, largest first, followed by the holes
+    """
+    contours, hierarchy = cv2.findContours(np.ascontiguousarray(mask).view(np.uint8), cv2.RETR_CCOMP,
+                                           cv2.CHAIN_APPROX_SIMPLE)
+    if hierarchy is None:
+        return [], 0
+
+    areas = [cv2.contourArea(contour) for contour in contours]
+    outer, holes = [], []
+    # RETR_CCOMP puts every outer boundary at the top level and the holes of each one below it
+    for index, (_, _, _, parent) in enumerate(hierarchy[0]):
+        if areas[index] < min_area or (parent != -1 and areas[parent] < min_area):
+            continue
+        contour = contours[index]
+        if tolerance > 0:
+            contour = cv2.approxPolyDP(contour, tolerance, True)
+        (outer if parent == -1 else holes).append((areas[index], contour[:, 0, :]))
+    outer.sort(key=lambda item: item[0], reverse=True)
+    return [contour for _, contour in outer + holes], len(outer)
+
+def trace_contours(mask):
+    """
+    Trace the outer boundary of every connected edge component as an ordered, closed polyline.
+
+    :param mask: Boolean NumPy array (height, width)
+    :return: List of int32 NumPy arrays (points, 2) of x, y pixel coordinates
+    """
+    contours, hierarchy = cv2.findContours(mask.astype(np.uint8), cv2.RETR_CCOMP, cv2.CHAIN_APPROX_NONE)
+    if hierarchy is None:
+        return []
+
+    polylines = []
+    # RETR_CCOMP puts every outer boundary at the top level and holes below it;
+    # holes of 1-pixel-wide edges only duplicate the outer boundary
+    for contour, (_, _, _, parent) in zip(contours, hierarchy[0]):
+        if parent != -1:
+            continue
+        contour = contour[:, 0, :]
+        polylines.append(np.concatenate([contour, contour[:1]]))
+    return polylines
+
+def mask_to_contour_strokes(mask, tolerance=0.0):
+    """
+    Convert a boolean mask into simplified contour strokes.
+
+    :param mask: Boolean NumPy array (height, width)
+    :param tolerance: RDP tolerance as a fraction of the mask width; 0 disables simplification
+    :return: Tuple of (float32 coordinates (points, 3), int64 offsets (strokes + 1,))
+    """
+    return contours_to_strokes(trace_contours(mask), mask.shape, tolerance)
+
+def contours_to_strokes(contours, frame_shape, tolerance=0.0):
+    """
+    Convert traced contours into simplified strokes.
+
+    :param contours: Iterable of NumPy arrays (points, 2) of x, y pixel coordinates, see trace_contours
+    :param frame_shape: (height, width) of the mask the contours were traced in
+    :param tolerance: RDP tolerance as a fraction of the frame width; 0 disables simplification
+    :return: Tuple of (float32 coordinates (points, 3), int64 offsets (strokes + 1,))
+    """
+    height, width = frame_shape[:2]
+    # Simplify in pixels, where x and y distances are alike; stroke space stretches non-square frames
+    pixel_tolerance = tolerance * width
+    strokes = []
+    for contour in contours:
+        contour = simplify_contour(contour, pixel_tolerance)
+        if len(contour) < 2:
+            continue
+        points = np.zeros((len(contour), 3), dtype=np.float32)
+        points[:, 0] = contour[:, 0] / width
+        points[:, 1] = 1 - contour[:, 1] / height
+        strokes.append(points)
+
+    offsets = np.zeros(len(strokes) + 1, dtype=np.int64)
+    np.cumsum([len(points) for points in strokes], out=offsets[1:])
+    if strokes:
+        coords = np.concatenate(strokes)
+    else:
+        coords = np.zeros((0, 3), dtype=np.float32)
+    return coords, offsets
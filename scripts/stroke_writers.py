@@ -0,0 +1,248 @@
+import bpy
+import numpy as np
+
+# Blender 4.3 replaced legacy GPencil strokes with Curves-based Grease Pencil drawings
+GREASE_PENCIL_V3_VERSION = (4, 3, 0)
+# Blender's own factor for converting legacy line widths (pixels) to v3 point radii
+LEGACY_RADIUS_FACTOR = 1 / 2000
+
+def uses_grease_pencil_v3():
+    return bpy.app.version >= GREASE_PENCIL_V3_VERSION
+
+def grease_pencil_datablocks():
+    """
+    :return: The bpy.data collection new Grease Pencil objects are created in for the running Blender
+    """
+    if uses_grease_pencil_v3():
+        # 4.3 and 4.4 keep legacy data in grease_pencils; later versions use the name for v3 again
+        return getattr(bpy.data, 'grease_pencils_v3', bpy.data.grease_pencils)
+    return bpy.data.grease_pencils
+
+def _material_indices(store, material_slots):
+    # Class ids map onto the material slots; strokes without a class (-1) use the first slot
+    class_ids = store.columns['class_id']
+    if not material_slots:
+        return np.zeros(len(store), dtype=np.int32)
+    return np.where(class_ids >= 0, class_ids % material_slots, 0).astype(np.int32)
+
+class LegacyStrokeWriter:
+    """
+    Writes legacy GPencil objects (Blender < 4.3): one strokes.new() per stroke, the points of each
+    stroke and the per-stroke attributes of the frame with foreach_set.
+    """
+
+    def __init__(self, gpencil_object):
+        self.gpencil_object = gpencil_object
+
+    def layer_frames(self):
+        """
+        :return: List of (layer name, Grease Pencil frame) for every frame of every layer
+        """
+        return [(layer.info, gp_frame) for layer in self.gpencil_object.data.layers for gp_frame in layer.frames]
+
+    def clear_frames(self):
+        for layer in self.gpencil_object.data.layers:
+            for gp_frame in list(layer.frames):
+                layer.frames.remove(gp_frame)
+
+    def new_frame(self, layer_name, frame_number):
+        """
+        Return an empty frame on the named layer, creating the layer if needed and replacing an existing frame.
+        """
+        gp_layer = self.gpencil_object.data.layers.get(layer_name)
+        if gp_layer is None:
+            gp_layer = self.gpencil_object.data.layers.new(layer_name, set_active=True)
+
+        for gp_frame in gp_layer.frames:
+            if gp_frame.frame_number == frame_number:
+                gp_layer.frames.remove(gp_frame)
+                break
+        return gp_layer.frames.new(frame_number)
+
+    def stroke_arrays(self, store, pressure=None, strength=None):
+        """
+        Convert a compacted stroke-space PolylineStore to the arrays write_frame takes.
+        """
+        arrays = {
+            'coords': store.coords,
+            'offsets': store.offsets,
+            'line_width': store.columns['width'].round().astype(np.int32),
+            'use_cyclic': store.columns['cyclic'],
+            'material_index': _material_indices(store, len(self.gpencil_object.material_slots)),
+        }
+        if pressure is not None:
+            arrays['pressure'], arrays['strength'] = pressure, strength
+        return arrays
+
+    def write_frame(self, layer_name, frame_number, arrays):
+        """
+        Replace a layer frame with strokes given as flat arrays.
+
+        :param arrays: Dictionary with 'coords' (points, 3), 'offsets' (strokes + 1,), per-stroke 'line_width',
+                       'use_cyclic' and 'material_index', and optionally per-point 'pressure' and 'strength'
+        :return: The Grease Pencil frame
+        """
+        gp_frame = self.new_frame(layer_name, frame_number)
+        coords, offsets = arrays['coords'], arrays['offsets']
+        pressure, strength = arrays.get('pressure'), arrays.get('strength')
+        for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist()):
+            stroke = gp_frame.strokes.new()
+            stroke.display_mode = '3DSPACE'
+            stroke.points.add(end - start)
+            stroke.points.foreach_set("co", coords[start:end].ravel())
+            if pressure is not None:
+                stroke.points.foreach_set("pressure", pressure[start:end])
+                stroke.points.foreach_set("strength", strength[start:end])
+
+        # The frame only holds the new strokes, so their attributes can be set in one call each
+        gp_frame.strokes.foreach_set("line_width", arrays['line_width'])
+        gp_frame.strokes.foreach_set("use_cyclic", arrays['use_cyclic'])
+        gp_frame.strokes.foreach_set("material_index", arrays['material_index'])
+        return gp_frame
+
+    @staticmethod
+    def read_frame(gp_frame):
+        """
+        Read every stroke of a frame into the arrays write_frame takes, with bulk point reads.
+        """
+        strokes = list(gp_frame.strokes)
+        lengths = np.array([len(stroke.points) for stroke in strokes], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+        coords = np.empty((offsets[-1], 3), dtype=np.float32)
+        pressure = np.empty(offsets[-1], dtype=np.float32)
+        strength = np.empty(offsets[-1], dtype=np.float32)
+        for stroke, start, end in zip(strokes, offsets[:-1].tolist(), offsets[1:].tolist()):
+            stroke.points.foreach_get("co", coords[start:end].ravel())
+            stroke.points.foreach_get("pressure", pressure[start:end])
+            stroke.points.foreach_get("strength", strength[start:end])
+        return {
+            'coords': coords,
+            'offsets': offsets,
+            'line_width': np.array([stroke.line_width for stroke in strokes], dtype=np.int32),
+            'use_cyclic': np.array([stroke.use_cyclic for stroke in strokes], dtype=bool),
+            'material_index': np.array([stroke.material_index for stroke in strokes], dtype=np.int32),
+            'pressure': pressure,
+            'strength': strength,
+        }
+
+    def simplify(self, factor):
+        bpy.context.view_layer.objects.active = self.gpencil_object
+        bpy.ops.object.mode_set(mode='EDIT_GPENCIL')
+        bpy.ops.gpencil.select_all(action='SELECT')
+        bpy.ops.gpencil.stroke_simplify(factor=factor)
+        bpy.ops.object.mode_set(mode='OBJECT')
+
+class GreasePencilV3Writer:
+    """
+    Writes Grease Pencil v3 objects (Blender 4.3+): a frame's strokes are allocated with one
+    drawing.add_strokes() call and every attribute is written as one array, so the number of
+    Python calls does not grow with the number of strokes.
+    """
+
+    def __init__(self, gpencil_object):
+        self.gpencil_object = gpencil_object
+
+    def layer_frames(self):
+        return [(layer.name, gp_frame) for layer in self.gpencil_object.data.layers for gp_frame in layer.frames]
+
+    def clear_frames(self):
+        for layer in self.gpencil_object.data.layers:
+            for frame_number in [gp_frame.frame_number for gp_frame in layer.frames]:
+                layer.frames.remove(frame_number)
+
+    def new_frame(self, layer_name, frame_number):
+        gp_layer = self.gpencil_object.data.layers.get(layer_name)
+        if gp_layer is None:
+            gp_layer = self.gpencil_object.data.layers.new(layer_name)
+        if any(gp_frame.frame_number == frame_number for gp_frame in gp_layer.frames):
+            gp_layer.frames.remove(frame_number)
+        return gp_layer.frames.new(frame_number)
+
+    def stroke_arrays(self, store, pressure=None, strength=None):
+        lengths = store.lengths()
+        radius = np.repeat(store.columns['width'] * LEGACY_RADIUS_FACTOR, lengths).astype(np.float32)
+        if pressure is not None:
+            radius *= pressure
+        return {
+            'coords': store.coords,
+            'offsets': store.offsets,
+            'radius': radius,
+            'opacity': strength if strength is not None else np.ones(store.num_points, dtype=np.float32),
+            'use_cyclic': store.columns['cyclic'],
+            'material_index': _material_indices(store, len(self.gpencil_object.material_slots)),
+        }
+
+    @staticmethod
+    def _attribute(drawing, name, data_type, domain):
+        attribute = drawing.attributes.get(name)
+        return attribute if attribute is not None else drawing.attributes.new(name, data_type, domain)
+
+    def write_frame(self, layer_name, frame_number, arrays):
+        """
+        Replace a layer frame with strokes given as flat arrays.
+
+        :param arrays: Dictionary with 'coords' (points, 3), 'offsets' (strokes + 1,), per-point 'radius'
+                       and 'opacity', and per-stroke 'use_cyclic' and 'material_index'
+        :return: The Grease Pencil frame
+        """
+        gp_frame = self.new_frame(layer_name, frame_number)
+        offsets = arrays['offsets']
+        if len(offsets) < 2:
+            return gp_frame
+        drawing = gp_frame.drawing
+        drawing.add_strokes(np.diff(offsets).tolist())
+        drawing.attributes['position'].data.foreach_set('vector', np.ascontiguousarray(arrays['coords']).ravel())
+        self._attribute(drawing, 'radius', 'FLOAT', 'POINT').data.foreach_set('value', arrays['radius'])
+        self._attribute(drawing, 'opacity', 'FLOAT', 'POINT').data.foreach_set('value', arrays['opacity'])
+        self._attribute(drawing, 'cyclic', 'BOOLEAN', 'CURVE').data.foreach_set('value', arrays['use_cyclic'])
+        self._attribute(drawing, 'material_index', 'INT', 'CURVE').data.foreach_set(
+            'value', arrays['material_index'])
+        return gp_frame
+
+    @staticmethod
+    def read_frame(gp_frame):
+        drawing = gp_frame.drawing
+        strokes = len(drawing.curve_offsets) - 1 if len(drawing.curve_offsets) else 0
+        offsets = np.zeros(strokes + 1, dtype=np.int32)
+        if strokes:
+            drawing.curve_offsets.foreach_get('value', offsets)
+        points = int(offsets[-1])
+
+        def read(name, domain_size, dtype, key='value', width=1):
+            values = np.zeros(domain_size * width, dtype=dtype)
+            attribute = drawing.attributes.get(name)
+            if attribute is not None and domain_size:
+                attribute.data.foreach_get(key, values)
+            return values
+
+        return {
+            'coords': read('position', points, np.float32, 'vector', 3).reshape(-1, 3),
+            'offsets': offsets,
+            'radius': read('radius', points, np.float32),
+            'opacity': read('opacity', points, np.float32),
+            'use_cyclic': read('cyclic', strokes, bool),
+            'material_index': read('material_index', strokes, np.int32),
+        }
+
+    def simplify(self, factor):
+        bpy.context.view_layer.objects.active = self.gpencil_object
+        bpy.ops.object.mode_set(mode='EDIT')
+        bpy.ops.grease_pencil.select_all(action='SELECT')
+        bpy.ops.grease_pencil.stroke_simplify(factor=factor)
+        bpy.ops.object.mode_set(mode='OBJECT')
+
+def read_frame_arrays(gp_frame):
+    """
+    Read a legacy or v3 Grease Pencil frame into the arrays its writer's write_frame takes.
+    """
+    if hasattr(gp_frame, 'drawing'):
+        return GreasePencilV3Writer.read_frame(gp_frame)
+    return LegacyStrokeWriter.read_frame(gp_frame)
+
+def get_stroke_writer(gpencil_object):
+    """
+    Pick the writer for a Grease Pencil object's data model.
+    """
+    if gpencil_object.type == 'GREASEPENCIL':
+        return GreasePencilV3Writer(gpencil_object)
+    return LegacyStrokeWriter(gpencil_object)
@@ -0,0 +1,135 @@
+import zlib
+import logging
+import numpy as np
+from collections import OrderedDict
+from instrumentation import span
+from polyline_store import PolylineStore
+from utils import add_noise_to_points, vary_points_from_edges
+
+# Setup logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Stroke-space displacement (the frame spans 0..1) for a noise or variation amount of 1.0
+DISPLACEMENT_SCALE = 0.01
+# Unstyled strokes kept for restyling without running detection again
+MAX_BASE_BYTES = 256 * 1024 * 1024
+
+# All amounts 0 leaves strokes untouched.
+# This module must not be importlib.reload()-ed, otherwise the settings and kept strokes are lost.
+_config = {
+    'seed': 0,
+    'noise': 0.0,
+    'variation': 0.0,
+    'pressure_taper': 0.0,
+    'strength_taper': 0.0,
+    'width_jitter': 0.0,
+}
+_base_strokes = OrderedDict()
+
+def configure_style(**settings):
+    """
+    Set the stylization amounts.
+
+    :param seed: Base seed; every layer frame derives its own generator from it
+    :param noise: Per-point jitter, in units of DISPLACEMENT_SCALE
+    :param variation: Per-stroke offset, in units of DISPLACEMENT_SCALE
+    :param pressure_taper: 0..1, how far pressure falls off towards the ends of open strokes
+    :param strength_taper: 0..1, how far strength (opacity) falls off towards the ends of open strokes
+    :param width_jitter: 0..1, relative random change of every stroke's line width
+    """
+    unknown = set(settings) - set(_config)
+    if unknown:
+        raise ValueError(f"Unknown style settings: {', '.join(sorted(unknown))}")
+    for key, value in settings.items():
+        if value is not None:
+            _config[key] = value
+
+def get_style_config():
+    return dict(_config)
+
+def is_style_enabled(config=None):
+    config = config or _config
+    return any(config[key] for key in _config if key != 'seed')
+
+def stroke_rng(seed, frame_number, layer_name):
+    """
+    Generator for one layer frame. Independent of processing order, so reruns and batch workers agree.
+    """
+    return np.random.default_rng([seed, frame_number, zlib.crc32(layer_name.encode())])
+
+def stroke_positions(store):
+    """
+    Position of every point along its stroke, 0 at the first point and 1 at the last.
+    """
+    lengths = store.lengths()
+    index = np.arange(store.num_points) - np.repeat(store.offsets[:-1] - store.offsets[0], lengths)
+    return index / np.repeat(np.maximum(lengths - 1, 1), lengths).astype(np.float32)
+
+def stylize_polylines(store, rng, noise=0.0, variation=0.0, pressure_taper=0.0, strength_taper=0.0,
+                      width_jitter=0.0):
+    """
+    Apply noise, variation, end tapers and width jitter to every stroke of a store at once.
+
+    Random numbers are always drawn in the same order and scaled by the amounts, so changing
+    an amount scales the same pattern instead of producing a new one.
+
+    :param store: PolylineStore in stroke space
+    :param rng: np.random.Generator, see stroke_rng
+    :return: Tuple of (styled PolylineStore, float32 pressure per point, float32 strength per point)
+    """
+    store = store.compact()
+    lengths = store.lengths()
+    coords = store.coords.copy()
+    coords[:, :2] = add_noise_to_points(coords[:, :2], noise * DISPLACEMENT_SCALE, rng)
+    offsets = vary_points_from_edges(np.zeros((len(store), 2), dtype=np.float32), variation * DISPLACEMENT_SCALE,
+                                     rng)
+    coords[:, :2] += np.repeat(offsets, lengths, axis=0)
+    widths = store.columns['width'] * (1 + rng.uniform(-width_jitter, width_jitter, len(store)))
+
+    # Open strokes thin out and fade towards both ends; closed outlines keep full pressure
+    profile = np.sin(np.pi * stroke_positions(store))
+    profile[np.repeat(store.columns['cyclic'], lengths)] = 1.0
+    pressure = (1 - pressure_taper * (1 - profile)).astype(np.float32)
+    strength = (1 - strength_taper * (1 - profile)).astype(np.float32)
+
+    columns = dict(store.columns, width=np.maximum(widths, 1))
+    return PolylineStore(coords, store.offsets, store.layers, **columns), pressure, strength
+
+def stylize_layer_frame(store, frame_number, layer_name, config=None):
+    """
+    Stylize the strokes of one layer frame with the configured amounts.
+
+    :return: Tuple as returned by stylize_polylines; pressure and strength are None when styling is off
+    """
+    config = config or _config
+    if not is_style_enabled(config):
+        return store, None, None
+    amounts = {key: value for key, value in config.items() if key != 'seed'}
+    with span('stylization', points=store.num_points):
+        return stylize_polylines(store, stroke_rng(config['seed'], frame_number, layer_name), **amounts)
+
+def remember_base_strokes(object_name, layer_name, frame_number, store):
+    """
+    Keep the unstyled strokes of a layer frame, evicting the least recently written frames beyond MAX_BASE_BYTES.
+    """
+    key = (object_name, layer_name, frame_number)
+    _base_strokes.pop(key, None)
+    _base_strokes[key] = store.compact()
+    total = sum(kept.nbytes for kept in _base_strokes.values())
+    while total > MAX_BASE_BYTES and len(_base_strokes) > 1:
+        _, evicted = _base_strokes.popitem(last=False)
+        total -= evicted.nbytes
+
+def get_base_strokes(object_name, frame_numbers=None):
+    """
+    :return: Dictionary of (layer name, frame number) to the kept unstyled PolylineStore
+    """
+    return {(layer_name, frame_number): store for (name, layer_name, frame_number), store in _base_strokes.items()
+            if name == object_name and (frame_numbers is None or frame_number in frame_numbers)}
+
+def clear_base_strokes():
+    _base_strokes.clear()
+
+if __name__ == "__main__":
+    logger.debug("Stylization module loaded")
@@ -0,0 +1,192 @@
+import cv2
+import numpy as np
+import logging
+
+# Setup logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Mean absolute difference (0..1) of grayscale thumbnails below which a frame reuses the keyframe detection
+DEFAULT_THRESHOLD = 0.02
+THUMBNAIL_SIZE = (64, 36)
+# Points tracked per detection box when propagating with optical flow
+FLOW_GRID = 4
+
+def _to_gray(frame, channel_order='RGB'):
+    if frame.dtype != np.uint8:
+        frame = (frame * 255).astype(np.uint8)
+    code = cv2.COLOR_BGR2GRAY if channel_order == 'BGR' else cv2.COLOR_RGB2GRAY
+    return cv2.cvtColor(np.ascontiguousarray(frame[:, :, :3]), code)
+
+def frame_signature(frame, channel_order='RGB'):
+    """
+    Compute a cheap grayscale thumbnail used to compare frames.
+
+    :param frame: NumPy array (height, width, 3 or 4)
+    :param channel_order: 'RGB' or 'BGR'
+    :return: float32 NumPy array of THUMBNAIL_SIZE with values in 0..1
+    """
+    thumbnail = cv2.resize(frame[:, :, :3], THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+    gray = _to_gray(thumbnail, channel_order).astype(np.float32)
+    return gray / 255.0
+
+def frame_difference(signature_a, signature_b):
+    return float(np.mean(np.abs(signature_a - signature_b)))
+
+def box_iou_matrix(boxes_a, boxes_b):
+    """
+    Pairwise IoU of two sets of xyxy boxes.
+    """
+    top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    inter = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(boxes_a[:, 2:] - boxes_a[:, :2], axis=1)
+    area_b = np.prod(boxes_b[:, 2:] - boxes_b[:, :2], axis=1)
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+def detection_error(reused, actual):
+    """
+    Measure how far a reused detection is from a fresh one.
+
+    :return: 1 - mean best IoU of each fresh box against the reused boxes (0 is identical)
+    """
+    if len(actual['boxes']) == 0 and len(reused['boxes']) == 0:
+        return 0.0
+    if len(actual['boxes']) == 0 or len(reused['boxes']) == 0:
+        return 1.0
+    return float(1.0 - box_iou_matrix(actual['boxes'], reused['boxes']).max(axis=1).mean())
+
+def propagate_detections(detections, previous_gray, current_gray):
+    """
+    Shift each detection by the median sparse optical flow of a point grid inside its box.
+
+    Masks move with their boxes: 'mask_boxes' keeps the boxes the proto masks are cropped to and
+    'mask_shifts' the (x, y) pixel shift applied when decoding them, see yolo_segmentation.
+
+    :param detections: Detection result of the previous keyframe
+    :param previous_gray: Grayscale keyframe
+    :param current_gray: Grayscale current frame
+    :return: New detection result with moved boxes and masks
+    """
+    boxes = detections['boxes']
+    if len(boxes) == 0:
+        return dict(detections)
+
+    steps = (np.arange(FLOW_GRID) + 0.5) / FLOW_GRID
+    grid_x = boxes[:, 0, None] + (boxes[:, 2] - boxes[:, 0])[:, None] * steps
+    grid_y = boxes[:, 1, None] + (boxes[:, 3] - boxes[:, 1])[:, None] * steps
+    points = np.stack([
+        np.repeat(grid_x, FLOW_GRID, axis=1),
+        np.tile(grid_y, (1, FLOW_GRID)),
+    ], axis=2).reshape(-1, 1, 2).astype(np.float32)
+
+    moved, status, _ = cv2.calcOpticalFlowPyrLK(previous_gray, current_gray, points, None)
+    displacement = (moved - points).reshape(len(boxes), FLOW_GRID * FLOW_GRID, 2)
+    tracked = status.reshape(len(boxes), FLOW_GRID * FLOW_GRID).astype(bool)
+    displacement[~tracked] = np.nan
+    shifts = np.nan_to_num(np.nanmedian(displacement, axis=1))
+
+    height, width = detections['frame_shape']
+    propagated = dict(detections)
+    propagated['mask_boxes'] = detections.get('mask_boxes', boxes)
+    propagated['mask_shifts'] = (detections.get('mask_shifts', 0) + shifts).astype(np.float32)
+    propagated['boxes'] = boxes + np.tile(shifts, 2).astype(np.float32)
+    propagated['boxes'][:, [0, 2]] = propagated['boxes'][:, [0, 2]].clip(0, width - 1)
+    propagated['boxes'][:, [1, 3]] = propagated['boxes'][:, [1, 3]].clip(0, height - 1)
+    return propagated
+
+def new_temporal_state(threshold=DEFAULT_THRESHOLD, optical_flow=False, validate_every=0):
+    """
+    Create the state carried across frames of one shot.
+
+    :param threshold: Frame difference below which the keyframe detection is reused
+    :param optical_flow: Move reused boxes with sparse optical flow instead of copying them
+    :param validate_every: Also run full inference on every n-th reused frame to measure the error; 0 disables
+    """
+    return {
+        'threshold': threshold,
+        'optical_flow': optical_flow,
+        'validate_every': validate_every,
+        'key_signature': None,
+        'key_detections': None,
+        'key_gray': None,
+        'frames': 0,
+        'inferred': 0,
+        'skipped': 0,
+        'since_validation': 0,
+        'errors': [],
+    }
+
+def temporal_detect_batch(state, frames, detect_batch, channel_order='RGB'):
+    """
+    Detect objects in consecutive frames, inferring only frames that changed since the last keyframe.
+
+    Keyframes are chosen from the cheap signatures first, so all of them still go to the
+    model in a single batch.
+
+    :param state: State from new_temporal_state
+    :param frames: Consecutive frames, in order
+    :param detect_batch: Callable taking a list of frames and returning a list of detection results or None
+    :param channel_order: 'RGB' or 'BGR'
+    :return: List of detection results, or None on failure
+    """
+    # Decide which frames become keyframes and which reuse the preceding keyframe
+    plan = []
+    for frame in frames:
+        signature = frame_signature(frame, channel_order)
+        if state['key_signature'] is None or frame_difference(signature, state['key_signature']) > state['threshold']:
+            state['key_signature'] = signature
+            plan.append('key')
+        else:
+            state['since_validation'] += 1
+            if state['validate_every'] and state['since_validation'] >= state['validate_every']:
+                state['since_validation'] = 0
+                plan.append('validate')
+            else:
+                plan.append('reuse')
+
+    to_infer = [index for index, action in enumerate(plan) if action != 'reuse']
+    inferred = detect_batch([frames[index] for index in to_infer]) if to_infer else []
+    if inferred is None:
+        return None
+    inferred = dict(zip(to_infer, inferred))
+
+    results = []
+    for index, (frame, action) in enumerate(zip(frames, plan)):
+        state['frames'] += 1
+        if action == 'key':
+            state['inferred'] += 1
+            state['key_detections'] = inferred[index]
+            if state['optical_flow']:
+                state['key_gray'] = _to_gray(frame, channel_order)
+            results.append(inferred[index])
+            continue
+
+        if state['optical_flow']:
+            reused = propagate_detections(state['key_detections'], state['key_gray'], _to_gray(frame, channel_order))
+        else:
+            reused = dict(state['key_detections'])
+
+        if action == 'validate':
+            state['inferred'] += 1
+            state['errors'].append(detection_error(reused, inferred[index]))
+            results.append(inferred[index])
+        else:
+            state['skipped'] += 1
+            results.append(reused)
+    return results
+
+def get_temporal_stats(state):
+    """
+    Summarize how many frames were skipped and how much error reuse introduced.
+    """
+    errors = state['errors']
+    return {
+        'frames': state['frames'],
+        'inferred': state['inferred'],
+        'skipped': state['skipped'],
+        'skip_ratio': state['skipped'] / state['frames'] if state['frames'] else 0.0,
+        'validated': len(errors),
+        'mean_error': float(np.mean(errors)) if errors else None,
+        'max_error': float(np.max(errors)) if errors else None,
+    }
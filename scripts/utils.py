@@ -1,9 +1,21 @@
 import numpy as np
 
-def add_noise_to_points(points, amount):
-    noise = np.random.normal(0, amount, points.shape)
+def add_noise_to_points(points, amount, rng=None):
+    """
+    Jitter every coordinate with normally distributed noise of standard deviation amount.
+
+    :param rng: np.random.Generator; a fresh unseeded one by default
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    noise = rng.normal(0, amount, points.shape)
     return points + noise
 
-def vary_points_from_edges(points, amount):
-    variation = np.random.uniform(-amount, amount, points.shape)
-    return points + variation
\ No newline at end of file
+def vary_points_from_edges(points, amount, rng=None):
+    """
+    Shift every coordinate by a uniform random amount in [-amount, amount].
+
+    :param rng: np.random.Generator; a fresh unseeded one by default
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    variation = rng.uniform(-amount, amount, points.shape)
+    return points + variation
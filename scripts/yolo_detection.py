@@ -0,0 +1,453 @@
+import cv2
+import numpy as np
+import time
+import logging
+from instrumentation import span
+from model_registry import MODEL_PATH, get_model
+from inference_worker import is_worker_enabled, detect_batch_in_worker
+from result_cache import is_cache_enabled, make_cache_key, load_cached_result, store_cached_result
+
+# Setup logging
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+# Lowest confidence any downstream stage asks for; stages filter further themselves
+CONFIDENCE_THRESHOLD = 0.3
+IOU_THRESHOLD = 0.45
+MAX_DETECTIONS = 300
+
+# Square model input frames are letterboxed to; must be a multiple of the model stride
+INPUT_SIZE = 640
+STRIDE = 32
+LETTERBOX_COLOR = (114, 114, 114)
+# Fraction of a tile shared with its neighbour in tiled mode
+TILE_OVERLAP = 0.2
+# Tile detections this close (in pixels) to an inner tile border count as cut off
+SEAM_MARGIN = 2
+# Most letterboxed images per forward pass, which bounds activation memory
+MAX_BATCH = 8
+
+_config = {
+    'input_size': INPUT_SIZE,
+    'tiled': False,
+    'tile_overlap': TILE_OVERLAP,
+    'backend': 'torch',
+    'precision': 'float32',
+}
+
+def configure_detection(input_size=None, tiled=None, tile_overlap=None, backend=None, precision=None):
+    """
+    Update the default preprocessing and backend options, e.g. from the panel settings.
+
+    :param input_size: Model input size; rounded up to a multiple of STRIDE
+    :param tiled: Run overlapping native-resolution tiles plus the whole frame
+    :param tile_overlap: Fraction of a tile shared with its neighbour
+    :param backend: 'torch', 'onnxruntime' or 'openvino'
+    :param precision: 'float32', or 'int8' for a calibrated export
+    """
+    if input_size is not None:
+        _config['input_size'] = max(STRIDE, -(-int(input_size) // STRIDE) * STRIDE)
+    if tiled is not None:
+        _config['tiled'] = bool(tiled)
+    if tile_overlap is not None:
+        _config['tile_overlap'] = min(max(float(tile_overlap), 0.0), 0.9)
+    if backend is not None:
+        _config['backend'] = backend
+    if precision is not None:
+        _config['precision'] = precision
+
+def get_detection_config():
+    return dict(_config)
+
+def load_yolo_model(backend=None, precision=None, input_size=None):
+    # The registry keeps the model resident, so only the first call pays the load
+    return get_model(MODEL_PATH, dtype=precision or _config['precision'], backend=backend or _config['backend'],
+                     input_size=input_size or _config['input_size'])
+
+def preprocess_frame(frame_pixels, channel_order='RGB'):
+    """
+    Convert a frame to the uint8 BGR layout the model expects.
+
+    :param frame_pixels: NumPy array (height, width, 3 or 4), float in 0..1 or uint8
+    :param channel_order: 'RGB' for Blender pixels, 'BGR' for frames decoded by OpenCV
+    :return: uint8 BGR array (height, width, 3)
+    """
+    if frame_pixels.dtype != np.uint8:
+        frame_pixels = (frame_pixels * 255).astype(np.uint8)
+    if channel_order == 'BGR':
+        return frame_pixels[:, :, :3]
+    if frame_pixels.shape[2] == 4:  # RGBA
+        frame_pixels = cv2.cvtColor(frame_pixels, cv2.COLOR_RGBA2BGR)
+    elif frame_pixels.shape[2] == 3:  # RGB
+        frame_pixels = cv2.cvtColor(frame_pixels, cv2.COLOR_RGB2BGR)
+    return frame_pixels
+
+def letterbox(frame_bgr, input_size=INPUT_SIZE):
+    """
+    Resize a frame to fit a square model input, keeping its aspect ratio, and pad the rest.
+
+    :param frame_bgr: uint8 BGR array (height, width, 3)
+    :param input_size: Side of the square output
+    :return: Tuple of (uint8 array (input_size, input_size, 3), (scale, pad_x, pad_y))
+    """
+    height, width = frame_bgr.shape[:2]
+    scale = min(input_size / height, input_size / width)
+    new_width = min(input_size, max(1, int(round(width * scale))))
+    new_height = min(input_size, max(1, int(round(height * scale))))
+    frame_bgr = np.ascontiguousarray(frame_bgr)
+    if (new_width, new_height) != (width, height):
+        interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+        frame_bgr = cv2.resize(frame_bgr, (new_width, new_height), interpolation=interpolation)
+
+    pad_x = (input_size - new_width) // 2
+    pad_y = (input_size - new_height) // 2
+    image = cv2.copyMakeBorder(frame_bgr, pad_y, input_size - new_height - pad_y,
+                               pad_x, input_size - new_width - pad_x,
+                               cv2.BORDER_CONSTANT, value=LETTERBOX_COLOR)
+    return image, (scale, pad_x, pad_y)
+
+def tile_windows(height, width, tile_size, overlap=TILE_OVERLAP):
+    """
+    Cover a frame with overlapping square windows of tile_size native pixels.
+
+    The last window in each direction is shifted back so it ends on the frame border.
+
+    :return: List of (x, y, width, height) windows
+    """
+    step = max(1, int(tile_size * (1.0 - overlap)))
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        return list(range(0, length - tile_size, step)) + [length - tile_size]
+
+    return [(x, y, min(tile_size, width), min(tile_size, height)) for y in starts(height) for x in starts(width)]
+
+def _prepare_views(frame_bgr, input_size, tiled, tile_overlap):
+    """
+    Letterbox a frame, or each of its tiles, for the model.
+
+    :return: List of (image, transform, window) where transform (scale, offset_x, offset_y) maps
+             source pixels to model input pixels as input = source * scale + offset, and window
+             is the tile's (x, y, width, height), or None for the whole frame
+    """
+    image, (scale, pad_x, pad_y) = letterbox(frame_bgr, input_size)
+    views = [(image, (scale, float(pad_x), float(pad_y)), None)]
+    if not tiled:
+        return views
+
+    height, width = frame_bgr.shape[:2]
+    windows = tile_windows(height, width, input_size, tile_overlap)
+    if len(windows) == 1:
+        return views
+    # The whole-frame view stays in so objects larger than a tile are still found
+    for window in windows:
+        x, y, tile_width, tile_height = window
+        image, (scale, pad_x, pad_y) = letterbox(frame_bgr[y:y + tile_height, x:x + tile_width], input_size)
+        views.append((image, (scale, pad_x - x * scale, pad_y - y * scale), window))
+    return views
+
+def _drop_seam_boxes(result, window, margin=SEAM_MARGIN):
+    """
+    Drop tile detections that touch an inner tile border; they are cut-off parts of objects
+    another tile or the whole-frame view sees in full.
+    """
+    x, y, tile_width, tile_height = window
+    height, width = result['frame_shape']
+    boxes = result['boxes']
+    cut = np.zeros(len(boxes), dtype=bool)
+    if x > 0:
+        cut |= boxes[:, 0] <= x + margin
+    if y > 0:
+        cut |= boxes[:, 1] <= y + margin
+    if x + tile_width < width:
+        cut |= boxes[:, 2] >= x + tile_width - 1 - margin
+    if y + tile_height < height:
+        cut |= boxes[:, 3] >= y + tile_height - 1 - margin
+    if cut.any():
+        for key in ('boxes', 'scores', 'classes', 'mask_coefficients', 'proto_index'):
+            result[key] = result[key][~cut]
+    return result
+
+def frames_to_tensor(frames_bgr):
+    """
+    Stack letterboxed uint8 frames into the float32 (N, 3, H, W) batch every backend takes.
+    """
+    batch = np.stack(frames_bgr).transpose(0, 3, 1, 2)
+    return np.multiply(batch, 1 / 255.0, dtype=np.float32)
+
+def _to_numpy(value):
+    return np.asarray(value, dtype=np.float32)
+
+def non_max_suppression(boxes, scores, iou_threshold=IOU_THRESHOLD, classes=None):
+    """
+    Greedy NMS over xyxy boxes.
+
+    :param boxes: NumPy array (N, 4) of x1, y1, x2, y2
+    :param scores: NumPy array (N,) of confidences
+    :param iou_threshold: Boxes overlapping a kept box by more than this are dropped
+    :param classes: Optional (N,) class ids; boxes of different classes never suppress each other
+    :return: Indices of kept boxes, highest score first
+    """
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    if classes is not None:
+        # Shift each class into its own coordinate range so they cannot overlap
+        boxes = boxes + (classes.astype(np.float32) * (boxes.max() + 1))[:, None]
+
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    order = np.argsort(-scores, kind='stable')
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        xx1 = np.maximum(boxes[i, 0], boxes[rest, 0])
+        yy1 = np.maximum(boxes[i, 1], boxes[rest, 1])
+        xx2 = np.minimum(boxes[i, 2], boxes[rest, 2])
+        yy2 = np.minimum(boxes[i, 3], boxes[rest, 3])
+        inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+        iou = inter / np.maximum(areas[i] + areas[rest] - inter, 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+def decode_yolo_output(output, frame_shape, confidence_threshold=CONFIDENCE_THRESHOLD,
+                       iou_threshold=IOU_THRESHOLD, names=None, index=0, transform=(1.0, 0.0, 0.0)):
+    """
+    Turn raw YOLOv8-seg output for one image of a batch into a detection result.
+
+    Boxes are mapped back to source pixels; the protos stay in model input space and
+    proto_transforms records how to get there from source pixels.
+
+    :param output: Model output; either the prediction tensor (batch, 4 + classes + coefficients, anchors)
+                   or a tuple whose second item ends with the mask protos (batch, coefficients, ph, pw)
+    :param frame_shape: (height, width) of the source frame
+    :param confidence_threshold: Minimum class confidence to keep
+    :param iou_threshold: IoU threshold for per-class NMS
+    :param names: Optional mapping of class id to class name
+    :param index: Which image of the batch to decode
+    :param transform: (scale, offset_x, offset_y) with input = source * scale + offset
+    :return: Detection result dictionary
+    """
+    protos = None
+    if isinstance(output, (list, tuple)):
+        predictions = output[0]
+        if len(output) > 1:
+            extra = output[1]
+            protos = extra[-1] if isinstance(extra, (list, tuple)) else extra
+    else:
+        predictions = output
+
+    predictions = _to_numpy(predictions[index]).T  # (anchors, channels)
+    if protos is not None:
+        protos = _to_numpy(protos[index])
+    num_coefficients = protos.shape[0] if protos is not None else 0
+    num_classes = predictions.shape[1] - 4 - num_coefficients
+
+    class_scores = predictions[:, 4:4 + num_classes]
+    classes = class_scores.argmax(axis=1)
+    scores = class_scores[np.arange(len(classes)), classes]
+    candidates = scores > confidence_threshold
+
+    xywh = predictions[candidates, :4]
+    boxes = np.empty_like(xywh)
+    boxes[:, :2] = xywh[:, :2] - xywh[:, 2:] / 2
+    boxes[:, 2:] = xywh[:, :2] + xywh[:, 2:] / 2
+    scores = scores[candidates]
+    classes = classes[candidates]
+    coefficients = predictions[candidates, 4 + num_classes:]
+
+    keep = non_max_suppression(boxes, scores, iou_threshold, classes)[:MAX_DETECTIONS]
+    scale, offset_x, offset_y = transform
+    boxes = (boxes[keep] - np.array([offset_x, offset_y, offset_x, offset_y], dtype=np.float32)) / scale
+    height, width = frame_shape
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, width - 1)
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, height - 1)
+
+    return {
+        'boxes': boxes.astype(np.float32),
+        'scores': scores[keep].astype(np.float32),
+        'classes': classes[keep].astype(np.int32),
+        'mask_coefficients': coefficients[keep].astype(np.float32),
+        'protos': protos[None] if protos is not None else None,
+        'proto_index': np.zeros(len(keep), dtype=np.int32),
+        'proto_transforms': np.array([transform], dtype=np.float32),
+        'names': dict(names or {}),
+        'frame_shape': (height, width),
+    }
+
+def merge_detections(results, iou_threshold=IOU_THRESHOLD):
+    """
+    Merge the detection results of overlapping views of one frame, e.g. its tiles.
+
+    Objects cut by a tile seam show up in several views; per-class NMS keeps the best one.
+
+    :param results: Detection results of the same source frame
+    :param iou_threshold: IoU threshold for per-class NMS
+    :return: Single detection result dictionary
+    """
+    boxes = np.concatenate([result['boxes'] for result in results])
+    scores = np.concatenate([result['scores'] for result in results])
+    classes = np.concatenate([result['classes'] for result in results])
+    keep = non_max_suppression(boxes, scores, iou_threshold, classes)[:MAX_DETECTIONS]
+
+    merged = dict(results[0])
+    merged['boxes'] = boxes[keep]
+    merged['scores'] = scores[keep]
+    merged['classes'] = classes[keep]
+    merged['mask_coefficients'] = np.concatenate([result['mask_coefficients'] for result in results])[keep]
+    # Each view contributes one proto stack; only the stacks of kept detections are carried on
+    views = np.concatenate([np.full(len(result['boxes']), view, dtype=np.int32)
+                            for view, result in enumerate(results)])[keep]
+    used, merged['proto_index'] = np.unique(views, return_inverse=True)
+    merged['proto_index'] = merged['proto_index'].astype(np.int32)
+    merged['proto_transforms'] = np.concatenate([results[view]['proto_transforms'] for view in used]
+                                                or [results[0]['proto_transforms'][:0]])
+    if all(result['protos'] is not None for result in results):
+        merged['protos'] = np.concatenate([results[view]['protos'] for view in used]
+                                          or [results[0]['protos'][:0]])
+    else:
+        merged['protos'] = None
+    return merged
+
+def _detect_batch(frames, confidence_threshold, iou_threshold, channel_order, options):
+    logger.info(f"Starting YOLO detection on {len(frames)} frame(s)")
+
+    # Route to the out-of-process worker when enabled; it runs this same function
+    if is_worker_enabled():
+        try:
+            return detect_batch_in_worker(frames, confidence_threshold, iou_threshold, channel_order, options)
+        except Exception as e:
+            logger.error(f"Error during YOLO detection in inference worker: {str(e)}")
+            return None
+
+    with span('color_conversion', frames=len(frames)):
+        frames_bgr = [preprocess_frame(frame, channel_order) for frame in frames]
+    views = []
+    with span('letterbox') as counts:
+        for frame_index, frame_bgr in enumerate(frames_bgr):
+            for image, transform, window in _prepare_views(frame_bgr, options['input_size'], options['tiled'],
+                                                           options['tile_overlap']):
+                views.append((frame_index, image, transform, window))
+        counts['views'] = len(views)
+
+    # Load YOLO model
+    try:
+        model = load_yolo_model(options['backend'], options['precision'], options['input_size'])
+    except Exception as e:
+        logger.error(f"Error loading YOLO model: {str(e)}")
+        return None
+
+    try:
+        names = getattr(model, 'names', None)
+        view_results = [[] for _ in frames_bgr]
+        start = time.perf_counter()
+        # Every view has the same letterboxed shape, so the forward passes stay the same size
+        # however large the source frames are
+        for chunk_start in range(0, len(views), MAX_BATCH):
+            chunk = views[chunk_start:chunk_start + MAX_BATCH]
+            with span('inference', views=len(chunk)):
+                frame_tensor = frames_to_tensor([image for _, image, _, _ in chunk])
+                output = model(frame_tensor)
+            with span('decode', detections=0) as counts:
+                for index, (frame_index, _, transform, window) in enumerate(chunk):
+                    result = decode_yolo_output(output, frames_bgr[frame_index].shape[:2], confidence_threshold,
+                                                iou_threshold, names, index, transform)
+                    result = _drop_seam_boxes(result, window) if window else result
+                    view_results[frame_index].append(result)
+                    counts['detections'] += len(result['boxes'])
+            del output, frame_tensor
+        logger.debug(f"YOLO inference on {len(views)} view(s) took {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        results = [
+            merge_detections(per_frame, iou_threshold) if len(per_frame) > 1 else per_frame[0]
+            for per_frame in view_results
+        ]
+    except Exception as e:
+        logger.error(f"Error during YOLO detection: {str(e)}")
+        return None
+
+    logger.info(f"Detection completed. Found {sum(len(result['boxes']) for result in results)} objects.")
+    return results
+
+def run_yolo_detection_batch(frames, confidence_threshold=CONFIDENCE_THRESHOLD, iou_threshold=IOU_THRESHOLD,
+                             channel_order='RGB', input_size=None, tiled=None, tile_overlap=None,
+                             backend=None, precision=None):
+    """
+    Letterbox a batch of frames to the model input size and run the YOLO model on them.
+
+    Frames may differ in size; boxes come back in each frame's own pixel coordinates.
+    In tiled mode every frame is also cut into overlapping native-resolution tiles, which
+    are batched together and merged with NMS, so small objects in large plates survive.
+
+    With the result cache enabled, frames seen before with the same weights and parameters
+    are served from disk and only the remaining frames are inferred.
+
+    :param frames: Sequence of NumPy arrays (height, width, 3 or 4)
+    :param confidence_threshold: Minimum confidence to keep a detection
+    :param iou_threshold: IoU threshold for NMS
+    :param channel_order: 'RGB' for Blender pixels, 'BGR' for frames decoded by OpenCV
+    :param input_size: Model input size; defaults to the configured one
+    :param tiled: Run tiled inference; defaults to the configured setting
+    :param tile_overlap: Tile overlap fraction; defaults to the configured one
+    :param backend: Inference backend; defaults to the configured one
+    :param precision: 'float32' or 'int8'; defaults to the configured one
+    :return: List of detection result dictionaries, or None on failure
+    """
+    options = get_detection_config()
+    overrides = (('input_size', input_size), ('tiled', tiled), ('tile_overlap', tile_overlap),
+                 ('backend', backend), ('precision', precision))
+    for key, value in overrides:
+        if value is not None:
+            options[key] = value
+
+    if not is_cache_enabled():
+        return _detect_batch(frames, confidence_threshold, iou_threshold, channel_order, options)
+
+    params = {
+        'confidence_threshold': confidence_threshold,
+        'iou_threshold': iou_threshold,
+        'channel_order': channel_order,
+        **options,
+    }
+    try:
+        keys = [make_cache_key(frame, MODEL_PATH, params) for frame in frames]
+    except OSError as e:
+        logger.error(f"Cannot build result cache key: {str(e)}")
+        return _detect_batch(frames, confidence_threshold, iou_threshold, channel_order, options)
+
+    results = [load_cached_result(key) for key in keys]
+    missing = [index for index, result in enumerate(results) if result is None]
+    logger.debug(f"Result cache: {len(frames) - len(missing)} hit(s), {len(missing)} miss(es)")
+    if missing:
+        computed = _detect_batch([frames[index] for index in missing], confidence_threshold, iou_threshold,
+                                 channel_order, options)
+        if computed is None:
+            return None
+        for index, result in zip(missing, computed):
+            store_cached_result(keys[index], result)
+            results[index] = result
+    return results
+
+def run_yolo_detection(frame_pixels, confidence_threshold=CONFIDENCE_THRESHOLD, iou_threshold=IOU_THRESHOLD,
+                       channel_order='RGB'):
+    """
+    Preprocess a frame and run the YOLO model on it exactly once.
+
+    The edge and segmentation stages derive their masks from the returned result
+    instead of running the model themselves.
+
+    :param frame_pixels: NumPy array (height, width, 3 or 4)
+    :param confidence_threshold: Minimum confidence to keep a detection
+    :param iou_threshold: IoU threshold for NMS
+    :param channel_order: 'RGB' for Blender pixels, 'BGR' for frames decoded by OpenCV
+    :return: Detection result dictionary, or None on failure
+    """
+    results = run_yolo_detection_batch([frame_pixels], confidence_threshold, iou_threshold, channel_order)
+    if results is None:
+        return None
+    return results[0]
+
+if __name__ == "__main__":
+    logger.debug("YOLO detection module loaded")
@@ -1,79 +1,230 @@
 import cv2
 import numpy as np
-import torch
-import os
 import logging
+from instrumentation import span
+from stroke_geometry import find_horizontal_runs
+from yolo_detection import run_yolo_detection
+from yolo_segmentation import instance_polygons
 
 # Setup logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-# Path to the YOLO model file
-MODEL_NAME = 'yolov8x-seg.pt'
-EDGE2GP_DIR = r"C:\Users\DanTh\Documents\Blender\edge2gp"  # Update this path if necessary
-MODEL_PATH = os.path.join(EDGE2GP_DIR, MODEL_NAME)
-
-def load_yolo_model():
-    logger.debug(f"Attempting to load YOLO model from: {MODEL_PATH}")
-    if not os.path.exists(MODEL_PATH):
-        logger.error(f"YOLO model not found at: {MODEL_PATH}")
-        raise FileNotFoundError(f"YOLO model not found at: {MODEL_PATH}")
-    
-    logger.info(f"Loading YOLO model from: {MODEL_PATH}")
-    try:
-        # Load the model weights
-        checkpoint = torch.load(MODEL_PATH, map_location='cpu')
-        
-        # Initialize the model (you might need to adjust this based on the actual model architecture)
-        from ultralytics.nn.tasks import attempt_load_weights
-        model = attempt_load_weights(checkpoint)
-        
-        logger.info("YOLO model loaded successfully")
-        return model
-    except Exception as e:
-        logger.error(f"Error loading YOLO model: {str(e)}")
-        raise
+# Full-resolution Canny runs on rows of REFINE_TILE pixel tiles that have edges at the coarse level,
+# padded by TILE_PAD pixels so gradients and hysteresis see past the tile border
+REFINE_TILE = 64
+TILE_PAD = 4
+
+# Image edges inside the detected objects, on top of or instead of their outlines; off by default.
+# This module must not be importlib.reload()-ed, otherwise the settings are lost.
+_config = {
+    'refine': False,
+    'margin': 0.1,
+    'use_masks': True,
+    'pyramid_levels': 2,
+    'low_threshold': 50,
+    'high_threshold': 150,
+    'keep_outlines': True,
+}
+
+def configure_edge_refinement(refine=None, margin=None, use_masks=None, pyramid_levels=None, low_threshold=None,
+                              high_threshold=None, keep_outlines=None):
+    """
+    Set up the classical edge pass that runs inside the detected objects.
+
+    :param refine: Run Canny inside the detections
+    :param margin: Fraction of an object's size its region of interest extends beyond its box or mask
+    :param use_masks: Only keep edges within the (grown) instance masks instead of the whole boxes
+    :param pyramid_levels: Halvings before the coarse pass; 0 runs Canny on every region at full resolution
+    :param low_threshold: Canny hysteresis low threshold at full resolution
+    :param high_threshold: Canny hysteresis high threshold at full resolution
+    :param keep_outlines: Also draw the instance outlines
+    """
+    settings = {'refine': refine, 'margin': margin, 'use_masks': use_masks, 'pyramid_levels': pyramid_levels,
+                'low_threshold': low_threshold, 'high_threshold': high_threshold, 'keep_outlines': keep_outlines}
+    for key, value in settings.items():
+        if value is not None:
+            _config[key] = value
+
+def get_edge_refinement_config():
+    return dict(_config)
+
+def detection_rois(object_data, frame_shape, margin):
+    """
+    Grow every object box by margin and merge overlapping boxes, so no pixel is processed twice.
+
+    :param object_data: List of object dictionaries with 'bbox' [x1, y1, x2, y2]
+    :param frame_shape: (height, width) to clip to
+    :param margin: Fraction of the larger box side added on every side
+    :return: List of (x1, y1, x2, y2, objects) with exclusive x2, y2 and the objects inside the region
+    """
+    height, width = frame_shape[:2]
+    rois = []
+    for obj in object_data:
+        x1, y1, x2, y2 = obj['bbox']
+        pad = int(np.ceil(margin * max(x2 - x1, y2 - y1)))
+        rois.append([max(0, x1 - pad), max(0, y1 - pad), min(width, x2 + pad + 1), min(height, y2 + pad + 1),
+                     [(obj, pad)]])
+
+    merged = True
+    while merged:
+        merged = False
+        for first in range(len(rois)):
+            for second in range(first + 1, len(rois)):
+                a, b = rois[first], rois[second]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    rois[first] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]), a[4] + b[4]]
+                    del rois[second]
+                    merged = True
+                    break
+            if merged:
+                break
+    return [tuple(roi) for roi in rois]
+
+def _gray_roi(frame_pixels, roi, channel_order):
+    x1, y1, x2, y2 = roi[:4]
+    # A view into the frame buffer; only the region is converted
+    crop = frame_pixels[y1:y2, x1:x2]
+    if crop.dtype != np.uint8:
+        crop = (np.clip(crop, 0.0, 1.0) * 255).astype(np.uint8)
+    if crop.ndim == 2:
+        return crop
+    codes = {('RGB', 3): cv2.COLOR_RGB2GRAY, ('RGB', 4): cv2.COLOR_RGBA2GRAY,
+             ('BGR', 3): cv2.COLOR_BGR2GRAY, ('BGR', 4): cv2.COLOR_BGRA2GRAY}
+    return cv2.cvtColor(crop, codes[(channel_order, crop.shape[2])])
+
+def _roi_mask(roi, shape):
+    # Instance masks grown by each object's margin, in region coordinates
+    x1, y1 = roi[:2]
+    mask = np.zeros(shape, dtype=np.uint8)
+    for obj, pad in roi[4]:
+        obj_mask = np.zeros(shape, dtype=np.uint8)
+        polygons = [np.round(polygon - (x1, y1)).astype(np.int32) for polygon in obj['polygons']]
+        cv2.fillPoly(obj_mask, polygons, 255)
+        if pad:
+            obj_mask = cv2.dilate(obj_mask, cv2.getStructuringElement(cv2.MORPH_RECT, (2 * pad + 1, 2 * pad + 1)))
+        np.maximum(mask, obj_mask, out=mask)
+    return mask
+
+def refine_roi_edges(gray, low_threshold, high_threshold, pyramid_levels=2, mask=None):
+    """
+    Canny edges of one region, coarse to fine.
+
+    The region is first searched at a downsampled pyramid level; full-resolution Canny then only runs
+    on the rows of tiles that contain coarse edges.
 
-def perform_yolo_edge_detection(frame_pixels):
+    :param gray: uint8 grayscale region (height, width)
+    :param mask: Optional uint8 mask of the region; edges outside it are dropped
+    :return: Tuple of (uint8 edges (height, width), pixels Canny ran on at full resolution)
+    """
+    height, width = gray.shape
+    if pyramid_levels == 0:
+        edges = cv2.Canny(gray, low_threshold, high_threshold)
+        full_res_pixels = gray.size
+    else:
+        coarse = gray
+        for _ in range(pyramid_levels):
+            coarse = cv2.pyrDown(coarse)
+        # Downsampling smooths gradients, so the coarse pass uses half the thresholds to keep weak edges
+        coarse_edges = cv2.Canny(coarse, low_threshold / 2, high_threshold / 2)
+        if mask is not None:
+            coarse_edges &= cv2.resize(mask, coarse.shape[::-1], interpolation=cv2.INTER_NEAREST)
+
+        # Tiles with a coarse edge, grown by one tile for edges that straddle a tile border
+        tiles_y, tiles_x = -(-height // REFINE_TILE), -(-width // REFINE_TILE)
+        rows, columns = np.nonzero(coarse_edges)
+        active = np.zeros((tiles_y, tiles_x), dtype=np.uint8)
+        scale = 2 ** pyramid_levels
+        active[np.minimum(rows * scale // REFINE_TILE, tiles_y - 1),
+               np.minimum(columns * scale // REFINE_TILE, tiles_x - 1)] = 1
+        active = cv2.dilate(active, np.ones((3, 3), dtype=np.uint8))
+
+        edges = np.zeros_like(gray)
+        full_res_pixels = 0
+        for tile_row, first, last in zip(*find_horizontal_runs(active.astype(bool))):
+            y1, y2 = tile_row * REFINE_TILE, min(height, (tile_row + 1) * REFINE_TILE)
+            x1, x2 = first * REFINE_TILE, min(width, last * REFINE_TILE)
+            pad_y1, pad_x1 = max(0, y1 - TILE_PAD), max(0, x1 - TILE_PAD)
+            pad_y2, pad_x2 = min(height, y2 + TILE_PAD), min(width, x2 + TILE_PAD)
+            tile_edges = cv2.Canny(gray[pad_y1:pad_y2, pad_x1:pad_x2], low_threshold, high_threshold)
+            edges[y1:y2, x1:x2] = tile_edges[y1 - pad_y1:y2 - pad_y1, x1 - pad_x1:x2 - pad_x1]
+            full_res_pixels += tile_edges.size
+
+    if mask is not None:
+        edges &= mask
+    return edges, full_res_pixels
+
+def draw_refined_edges(edge_mask, frame_pixels, object_data, channel_order='BGR', config=None):
+    """
+    Add Canny edges found inside the detected objects to an edge mask.
+
+    :param edge_mask: uint8 mask (height, width) to draw into
+    :param frame_pixels: The frame the detections came from, (height, width[, channels])
+    :param object_data: Objects with 'bbox' and 'polygons', see yolo_segmentation.instance_polygons
+    :param channel_order: Channel order of frame_pixels, 'RGB' or 'BGR'
+    :return: Dictionary with the region pixels read, the pixels Canny ran on at full resolution
+             and the frame's pixel count
+    """
+    config = config or _config
+    with span('edge_refinement') as counts:
+        counts.update(roi_pixels=0, full_res_pixels=0, frame_pixels=edge_mask.size)
+        for roi in detection_rois(object_data, edge_mask.shape, config['margin']):
+            x1, y1, x2, y2 = roi[:4]
+            gray = _gray_roi(frame_pixels, roi, channel_order)
+            mask = _roi_mask(roi, gray.shape) if config['use_masks'] else None
+            edges, full_res_pixels = refine_roi_edges(gray, config['low_threshold'], config['high_threshold'],
+                                                      config['pyramid_levels'], mask)
+            region = edge_mask[y1:y2, x1:x2]
+            np.maximum(region, edges, out=region)
+            counts['roi_pixels'] += gray.size
+            counts['full_res_pixels'] += full_res_pixels
+    return dict(counts)
+
+def edge_mask_from_detections(detections, confidence_threshold=0.5, frame_pixels=None, channel_order='BGR',
+                              object_data=None):
+    """
+    Draw the instance mask outline of every confident detection into an edge mask, and the image
+    edges inside them when refinement is configured and the frame is given.
+
+    :param detections: Result of yolo_detection.run_yolo_detection
+    :param confidence_threshold: Minimum confidence for an object to be outlined
+    :param frame_pixels: The frame the detections came from; needed for refinement
+    :param channel_order: Channel order of frame_pixels, 'RGB' or 'BGR'
+    :param object_data: The frame's yolo_segmentation.instance_polygons at this or a lower threshold,
+                        so the instance masks are not decoded and traced again
+    :return: uint8 mask (height, width) with edges set to 255
+    """
+    refine = _config['refine'] and frame_pixels is not None
+    with span('edge_mask') as counts:
+        edge_mask = np.zeros(detections['frame_shape'], dtype=np.uint8)
+        if object_data is None:
+            object_data = instance_polygons(detections, confidence_threshold)
+        else:
+            object_data = [obj for obj in object_data if obj['confidence'] > confidence_threshold]
+        polygons = [np.round(polygon).astype(np.int32) for obj in object_data for polygon in obj['polygons']]
+        if polygons and (_config['keep_outlines'] or not refine):
+            cv2.polylines(edge_mask, polygons, True, 255, 1)
+        counts['polygons'] = len(polygons)
+    if refine and object_data:
+        stats = draw_refined_edges(edge_mask, frame_pixels, object_data, channel_order)
+        logger.debug(f"Edge refinement read {stats['roi_pixels']} of {stats['frame_pixels']} pixels, "
+                     f"Canny on {stats['full_res_pixels']} at full resolution")
+    return edge_mask
+
+def perform_yolo_edge_detection(frame_pixels, detections=None, channel_order='RGB', object_data=None):
     logger.info("Starting YOLO edge detection")
-    
-    # Ensure frame_pixels is in the correct format (uint8, BGR)
-    if frame_pixels.dtype != np.uint8:
-        frame_pixels = (frame_pixels * 255).astype(np.uint8)
-    if frame_pixels.shape[2] == 4:  # RGBA
-        frame_pixels = cv2.cvtColor(frame_pixels, cv2.COLOR_RGBA2BGR)
-    elif frame_pixels.shape[2] == 3:  # RGB
-        frame_pixels = cv2.cvtColor(frame_pixels, cv2.COLOR_RGB2BGR)
-
-    # Load YOLO model
-    try:
-        model = load_yolo_model()
-    except Exception as e:
-        logger.error(f"Error loading YOLO model: {str(e)}")
-        return None
 
-    # Perform YOLO segmentation
+    # Reuse the shared inference pass when the caller already ran it
+    if detections is None:
+        detections = run_yolo_detection(frame_pixels, channel_order=channel_order)
+        if detections is None:
+            return None
+
     try:
-        logger.debug("Performing YOLO segmentation")
-        # Convert frame to tensor
-        frame_tensor = torch.from_numpy(frame_pixels).float().permute(2, 0, 1).unsqueeze(0) / 255.0
-        
-        # Run inference
-        with torch.no_grad():
-            output = model(frame_tensor)
-        
-        # Process output to create edge mask
-        edge_mask = np.zeros(frame_pixels.shape[:2], dtype=np.uint8)
-        
-        # Adjust this part based on the actual output format of your model
-        for detection in output[0]:
-            if len(detection) >= 6 and detection[4] > 0.5:  # Confidence threshold
-                x1, y1, x2, y2 = detection[:4].int().cpu().numpy()
-                cv2.rectangle(edge_mask, (x1, y1), (x2, y2), 255, 1)
-        
-        logger.debug("YOLO segmentation completed")
+        edge_mask = edge_mask_from_detections(detections, frame_pixels=frame_pixels, channel_order=channel_order,
+                                              object_data=object_data)
     except Exception as e:
-        logger.error(f"Error during YOLO segmentation: {str(e)}")
+        logger.error(f"Error during YOLO edge detection: {str(e)}")
         return None
 
     logger.info(f"Edge detection completed. Mask shape: {edge_mask.shape}")
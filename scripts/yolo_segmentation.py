@@ -1,79 +1,141 @@
 import cv2
 import numpy as np
-import torch
-import os
 import logging
+from instrumentation import span
+from yolo_detection import run_yolo_detection
+from polyline_pool import masks_to_polygons
 
 # Setup logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-# Path to the YOLO model file
-MODEL_NAME = 'yolov8x-seg.pt'
-EDGE2GP_DIR = r"C:\Users\DanTh\Documents\Blender\edge2gp"  # Update this path if necessary
-MODEL_PATH = os.path.join(EDGE2GP_DIR, MODEL_NAME)
+# YOLOv8-seg protos are a quarter of the model input resolution (160x160 for 640)
+PROTO_STRIDE = 4
+# Contours covering fewer proto pixels than this are noise
+MIN_CONTOUR_AREA = 1.0
+# Douglas-Peucker tolerance in proto pixels; a proto pixel covers PROTO_STRIDE model input pixels
+POLYGON_TOLERANCE = 0.5
 
-def load_yolo_model():
-    logger.debug(f"Attempting to load YOLO model from: {MODEL_PATH}")
-    if not os.path.exists(MODEL_PATH):
-        logger.error(f"YOLO model not found at: {MODEL_PATH}")
-        raise FileNotFoundError(f"YOLO model not found at: {MODEL_PATH}")
-    
-    logger.info(f"Loading YOLO model from: {MODEL_PATH}")
-    try:
-        # Load the model weights directly using PyTorch
-        model = torch.load(MODEL_PATH, map_location='cpu')
-        logger.info("YOLO model loaded successfully")
-        return model
-    except Exception as e:
-        logger.error(f"Error loading YOLO model: {str(e)}")
-        raise
+def decode_instance_masks(detections, indices):
+    """
+    Decode the masks of the given detections at proto resolution.
+
+    All instances sharing a proto stack are decoded with one matrix product and cropped
+    to their boxes with broadcast comparisons; nothing is upsampled to the frame size.
+    Detections moved by temporal.propagate_detections are cropped to their original boxes
+    and get a transform that includes their shift.
+
+    :param detections: Result of yolo_detection.run_yolo_detection with protos
+    :param indices: Detection indices to decode
+    :return: Tuple of (bool masks (len(indices), ph, pw), float32 transforms (len(indices), 3)) with the
+             (scale, offset_x, offset_y) that maps each instance's source pixels to model input pixels
+    """
+    protos = detections['protos']
+    proto_index = detections['proto_index'][indices]
+    num_coefficients, proto_height, proto_width = protos.shape[1:]
+    masks = np.zeros((len(indices), proto_height, proto_width), dtype=bool)
+    transforms = np.zeros((len(indices), 3), dtype=np.float32)
+    for view in np.unique(proto_index):
+        rows = np.flatnonzero(proto_index == view)
+        selected = indices[rows]
+        logits = detections['mask_coefficients'][selected] @ protos[view].reshape(num_coefficients, -1)
+        # sigmoid(x) > 0.5 is x > 0, so the sigmoid itself is never computed
+        instance_masks = logits.reshape(len(selected), proto_height, proto_width) > 0
+
+        scale, offset_x, offset_y = detections['proto_transforms'][view].tolist()
+        boxes = detections.get('mask_boxes', detections['boxes'])[selected] * scale
+        boxes[:, [0, 2]] += offset_x
+        boxes[:, [1, 3]] += offset_y
+        boxes /= PROTO_STRIDE
+        centers_x = np.arange(proto_width, dtype=np.float32) + 0.5
+        centers_y = np.arange(proto_height, dtype=np.float32) + 0.5
+        instance_masks &= ((centers_x[None, None, :] >= boxes[:, 0, None, None]) &
+                           (centers_x[None, None, :] <= boxes[:, 2, None, None]) &
+                           (centers_y[None, :, None] >= boxes[:, 1, None, None]) &
+                           (centers_y[None, :, None] <= boxes[:, 3, None, None]))
+
+        masks[rows] = instance_masks
+        transforms[rows] = (scale, offset_x, offset_y)
+        shifts = detections.get('mask_shifts')
+        if shifts is not None:
+            # Moving the source by (dx, dy) moves the proto origin by -(dx, dy) * scale
+            transforms[rows, 1:] -= shifts[selected] * scale
+    return masks, transforms
+
+def instance_polygons(detections, confidence_threshold=0.3):
+    """
+    Build per-instance polygons with real class ids and names.
+
+    Instance masks are traced, holes included, on the polyline pool; the polygons of an object
+    start with its outer boundaries, largest first, followed by its holes.
+    Falls back to box outlines for results without mask protos.
+
+    :param detections: Result of yolo_detection.run_yolo_detection
+    :param confidence_threshold: Minimum confidence for an object to be kept
+    :return: List of object dictionaries
+    """
+    indices = np.flatnonzero(detections['scores'] > confidence_threshold)
+    names = detections.get('names') or {}
+    has_masks = detections.get('protos') is not None and len(indices) > 0
+    if has_masks:
+        masks, transforms = decode_instance_masks(detections, indices)
+        traced = masks_to_polygons(masks, transforms, detections['frame_shape'], PROTO_STRIDE,
+                                   MIN_CONTOUR_AREA, POLYGON_TOLERANCE)
+
+    object_data = []
+    for position, index in enumerate(indices.tolist()):
+        x1, y1, x2, y2 = detections['boxes'][index].tolist()
+        if has_masks:
+            polygons, outer = traced[position]
+            if not outer:
+                continue
+        else:
+            polygons = [np.array([[x1, y1], [x2, y1], [x2, y2], [x1, y2]], dtype=np.float32)]
 
-def perform_yolo_segmentation(frame_pixels, confidence_threshold=0.3):
+        class_id = int(detections['classes'][index])
+        object_data.append({
+            'class': names.get(class_id, str(class_id)),
+            'class_id': class_id,
+            'confidence': float(detections['scores'][index]),
+            'bbox': [int(x1), int(y1), int(x2), int(y2)],
+            'segmentation': polygons[0].tolist(),
+            'polygons': polygons,
+        })
+    return object_data
+
+def segmentation_from_detections(detections, confidence_threshold=0.3, object_data=None):
+    """
+    Build the segmentation mask and per-object data from a detection result.
+
+    Only the combined mask is drawn at frame resolution; instance masks stay at proto resolution.
+
+    :param detections: Result of yolo_detection.run_yolo_detection
+    :param confidence_threshold: Minimum confidence for an object to be kept
+    :param object_data: The frame's instance_polygons at confidence_threshold, when already built
+    :return: Tuple of (uint8 mask (height, width), list of object dictionaries)
+    """
+    with span('mask_postprocess') as counts:
+        segmentation_mask = np.zeros(detections['frame_shape'], dtype=np.uint8)
+        if object_data is None:
+            object_data = instance_polygons(detections, confidence_threshold)
+        for obj in object_data:
+            # One call per object, so its holes stay empty; a single call for all objects would
+            # also cancel out overlapping instances
+            cv2.fillPoly(segmentation_mask, [np.round(polygon).astype(np.int32) for polygon in obj['polygons']], 255)
+        counts['objects'] = len(object_data)
+    return segmentation_mask, object_data
+
+def perform_yolo_segmentation(frame_pixels, confidence_threshold=0.3, detections=None, object_data=None):
     logger.info("Starting YOLO segmentation")
-    
-    # Ensure frame_pixels is in the correct format (uint8, BGR)
-    if frame_pixels.dtype != np.uint8:
-        frame_pixels = (frame_pixels * 255).astype(np.uint8)
-    if frame_pixels.shape[2] == 4:  # RGBA
-        frame_pixels = cv2.cvtColor(frame_pixels, cv2.COLOR_RGBA2BGR)
-    elif frame_pixels.shape[2] == 3:  # RGB
-        frame_pixels = cv2.cvtColor(frame_pixels, cv2.COLOR_RGB2BGR)
-
-    # Load YOLO model
-    try:
-        model = load_yolo_model()
-    except Exception as e:
-        logger.error(f"Error loading YOLO model: {str(e)}")
-        return None, None
 
-    # Perform YOLO segmentation
+    # Reuse the shared inference pass when the caller already ran it
+    if detections is None:
+        detections = run_yolo_detection(frame_pixels, confidence_threshold=confidence_threshold)
+        if detections is None:
+            return None, None
+
     try:
-        logger.debug("Performing YOLO segmentation")
-        # Convert frame to tensor
-        frame_tensor = torch.from_numpy(frame_pixels).float().permute(2, 0, 1).unsqueeze(0) / 255.0
-        
-        # Run inference
-        with torch.no_grad():
-            output = model(frame_tensor)
-        
-        # Process output to create segmentation mask and object data
-        segmentation_mask = np.zeros(frame_pixels.shape[:2], dtype=np.uint8)
-        object_data = []
-        
-        for detection in output[0]:
-            if detection[4] > confidence_threshold:
-                x1, y1, x2, y2 = detection[:4].int().cpu().numpy()
-                cv2.rectangle(segmentation_mask, (x1, y1), (x2, y2), 255, -1)
-                
-                object_data.append({
-                    'class': 'object',  # We don't have class names in this simplified version
-                    'confidence': float(detection[4]),
-                    'bbox': [x1, y1, x2, y2],
-                    'segmentation': [[x1, y1], [x2, y1], [x2, y2], [x1, y2]]
-                })
-        
-        logger.debug("YOLO segmentation completed")
+        segmentation_mask, object_data = segmentation_from_detections(detections, confidence_threshold, object_data)
     except Exception as e:
         logger.error(f"Error during YOLO segmentation: {str(e)}")
         return None, None
@@ -91,7 +153,7 @@ def draw_segmentation_results(image, segmentation_mask, object_data):
     for obj in object_data:
         bbox = obj['bbox']
         cv2.rectangle(result_image, (int(bbox[0]), int(bbox[1])), (int(bbox[2]), int(bbox[3])), (0, 255, 0), 2)
-        cv2.putText(result_image, f"Object {obj['confidence']:.2f}", (int(bbox[0]), int(bbox[1] - 10)),
+        cv2.putText(result_image, f"{obj['class']} {obj['confidence']:.2f}", (int(bbox[0]), int(bbox[1] - 10)),
                     cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
 
     return result_image
@@ -0,0 +1,209 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import numpy as np
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TESTS_DIR, '..', 'scripts'))
+try:
+    import bpy
+    FAKE_BPY = False
+except ImportError:
+    # Plain CPython: use the bpy/mathutils/bmesh stand-ins
+    sys.path.insert(0, os.path.join(TESTS_DIR, 'fake_bpy'))
+    import bpy
+    FAKE_BPY = True
+
+import yolo_detection
+from frame_extraction import get_movie_frame_pixels
+from yolo_detection import preprocess_frame, letterbox, frames_to_tensor, decode_yolo_output
+from yolo_edge_detection import edge_mask_from_detections
+from yolo_segmentation import segmentation_from_detections, instance_polygons
+from stroke_creation import create_grease_pencil_strokes, create_grease_pencil_from_segments
+from blender_utils import create_image_from_numpy, get_or_create_grease_pencil_object
+
+RESOLUTIONS = {
+    '720p': (1280, 720),
+    '1080p': (1920, 1080),
+    '4K': (3840, 2160),
+}
+STAGES = (
+    'get_movie_frame_pixels',
+    'preprocess',
+    'inference',
+    'create_grease_pencil_strokes',
+    'create_grease_pencil_from_segments',
+    'create_image_from_numpy',
+)
+# A stage regresses when it is this much slower than the baseline...
+DEFAULT_THRESHOLD = 0.25
+# ...and at least this many seconds slower, so sub-millisecond jitter never fails a run
+MIN_REGRESSION_S = 0.002
+
+class StubSegmentationModel:
+    """
+    Small deterministic stand-in for YOLOv8-seg with the same output layout.
+
+    Every stride-32 cell brighter than half becomes a class-0 box of three cells, and the
+    first mask proto is the input brightness, so masks follow the bright blobs of the frame.
+    """
+    names = {0: 'blob', 1: 'other'}
+    num_coefficients = 32
+
+    def __call__(self, batch):
+        count, _, height, width = batch.shape
+        gray = batch.mean(axis=1)
+        anchors = sum((height // stride) * (width // stride) for stride in (8, 16, 32))
+        predictions = np.zeros((count, 4 + len(self.names) + self.num_coefficients, anchors), dtype=np.float32)
+
+        cells = gray.reshape(count, height // 32, 32, width // 32, 32).mean(axis=(2, 4))
+        cell_ys, cell_xs = np.mgrid[0:height // 32, 0:width // 32]
+        flat = cells.reshape(count, -1)
+        predictions[:, 0, :flat.shape[1]] = (cell_xs.ravel() + 0.5) * 32
+        predictions[:, 1, :flat.shape[1]] = (cell_ys.ravel() + 0.5) * 32
+        predictions[:, 2:4, :flat.shape[1]] = 96
+        predictions[:, 4, :flat.shape[1]] = np.where(flat > 0.5, flat, 0)
+        predictions[:, 4 + len(self.names), :] = 1.0
+
+        protos = np.zeros((count, self.num_coefficients, height // 4, width // 4), dtype=np.float32)
+        protos[:, 0] = gray.reshape(count, height // 4, 4, width // 4, 4).mean(axis=(2, 4)) - 0.5
+        return predictions, [protos]
+
+def make_frame(width, height, blobs=12, seed=0):
+    """
+    Build a synthetic RGB uint8 plate of bright ellipses on a dark, noisy background.
+    """
+    rng = np.random.default_rng(seed)
+    ys, xs = np.ogrid[0:height, 0:width]
+    frame = np.zeros((height, width), dtype=np.float32)
+    for _ in range(blobs):
+        cx, cy = rng.uniform(0.1, 0.9) * width, rng.uniform(0.1, 0.9) * height
+        rx, ry = rng.uniform(0.02, 0.1) * width, rng.uniform(0.02, 0.1) * height
+        frame[((xs - cx) / rx) ** 2 + ((ys - cy) / ry) ** 2 <= 1] = 1.0
+    frame = np.clip(frame * 0.8 + rng.random((height, width), dtype=np.float32) * 0.15, 0, 1)
+    return np.repeat((frame * 255).astype(np.uint8)[:, :, None], 3, axis=2)
+
+def load_movie(frame_rgb, name="Benchmark Plate"):
+    """
+    Register a frame as the loaded movie, stored bottom-up like Blender does.
+    """
+    height, width = frame_rgb.shape[:2]
+    image = bpy.data.images.get(name) or bpy.data.images.new(name, width, height)
+    image.source = 'MOVIE'
+    rgba = np.ones((height, width, 4), dtype=np.float32)
+    rgba[:, :, :3] = frame_rgb[::-1] / 255.0
+    image.pixels.foreach_set(rgba.ravel())
+    return image
+
+def _timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def run_stages(frame_rgb, model):
+    """
+    Run every pipeline stage once on a frame.
+
+    :return: Dictionary of stage name to seconds, plus item counts
+    """
+    if FAKE_BPY:
+        bpy.reset()
+    load_movie(frame_rgb)
+    timings = {}
+
+    pixels, timings['get_movie_frame_pixels'] = _timed(get_movie_frame_pixels, dtype=np.uint8)
+
+    def preprocess():
+        image, transform = letterbox(preprocess_frame(pixels), yolo_detection.INPUT_SIZE)
+        return frames_to_tensor([image]), transform
+    (batch, (scale, pad_x, pad_y)), timings['preprocess'] = _timed(preprocess)
+
+    def infer():
+        output = model(batch)
+        return decode_yolo_output(output, pixels.shape[:2], names=model.names,
+                                  transform=(scale, float(pad_x), float(pad_y)))
+    detections, timings['inference'] = _timed(infer)
+
+    object_data = instance_polygons(detections)
+    edge_mask = edge_mask_from_detections(detections, object_data=object_data)
+    segmentation_mask, object_data = segmentation_from_detections(detections, object_data=object_data)
+    gp_object = get_or_create_grease_pencil_object("Edge2GP_Result")
+    _, timings['create_grease_pencil_strokes'] = _timed(
+        create_grease_pencil_strokes, gp_object, edge_mask, engine='contours')
+    _, timings['create_grease_pencil_from_segments'] = _timed(
+        create_grease_pencil_from_segments, gp_object, segmentation_mask, object_data)
+    _, timings['create_image_from_numpy'] = _timed(create_image_from_numpy, edge_mask, "YOLO_Edge_Mask")
+
+    timings['detections'] = len(detections['boxes'])
+    timings['objects'] = len(object_data)
+    return timings
+
+def run_benchmark(resolutions=RESOLUTIONS, repeats=3, model=None):
+    """
+    Time every stage on synthetic frames; each figure is the best of repeats runs.
+
+    :return: Dictionary of resolution label to stage timings in seconds
+    """
+    model = model or StubSegmentationModel()
+    results = {}
+    for label, (width, height) in resolutions.items():
+        frame_rgb = make_frame(width, height)
+        runs = [run_stages(frame_rgb, model) for _ in range(repeats)]
+        results[label] = {stage: min(run[stage] for run in runs) for stage in STAGES}
+        results[label]['detections'] = runs[0]['detections']
+        results[label]['objects'] = runs[0]['objects']
+    return results
+
+def compare_results(results, baseline, threshold=DEFAULT_THRESHOLD, min_regression=MIN_REGRESSION_S):
+    """
+    List the stages that got slower than the baseline allows.
+
+    :param results: Current 'results' dictionary
+    :param baseline: Baseline 'results' dictionary
+    :return: List of (resolution, stage, baseline seconds, current seconds)
+    """
+    regressions = []
+    for label, stages in results.items():
+        for stage in STAGES:
+            if label not in baseline or stage not in baseline[label]:
+                continue
+            before, now = baseline[label][stage], stages[stage]
+            if now > before * (1 + threshold) and now - before > min_regression:
+                regressions.append((label, stage, before, now))
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark every Edge2GP pipeline stage headless")
+    parser.add_argument('--resolutions', nargs='+', choices=list(RESOLUTIONS), default=list(RESOLUTIONS))
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--output', default='benchmark_results.json', help="Where to write the results")
+    parser.add_argument('--baseline', default=None, help="Results JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed slowdown per stage as a fraction, e.g. 0.25 for 25%%")
+    args = parser.parse_args()
+
+    results = run_benchmark({label: RESOLUTIONS[label] for label in args.resolutions}, args.repeats)
+    for label, stages in results.items():
+        print(f"{label} ({stages['detections']} detections, {stages['objects']} objects)")
+        for stage in STAGES:
+            print(f"  {stage:<36} {stages[stage] * 1000:9.2f} ms")
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'fake_bpy': FAKE_BPY,
+            'results': results,
+        }, f, indent=2)
+    print(f"Wrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_results(results, json.load(f)['results'], args.threshold)
+        for label, stage, before, now in regressions:
+            print(f"REGRESSION {label} {stage}: {before * 1000:.2f} ms -> {now * 1000:.2f} ms")
+        sys.exit(1 if regressions else 0)
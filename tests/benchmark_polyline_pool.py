@@ -0,0 +1,132 @@
+import os
+import sys
+import time
+import argparse
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+import polyline_pool
+from stroke_geometry import mask_to_contour_strokes
+
+def make_instance_mask(width=3840, height=2160, instances=50, seed=0):
+    """
+    Build a synthetic edge mask of detected instances: one irregular outline per instance
+    plus its interior edges, like the mask yolo_edge_detection draws with refinement enabled.
+    """
+    rng = np.random.default_rng(seed)
+    mask = np.zeros((height, width), dtype=np.uint8)
+    for _ in range(instances):
+        center = rng.uniform((0.05 * width, 0.05 * height), (0.95 * width, 0.95 * height))
+        radius = rng.uniform(0.02, 0.06) * width
+        angles = np.linspace(0, 2 * np.pi, 720, endpoint=False)
+        wobble = 1 + 0.15 * np.sin(angles * rng.integers(3, 9)) + rng.normal(0, 0.01, len(angles))
+        outline = center + radius * wobble[:, None] * np.column_stack([np.cos(angles), np.sin(angles)])
+        cv2.polylines(mask, [outline.astype(np.int32)], True, 255, 2)
+        for _ in range(6):
+            start = center + rng.uniform(-0.6, 0.6, 2) * radius
+            end = start + rng.uniform(-0.3, 0.3, 2) * radius
+            cv2.line(mask, tuple(start.astype(int)), tuple(end.astype(int)), 255, 1)
+    return mask > 0
+
+def make_instance_masks(instances=50, size=320, seed=0):
+    """
+    Build proto-resolution instance masks like yolo_segmentation.decode_instance_masks returns for
+    a 1280 model input: one irregular blob per instance, most with holes, and their transforms.
+    """
+    rng = np.random.default_rng(seed)
+    masks = np.zeros((instances, size, size), dtype=np.uint8)
+    angles = np.linspace(0, 2 * np.pi, 1440, endpoint=False)
+    for mask in masks:
+        center = rng.uniform(0.3 * size, 0.7 * size, 2)
+        radius = rng.uniform(0.15, 0.3) * size
+        wobble = 1 + 0.2 * np.sin(angles * rng.integers(3, 9)) + 0.05 * np.sin(angles * rng.integers(40, 80))
+        outline = center + radius * wobble[:, None] * np.column_stack([np.cos(angles), np.sin(angles)])
+        cv2.fillPoly(mask, [outline.astype(np.int32)], 1)
+        for _ in range(rng.integers(0, 4)):
+            hole = center + rng.uniform(-0.5, 0.5, 2) * radius
+            cv2.circle(mask, tuple(hole.astype(int)), int(rng.uniform(0.05, 0.15) * radius), 0, -1)
+    # A 3840x2160 frame letterboxed into 1280x1280: scale 1/3, 280 pixels of padding on top
+    transforms = np.tile(np.array([[1 / 3, 0, 280]], dtype=np.float32), (instances, 1))
+    return masks > 0, transforms
+
+def run_instance_benchmark(worker_counts, use_processes=False, repeats=5, instances=50):
+    masks, transforms = make_instance_masks(instances)
+    frame_shape, stride, tolerance = (2160, 3840), 4, 0.5
+    serial_time = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        polyline_pool.trace_mask_range(masks, transforms, frame_shape, stride, 1.0, tolerance)
+        serial_time = min(serial_time, time.perf_counter() - start)
+
+    results = {'serial': {'instances': instances, 'seconds': serial_time}}
+    for workers in worker_counts:
+        polyline_pool.configure_polyline_pool(workers=workers, use_processes=use_processes)
+        # Warm-up starts the pool, so its start-up is not timed
+        polyline_pool.masks_to_polygons(masks, transforms, frame_shape, stride, 1.0, tolerance)
+        best = float('inf')
+        for _ in range(repeats):
+            start = time.perf_counter()
+            polygons = polyline_pool.masks_to_polygons(masks, transforms, frame_shape, stride, 1.0, tolerance)
+            best = min(best, time.perf_counter() - start)
+        results[workers] = {
+            'instances': len(polygons),
+            'seconds': best,
+            'speedup': serial_time / best,
+            'efficiency': serial_time / best / workers,
+        }
+    polyline_pool.shutdown_pool()
+    return results
+
+def run_benchmark(worker_counts, use_processes=True, tolerance=0.0005, repeats=3, instances=50):
+    mask = make_instance_mask(instances=instances)
+    serial_time = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        coords, offsets = mask_to_contour_strokes(mask, tolerance)
+        serial_time = min(serial_time, time.perf_counter() - start)
+
+    results = {'serial': {'strokes': len(offsets) - 1, 'points': int(offsets[-1]), 'seconds': serial_time}}
+    for workers in worker_counts:
+        polyline_pool.configure_polyline_pool(workers=workers, use_processes=use_processes)
+        # Warm-up starts the pool, so its start-up is not timed
+        polyline_pool.mask_to_contour_strokes_parallel(mask, tolerance)
+        best = float('inf')
+        for _ in range(repeats):
+            start = time.perf_counter()
+            coords, offsets = polyline_pool.mask_to_contour_strokes_parallel(mask, tolerance)
+            best = min(best, time.perf_counter() - start)
+        results[workers] = {
+            'strokes': len(offsets) - 1,
+            'points': int(offsets[-1]),
+            'seconds': best,
+            'speedup': serial_time / best,
+            'efficiency': serial_time / best / workers,
+        }
+    polyline_pool.shutdown_pool()
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time parallel mask-to-polyline tracing on a 50-instance 4K frame")
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, 2, 4, 8, os.cpu_count() or 1} & set(range(1, (os.cpu_count() or 1) + 1))))
+    parser.add_argument('--threads', action='store_true', help="Use the thread pool instead of processes")
+    parser.add_argument('--instances', type=int, default=50)
+    parser.add_argument('--masks', action='store_true',
+                        help="Time per-instance mask tracing (yolo_segmentation) instead of the edge mask")
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} cores")
+    if args.masks:
+        for workers, result in run_instance_benchmark(args.workers, not args.threads, instances=args.instances).items():
+            line = f"{workers:>6}: {result['instances']} instances, {result['seconds'] * 1000:.1f}ms"
+            if workers != 'serial':
+                line += f", speedup {result['speedup']:.2f}x, efficiency {result['efficiency']:.0%}"
+            print(line)
+        sys.exit()
+    for workers, result in run_benchmark(args.workers, not args.threads, instances=args.instances).items():
+        line = f"{workers:>6}: {result['strokes']} strokes, {result['points']} points, {result['seconds'] * 1000:.1f}ms"
+        if workers != 'serial':
+            line += f", speedup {result['speedup']:.2f}x, efficiency {result['efficiency']:.0%}"
+        print(line)
@@ -0,0 +1,78 @@
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from stroke_geometry import mask_to_run_strokes
+
+RESOLUTIONS = {
+    '720p': (1280, 720),
+    '1080p': (1920, 1080),
+    '4K': (3840, 2160),
+}
+
+def make_edge_mask(width, height, boxes=40, seed=0):
+    """
+    Build a synthetic edge mask of box outlines plus scattered edge pixels.
+    """
+    rng = np.random.default_rng(seed)
+    mask = np.zeros((height, width), dtype=bool)
+    for _ in range(boxes):
+        x1, x2 = np.sort(rng.integers(0, width, 2))
+        y1, y2 = np.sort(rng.integers(0, height, 2))
+        mask[y1, x1:x2 + 1] = True
+        mask[y2, x1:x2 + 1] = True
+        mask[y1:y2 + 1, x1] = True
+        mask[y1:y2 + 1, x2] = True
+    mask |= rng.random((height, width)) > 0.995
+    return mask
+
+def legacy_run_strokes(mask):
+    """
+    Per-pixel loop equivalent to the original create_grease_pencil_strokes, minus bpy.
+    """
+    height, width = mask.shape
+    strokes = []
+    for y in range(height):
+        stroke = None
+        for x in range(width):
+            if mask[y, x]:
+                if stroke is None:
+                    stroke = []
+                    strokes.append(stroke)
+                stroke.append((x / width, 1 - y / height, 0))
+            elif stroke is not None:
+                stroke = None
+    return strokes
+
+def run_benchmark(resolutions=RESOLUTIONS, repeats=3):
+    results = {}
+    for label, (width, height) in resolutions.items():
+        mask = make_edge_mask(width, height)
+
+        start = time.perf_counter()
+        legacy_run_strokes(mask)
+        legacy_time = time.perf_counter() - start
+
+        vectorized_time = float('inf')
+        for _ in range(repeats):
+            start = time.perf_counter()
+            coords, offsets = mask_to_run_strokes(mask)
+            vectorized_time = min(vectorized_time, time.perf_counter() - start)
+
+        results[label] = {
+            'points': int(offsets[-1]),
+            'strokes': len(offsets) - 1,
+            'legacy_s': legacy_time,
+            'vectorized_s': vectorized_time,
+            'speedup': legacy_time / vectorized_time,
+        }
+    return results
+
+if __name__ == "__main__":
+    for label, result in run_benchmark().items():
+        print(f"{label:>6}: {result['strokes']} strokes, {result['points']} points, "
+              f"legacy {result['legacy_s']:.3f}s, vectorized {result['vectorized_s'] * 1000:.1f}ms, "
+              f"speedup {result['speedup']:.0f}x")
@@ -0,0 +1,3 @@
+"""
+Lightweight stand-in for Blender's bmesh module; the pipeline only imports it.
+"""
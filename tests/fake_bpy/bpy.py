@@ -0,0 +1,349 @@
+"""
+Lightweight stand-in for Blender's bpy module.
+
+Covers the parts of the API the Edge2GP pipeline touches (images, legacy and v3 Grease Pencil
+datablocks, scene frame settings, operators and registration) so the pipeline stages can
+run and be timed on plain CPython. Pixel and point data live in NumPy arrays, so bulk
+foreach_get/foreach_set cost roughly what they cost in Blender.
+"""
+import tempfile
+import numpy as np
+
+class _Namespace:
+    def __init__(self, **attributes):
+        self.__dict__.update(attributes)
+
+class _PixelBuffer:
+    def __init__(self, width, height):
+        self._values = np.zeros(width * height * 4, dtype=np.float32)
+
+    def __len__(self):
+        return len(self._values)
+
+    def foreach_get(self, target):
+        target[...] = self._values
+
+    def foreach_set(self, values):
+        self._values[...] = values
+
+class Image:
+    def __init__(self, name, width, height, alpha=False):
+        self.name = name
+        self.size = (width, height)
+        self.alpha = alpha
+        self.source = 'GENERATED'
+        self.filepath = ''
+        self.has_data = True
+        self.pixels = _PixelBuffer(width, height)
+
+    def update(self):
+        pass
+
+    def scale(self, width, height):
+        self.size = (width, height)
+        self.pixels = _PixelBuffer(width, height)
+
+class _IdCollection:
+    """
+    Name-keyed datablock collection, like bpy.data.images.
+    """
+    def __init__(self, factory):
+        self._items = {}
+        self._factory = factory
+
+    def __iter__(self):
+        return iter(list(self._items.values()))
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, name):
+        return name in self._items
+
+    def __getitem__(self, name):
+        return self._items[name]
+
+    def get(self, name, default=None):
+        return self._items.get(name, default)
+
+    def new(self, name, *args, **kwargs):
+        item = self._factory(name, *args, **kwargs)
+        self._items[item.name] = item
+        return item
+
+    def remove(self, item):
+        self._items.pop(item.name, None)
+
+    def clear(self):
+        self._items.clear()
+
+class _StrokePoints:
+    def __init__(self):
+        self._co = np.zeros((0, 3), dtype=np.float32)
+        self._pressure = np.zeros(0, dtype=np.float32)
+        self._strength = np.zeros(0, dtype=np.float32)
+
+    def __len__(self):
+        return len(self._co)
+
+    def add(self, count, pressure=1.0, strength=1.0):
+        self._co = np.concatenate([self._co, np.zeros((count, 3), dtype=np.float32)])
+        self._pressure = np.concatenate([self._pressure, np.full(count, pressure, dtype=np.float32)])
+        self._strength = np.concatenate([self._strength, np.full(count, strength, dtype=np.float32)])
+
+    def foreach_set(self, attribute, values):
+        getattr(self, '_' + attribute).ravel()[...] = values
+
+    def foreach_get(self, attribute, target):
+        target[...] = getattr(self, '_' + attribute).ravel()
+
+class Stroke:
+    def __init__(self):
+        self.points = _StrokePoints()
+        self.display_mode = 'SCREEN'
+        self.line_width = 0
+        self.use_cyclic = False
+        self.material_index = 0
+
+class _Strokes(list):
+    def new(self):
+        stroke = Stroke()
+        self.append(stroke)
+        return stroke
+
+    def foreach_set(self, attribute, values):
+        for stroke, value in zip(self, np.asarray(values).tolist()):
+            setattr(stroke, attribute, type(getattr(stroke, attribute))(value))
+
+    def foreach_get(self, attribute, target):
+        target[...] = [getattr(stroke, attribute) for stroke in self]
+
+class GPencilFrame:
+    def __init__(self, frame_number):
+        self.frame_number = frame_number
+        self.strokes = _Strokes()
+
+class _Frames(list):
+    def new(self, frame_number):
+        frame = GPencilFrame(frame_number)
+        self.append(frame)
+        return frame
+
+class GPencilLayer:
+    def __init__(self, name):
+        self.info = name
+        self.frames = _Frames()
+
+class _Layers(list):
+    active = None
+
+    def get(self, name, default=None):
+        return next((layer for layer in self if layer.info == name), default)
+
+    def new(self, name, set_active=True):
+        layer = GPencilLayer(name)
+        self.append(layer)
+        if set_active:
+            self.active = layer
+        return layer
+
+class GreasePencil:
+    def __init__(self, name):
+        self.name = name
+        self.layers = _Layers()
+
+class _AttributeValues:
+    """
+    The data of a Grease Pencil v3 attribute; values live in one NumPy array.
+    """
+    def __init__(self, values):
+        self._values = values
+
+    def __len__(self):
+        return len(self._values)
+
+    def foreach_set(self, key, values):
+        self._values.ravel()[...] = values
+
+    def foreach_get(self, key, target):
+        target[...] = self._values.ravel()
+
+_ATTRIBUTE_TYPES = {'FLOAT': (np.float32, ()), 'FLOAT_VECTOR': (np.float32, (3,)), 'INT': (np.int32, ()),
+                    'BOOLEAN': (bool, ())}
+
+class _Attribute:
+    def __init__(self, name, data_type, domain, size):
+        self.name = name
+        self.domain = domain
+        dtype, shape = _ATTRIBUTE_TYPES[data_type]
+        self.data = _AttributeValues(np.zeros((size,) + shape, dtype=dtype))
+
+    def grow(self, count):
+        values = self.data._values
+        self.data._values = np.concatenate([values, np.zeros((count,) + values.shape[1:], dtype=values.dtype)])
+
+class _Attributes(dict):
+    def __init__(self, drawing):
+        super().__init__()
+        self._drawing = drawing
+
+    def new(self, name, data_type, domain):
+        offsets = self._drawing._offsets
+        size = int(offsets[-1]) if domain == 'POINT' else len(offsets) - 1
+        self[name] = _Attribute(name, data_type, domain, size)
+        return self[name]
+
+class GreasePencilDrawing:
+    """
+    Curves-based drawing of Grease Pencil v3 (Blender 4.3+).
+    """
+    def __init__(self):
+        self._offsets = np.zeros(1, dtype=np.int32)
+        self.attributes = _Attributes(self)
+        self.attributes.new('position', 'FLOAT_VECTOR', 'POINT')
+        self.add_strokes_calls = 0
+
+    @property
+    def curve_offsets(self):
+        return _AttributeValues(self._offsets)
+
+    def add_strokes(self, sizes):
+        self.add_strokes_calls += 1
+        sizes = np.asarray(sizes, dtype=np.int32)
+        self._offsets = np.concatenate([self._offsets, self._offsets[-1] + np.cumsum(sizes)])
+        for attribute in self.attributes.values():
+            attribute.grow(int(sizes.sum()) if attribute.domain == 'POINT' else len(sizes))
+
+class GreasePencilFrameV3:
+    def __init__(self, frame_number):
+        self.frame_number = frame_number
+        self.drawing = GreasePencilDrawing()
+
+class _FramesV3(list):
+    def new(self, frame_number):
+        if any(frame.frame_number == frame_number for frame in self):
+            raise RuntimeError(f"Frame {frame_number} already exists")
+        frame = GreasePencilFrameV3(frame_number)
+        self.append(frame)
+        return frame
+
+    def remove(self, frame_number):
+        super().remove(next(frame for frame in self if frame.frame_number == frame_number))
+
+class GreasePencilLayerV3:
+    def __init__(self, name):
+        self.name = name
+        self.frames = _FramesV3()
+
+class _LayersV3(list):
+    def get(self, name, default=None):
+        return next((layer for layer in self if layer.name == name), default)
+
+    def new(self, name):
+        layer = GreasePencilLayerV3(name)
+        self.append(layer)
+        return layer
+
+class GreasePencilV3:
+    def __init__(self, name):
+        self.name = name
+        self.layers = _LayersV3()
+
+class Object:
+    def __init__(self, name, object_data):
+        self.name = name
+        self.data = object_data
+        if isinstance(object_data, GreasePencilV3):
+            self.type = 'GREASEPENCIL'
+        else:
+            self.type = 'GPENCIL' if isinstance(object_data, GreasePencil) else 'MESH'
+        self.material_slots = []
+
+    def select_set(self, state):
+        self.selected = state
+
+class _ObjectList(list):
+    def link(self, obj):
+        self.append(obj)
+
+class _Operator:
+    """
+    Any bpy.ops call; records the call and reports success.
+    """
+    calls = []
+
+    def __init__(self, path):
+        self._path = path
+
+    def __getattr__(self, name):
+        return _Operator(f"{self._path}.{name}")
+
+    def __call__(self, *args, **kwargs):
+        _Operator.calls.append((self._path, kwargs))
+        return {'FINISHED'}
+
+class _Context:
+    def __init__(self):
+        self.mode = 'OBJECT'
+        self.scene = _Namespace(
+            frame_current=1, frame_start=1, frame_end=250, camera=None, active_clip=None,
+            render=_Namespace(fps=24, resolution_x=1920, resolution_y=1080),
+            collection=_Namespace(objects=_ObjectList()),
+        )
+        self.view_layer = _Namespace(objects=_Namespace(active=None))
+        self.screen = None
+        self.window_manager = _Namespace(windows=[])
+        self.preferences = _Namespace(addons={})
+
+    def copy(self):
+        return dict(self.__dict__)
+
+def _new_image(name, width, height, alpha=False, float_buffer=False):
+    return Image(name, width, height, alpha)
+
+data = _Namespace(
+    images=_IdCollection(_new_image),
+    objects=_IdCollection(Object),
+    grease_pencils=_IdCollection(GreasePencil),
+    grease_pencils_v3=_IdCollection(GreasePencilV3),
+    materials=_IdCollection(lambda name: _Namespace(name=name)),
+)
+context = _Context()
+ops = _Operator('ops')
+app = _Namespace(version=(4, 1, 0), tempdir=tempfile.gettempdir(), background=True, timers=None)
+path = _Namespace(abspath=lambda filepath, **kwargs: filepath)
+
+def _property(**kwargs):
+    return kwargs
+
+props = _Namespace(**{name: _property for name in (
+    'BoolProperty', 'IntProperty', 'FloatProperty', 'StringProperty', 'EnumProperty', 'PointerProperty',
+    'CollectionProperty', 'FloatVectorProperty',
+)})
+
+class _Base:
+    bl_idname = ''
+
+types = _Namespace(
+    Operator=type('Operator', (_Base,), {}),
+    Panel=type('Panel', (_Base,), {}),
+    PropertyGroup=type('PropertyGroup', (_Base,), {}),
+    AddonPreferences=type('AddonPreferences', (_Base,), {}),
+    Scene=type('Scene', (), {}),
+    VIEW3D_MT_gpencil_add=_Namespace(append=lambda func: None, remove=lambda func: None),
+)
+
+utils = _Namespace(
+    register_class=lambda cls: None,
+    unregister_class=lambda cls: None,
+)
+
+def reset():
+    """
+    Drop all datablocks and restore the default context, e.g. between benchmark runs.
+    """
+    global context
+    for collection in (data.images, data.objects, data.grease_pencils, data.grease_pencils_v3, data.materials):
+        collection.clear()
+    _Operator.calls.clear()
+    context = _Context()
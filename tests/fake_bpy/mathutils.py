@@ -0,0 +1,21 @@
+"""
+Lightweight stand-in for Blender's mathutils module.
+"""
+import numpy as np
+
+class Vector(tuple):
+    def __new__(cls, values=(0.0, 0.0, 0.0)):
+        return super().__new__(cls, (float(value) for value in values))
+
+    x = property(lambda self: self[0])
+    y = property(lambda self: self[1])
+    z = property(lambda self: self[2] if len(self) > 2 else 0.0)
+
+    def __add__(self, other):
+        return Vector(np.add(self, other))
+
+    def __sub__(self, other):
+        return Vector(np.subtract(self, other))
+
+    def __mul__(self, factor):
+        return Vector(np.multiply(self, factor))
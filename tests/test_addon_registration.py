@@ -0,0 +1,52 @@
+import os
+import sys
+import json
+import time
+import threading
+import subprocess
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.join(TESTS_DIR, '..')
+sys.path.insert(0, os.path.join(REPO_DIR, 'scripts'))
+
+import lazy_import
+
+# Runs in a fresh interpreter so modules imported by other tests do not count
+REGISTER_SCRIPT = """
+import sys, json
+sys.path[:0] = [{fake_bpy!r}, {scripts!r}, {repo!r}]
+HEAVY = ('torch', 'ultralytics', 'onnxruntime', 'openvino', 'cv2', 'main', 'yolo_detection', 'stroke_creation')
+requested = []
+
+class RecordingFinder:
+    def find_spec(self, name, path=None, target=None):
+        if name.split('.')[0] in HEAVY:
+            requested.append(name)
+        return None
+
+sys.meta_path.insert(0, RecordingFinder())
+import edge2gp_operator
+edge2gp_operator.register()
+import edge2gp
+edge2gp.register()
+print(json.dumps(sorted(set(requested))))
+"""
+
+def test_registration_does_not_import_the_ml_stack():
+    script = REGISTER_SCRIPT.format(fake_bpy=os.path.join(TESTS_DIR, 'fake_bpy'),
+                                    scripts=os.path.join(REPO_DIR, 'scripts'), repo=REPO_DIR)
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True)
+    assert json.loads(result.stdout.strip().splitlines()[-1]) == []
+
+def test_module_being_preloaded_is_returned_complete(tmp_path, monkeypatch):
+    (tmp_path / "slow_pipeline_module.py").write_text("import time\ntime.sleep(0.3)\nREADY = True\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, "slow_pipeline_module", raising=False)
+
+    preload = threading.Thread(target=lazy_import.import_timed, args=("slow_pipeline_module",))
+    preload.start()
+    while "slow_pipeline_module" not in sys.modules:
+        time.sleep(0.001)
+    assert lazy_import.import_timed("slow_pipeline_module").READY
+    preload.join()
+    assert lazy_import.get_import_times()["slow_pipeline_module"] >= 0.3
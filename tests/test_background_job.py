@@ -0,0 +1,66 @@
+import os
+import sys
+import time
+import cv2
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark_pipeline import bpy, make_frame, load_movie, StubSegmentationModel
+import frame_pipeline
+import background_job
+import main
+from yolo_detection import INPUT_SIZE, letterbox, frames_to_tensor, decode_yolo_output
+
+FRAMES = 5
+
+def stub_detect(frames):
+    model = StubSegmentationModel()
+    results = []
+    for frame in frames:
+        image, (scale, pad_x, pad_y) = letterbox(frame, INPUT_SIZE)
+        results.append(decode_yolo_output(model(frames_to_tensor([image])), frame.shape[:2], names=model.names,
+                                          transform=(scale, float(pad_x), float(pad_y))))
+    return results
+
+@pytest.fixture
+def movie(tmp_path, monkeypatch):
+    bpy.reset()
+    path = str(tmp_path / "plate.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 24, (320, 180))
+    for index in range(FRAMES):
+        writer.write(make_frame(320, 180, seed=index))
+    writer.release()
+    load_movie(make_frame(320, 180)).filepath = path
+    bpy.context.scene.frame_start, bpy.context.scene.frame_end = 1, FRAMES
+    monkeypatch.setattr(frame_pipeline, '_detect_bgr_batch', stub_detect)
+    return path
+
+def written_frames(job, layer_name="Segmentation_Layer"):
+    return [frame.frame_number for frame in job['gp_object'].data.layers.get(layer_name).frames]
+
+def test_job_writes_every_frame(movie):
+    job = background_job.start_job(frame_range=True, batch_size=2)
+    while not background_job.step_job(job):
+        time.sleep(0.001)
+    assert sorted(written_frames(job)) == list(range(1, FRAMES + 1))
+    assert main.last_run_stats['frames'] == FRAMES
+    assert background_job.get_active_job() is None
+
+def test_cancel_keeps_written_frames(movie):
+    job = background_job.start_job(frame_range=True, batch_size=1, queue_depth=1)
+    while job['done'] == 0:
+        # A zero budget writes at most one frame per step
+        background_job.step_job(job, budget=0)
+    stats = background_job.cancel_job(job)
+    assert stats['frames'] == len(written_frames(job)) < FRAMES
+    assert background_job.get_active_job() is None
+
+def test_job_on_a_frame_in_memory(monkeypatch):
+    bpy.reset()
+    bpy.context.scene.frame_current = 7
+    monkeypatch.setattr(frame_pipeline, 'run_yolo_detection_batch', lambda frames, **kwargs: stub_detect(frames))
+    job = background_job.start_job(frame_pixels=make_frame(320, 180), channel_order='BGR')
+    while not background_job.step_job(job):
+        time.sleep(0.001)
+    assert written_frames(job) == [7]
@@ -0,0 +1,57 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark_pipeline import bpy
+from batch_runner import shard_ranges, export_shard, import_shard, default_worker_count, WORKER_MEMORY
+from blender_utils import get_or_create_grease_pencil_object
+from stroke_creation import write_frame_stroke_arrays, read_frame_stroke_arrays
+
+def make_strokes(count, seed):
+    rng = np.random.default_rng(seed)
+    offsets = np.concatenate([[0], np.cumsum(rng.integers(2, 20, count))])
+    return {
+        'coords': rng.random((offsets[-1], 3), dtype=np.float32),
+        'offsets': offsets,
+        'line_width': np.full(count, 10, dtype=np.int32),
+        'use_cyclic': np.arange(count) % 2 == 0,
+        'material_index': np.arange(count, dtype=np.int32) % 3,
+        'pressure': rng.random(offsets[-1], dtype=np.float32),
+        'strength': rng.random(offsets[-1], dtype=np.float32),
+    }
+
+def test_shards_cover_the_range_contiguously():
+    shards = shard_ranges(1, 250, 8)
+    assert len(shards) == 8
+    assert shards[0][0] == 1 and shards[-1][1] == 250
+    assert all(previous[1] + 1 == current[0] for previous, current in zip(shards, shards[1:]))
+    assert max(last - first for first, last in shards) - min(last - first for first, last in shards) <= 1
+    assert shard_ranges(10, 12, 8) == [(10, 10), (11, 11), (12, 12)]
+
+def test_default_workers_are_bounded_by_memory():
+    assert default_worker_count(cores=32, memory=64 * WORKER_MEMORY) == 4
+    assert default_worker_count(cores=32, memory=2.5 * WORKER_MEMORY) == 2
+    assert default_worker_count(cores=2, memory=0) == 1
+
+def test_shards_merge_into_one_object(tmp_path):
+    bpy.reset()
+    paths = []
+    for number, frames in enumerate([(1, 2), (3, 4)]):
+        worker_object = bpy.data.objects.new(f"Worker{number}", bpy.data.grease_pencils.new(f"Worker{number}"))
+        for frame_number in frames:
+            write_frame_stroke_arrays(worker_object, "Edge_Layer", frame_number, make_strokes(5, frame_number))
+        paths.append(str(tmp_path / f"shard_{number}.npz"))
+        assert export_shard(worker_object, paths[-1]) == 2
+
+    merged = get_or_create_grease_pencil_object("Edge2GP_Result")
+    for path in paths:
+        import_shard(merged, path)
+
+    layer = merged.data.layers.get("Edge_Layer")
+    assert [gp_frame.frame_number for gp_frame in layer.frames] == [1, 2, 3, 4]
+    for gp_frame in layer.frames:
+        expected = make_strokes(5, gp_frame.frame_number)
+        for name, values in read_frame_stroke_arrays(gp_frame).items():
+            np.testing.assert_array_equal(values, expected[name])
@@ -0,0 +1,20 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark_pipeline import STAGES, run_benchmark, compare_results
+
+def test_every_stage_runs_headless():
+    results = run_benchmark({'small': (320, 180)}, repeats=1)
+    stages = results['small']
+    assert all(stages[stage] > 0 for stage in STAGES)
+    assert stages['objects'] > 0
+
+def test_compare_results_flags_slower_stages_only():
+    baseline = {'720p': {stage: 0.010 for stage in STAGES}}
+    results = {'720p': {stage: 0.010 for stage in STAGES}}
+    results['720p']['inference'] = 0.020
+    # Relatively slower but within the absolute noise floor
+    results['720p']['preprocess'] = 0.0115
+    assert compare_results(results, baseline, threshold=0.1) == [('720p', 'inference', 0.010, 0.020)]
@@ -0,0 +1,87 @@
+import os
+import sys
+import cv2
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark_pipeline import bpy
+import yolo_edge_detection
+from yolo_edge_detection import detection_rois, draw_refined_edges, refine_roi_edges, edge_mask_from_detections
+from yolo_segmentation import instance_polygons
+from test_yolo_segmentation import make_circle_detections
+
+@pytest.fixture(autouse=True)
+def default_refinement():
+    defaults = yolo_edge_detection.get_edge_refinement_config()
+    yield
+    yolo_edge_detection.configure_edge_refinement(**defaults)
+
+def make_plate():
+    # The detected circle (radius 240 at 960, 540) holds a bright disc with a darker square;
+    # a second disc far outside any detection must not be processed
+    frame = np.full((1080, 1920, 3), 40, dtype=np.uint8)
+    cv2.circle(frame, (960, 540), 200, (200, 200, 200), -1)
+    cv2.rectangle(frame, (900, 480), (1020, 600), (90, 90, 90), -1)
+    cv2.circle(frame, (200, 200), 80, (255, 255, 255), -1)
+    return frame
+
+def test_overlapping_rois_are_merged():
+    objects = [{'bbox': [100, 100, 200, 200]}, {'bbox': [190, 150, 300, 260]}, {'bbox': [600, 600, 700, 700]}]
+    rois = detection_rois(objects, (1080, 1920), margin=0.0)
+    assert [roi[:4] for roi in rois] == [(100, 100, 301, 261), (600, 600, 701, 701)]
+    assert [len(roi[4]) for roi in rois] == [2, 1]
+    # Margins grow the boxes, clipped to the frame
+    assert detection_rois([{'bbox': [0, 0, 100, 50]}], (1080, 1920), margin=0.5)[0][:4] == (0, 0, 151, 101)
+
+def test_refined_edges_match_full_frame_canny_inside_objects():
+    frame = make_plate()
+    object_data = instance_polygons(make_circle_detections(), 0.5)
+    edge_mask = np.zeros(frame.shape[:2], dtype=np.uint8)
+    stats = draw_refined_edges(edge_mask, frame, object_data, 'BGR')
+
+    full_frame = cv2.Canny(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), 50, 150)
+    (x1, y1, x2, y2, _), = detection_rois(object_data, frame.shape, 0.1)
+    np.testing.assert_array_equal(edge_mask[y1:y2, x1:x2] > 0, full_frame[y1:y2, x1:x2] > 0)
+    assert not edge_mask[:300, :300].any()
+    # Only the object's region was read, not the plate
+    assert stats['roi_pixels'] == (x2 - x1) * (y2 - y1) < stats['frame_pixels'] / 4
+
+def test_coarse_pass_skips_flat_parts_of_a_region():
+    gray = np.full((1024, 1024), 60, dtype=np.uint8)
+    cv2.rectangle(gray, (40, 40), (100, 100), 220, -1)
+    edges, full_res_pixels = refine_roi_edges(gray, 50, 150, pyramid_levels=2)
+    np.testing.assert_array_equal(edges > 0, cv2.Canny(gray, 50, 150) > 0)
+    assert full_res_pixels < gray.size / 20
+
+def test_outlines_can_be_replaced_by_image_edges():
+    frame = make_plate()
+    detections = make_circle_detections()
+    outlines = edge_mask_from_detections(detections, frame_pixels=frame)
+    yolo_edge_detection.configure_edge_refinement(refine=True, keep_outlines=False)
+    refined = edge_mask_from_detections(detections, frame_pixels=frame)
+    # The instance outline (radius about 240) has no image edge under it; the disc edge at radius 200 does
+    outline_band, disc_band = slice(960 + 225, 960 + 255), slice(960 + 195, 960 + 205)
+    assert outlines[540, outline_band].any() and not refined[540, outline_band].any()
+    assert refined[540, disc_band].any() and not outlines[540, disc_band].any()
+
+def test_prepared_frame_decodes_instance_masks_once(monkeypatch):
+    import main
+    import yolo_segmentation
+    detections = make_circle_detections(3)
+    detections['scores'][:] = [0.9, 0.4, 0.2]
+    frame = make_plate()
+    expected_edges = edge_mask_from_detections(detections, frame_pixels=frame)
+    expected_segmentation, _ = yolo_segmentation.segmentation_from_detections(detections)
+
+    decoded, decode = [], yolo_segmentation.decode_instance_masks
+    def decode_instance_masks(detections, indices):
+        decoded.append(indices.tolist())
+        return decode(detections, indices)
+    monkeypatch.setattr(yolo_segmentation, 'decode_instance_masks', decode_instance_masks)
+    _, _, edge_mask, segmentation_mask, object_data, _ = main.prepare_frame_strokes(1, frame, detections)
+    assert decoded == [[0, 1]]
+    assert len(object_data) == 2
+    np.testing.assert_array_equal(edge_mask, expected_edges)
+    np.testing.assert_array_equal(segmentation_mask, expected_segmentation)
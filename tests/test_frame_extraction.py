@@ -0,0 +1,98 @@
+import os
+import sys
+import cv2
+import numpy as np
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark_pipeline import bpy, make_frame, load_movie
+from test_background_job import stub_detect
+import queue
+import threading
+import frame_pipeline
+from frame_extraction import image_user_frame, read_background_frame, get_movie_source, read_image_pixels
+
+def make_image_user(frame_start=1, frame_offset=0, frame_duration=0, use_cyclic=False):
+    return SimpleNamespace(frame_start=frame_start, frame_offset=frame_offset, frame_duration=frame_duration,
+                           use_cyclic=use_cyclic)
+
+def test_image_user_frame_matches_blender():
+    assert image_user_frame(make_image_user(frame_start=10), 12, 100) == 3
+    assert image_user_frame(make_image_user(frame_start=10, frame_offset=5), 12, 100) == 8
+    assert image_user_frame(make_image_user(), 150, 100) == 100
+    assert image_user_frame(make_image_user(use_cyclic=True), 105, 100) == 5
+    assert image_user_frame(make_image_user(use_cyclic=True), 100, 100) == 100
+
+def test_image_pixels_are_read_top_row_first():
+    image = bpy.data.images.new("Plate", 3, 2)
+    # Blender's buffer starts with the bottom row
+    image.pixels.foreach_set(np.repeat([0.0, 0.0, 0.0, 1.0, 1.0, 1.0], 4))
+    assert read_image_pixels(image)[:, 0, 0].tolist() == [1.0, 0.0]
+    assert read_image_pixels(image, np.uint8)[:, 0, 0].tolist() == [255, 0]
+
+def write_ramp_movie(path):
+    # Movie frame n (1-based) has the value 25 * (n - 1)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 24, (64, 48))
+    for value in range(0, 250, 25):
+        writer.write(np.full((48, 64, 3), value, dtype=np.uint8))
+    writer.release()
+
+def test_background_movie_is_decoded_at_the_offset_frame(tmp_path):
+    path = str(tmp_path / "plate.avi")
+    write_ramp_movie(path)
+
+    image = SimpleNamespace(source='MOVIE', filepath=path, frame_duration=10)
+    background = SimpleNamespace(source='IMAGE', image=image, image_user=make_image_user(frame_offset=2))
+    scene = SimpleNamespace(frame_current=3)
+    pixels, channel_order = read_background_frame(background, scene)
+    assert channel_order == 'BGR'
+    # Scene frame 3 plus an offset of 2 is the fifth movie frame
+    assert abs(int(pixels.mean()) - 100) <= 3
+
+def test_background_still_is_read_from_memory():
+    bpy.reset()
+    frame = make_frame(64, 48)
+    image = load_movie(frame, "Still")
+    image.source = 'FILE'
+    background = SimpleNamespace(source='IMAGE', image=image, image_user=make_image_user())
+    pixels, channel_order = read_background_frame(background, SimpleNamespace(frame_current=1))
+    assert channel_order == 'RGB'
+    np.testing.assert_array_equal(pixels[:, :, :3], frame)
+
+def test_frame_range_decodes_the_frames_the_image_user_shows(tmp_path):
+    bpy.reset()
+    path = str(tmp_path / "plate.avi")
+    write_ramp_movie(path)
+    image_user = make_image_user(frame_start=3, frame_offset=1)
+    image = SimpleNamespace(source='MOVIE', filepath=path, frame_duration=10)
+    background = SimpleNamespace(source='IMAGE', image=image, image_user=image_user, show_background_image=True)
+    scene = bpy.context.scene
+    scene.camera = SimpleNamespace(type='CAMERA', data=SimpleNamespace(background_images=[background]))
+
+    movie_path, frame_offset = get_movie_source(scene)
+    assert movie_path == path
+    assert all(scene_frame + frame_offset == image_user_frame(image_user, scene_frame, 10)
+               for scene_frame in range(3, 10))
+
+    frames = queue.Queue()
+    frame_pipeline._read_frames(movie_path, 1, 5, frame_offset, frames, threading.Event(), [])
+    decoded = [frames.get() for _ in range(frames.qsize())][:-1]
+    # Scene frame 1 comes before the movie starts; scene frame 3 shows movie frame 2
+    assert [frame_number for frame_number, _ in decoded] == [2, 3, 4, 5]
+    assert [round(frame.mean() / 25) for _, frame in decoded] == [0, 1, 2, 3]
+
+def test_frame_range_total_counts_the_decoded_frames(tmp_path, monkeypatch):
+    monkeypatch.setattr(frame_pipeline, '_detect_bgr_batch', stub_detect)
+    path = str(tmp_path / "plate.avi")
+    write_ramp_movie(path)
+    # The ten movie frames show at scene frames 3..12
+    assert frame_pipeline.movie_frame_range(path, 1, 20, -2) == (3, 12)
+    assert frame_pipeline.movie_frame_range(path, 4, 6, -2) == (4, 6)
+
+    pipeline = frame_pipeline.start_frame_pipeline(1, 20, movie_path=path, frame_offset=-2)
+    try:
+        assert pipeline['total'] == 10
+        assert len([item for item in frame_pipeline.iter_frame_results(pipeline)]) == 10
+    finally:
+        frame_pipeline.stop_frame_pipeline(pipeline)
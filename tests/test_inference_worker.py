@@ -0,0 +1,51 @@
+import os
+import sys
+import threading
+import numpy as np
+from multiprocessing.connection import Listener
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark_pipeline import bpy
+import inference_worker
+
+def accept_in_background(listener):
+    def accept():
+        try:
+            listener.accept().close()
+        except Exception:
+            pass
+    thread = threading.Thread(target=accept, daemon=True)
+    thread.start()
+    return thread
+
+def test_frames_are_packed_into_one_batch():
+    frames = [np.full((4, 6, 3), value, dtype=np.uint8) for value in (1, 2, 3)]
+    block, layout = inference_worker._pack_frames(frames)
+    try:
+        batch = inference_worker._view_arrays(block, layout)['frames']
+        np.testing.assert_array_equal(batch, np.stack(frames))
+        del batch
+    finally:
+        block.close()
+        block.unlink()
+
+def test_worker_of_another_process_is_not_reused(monkeypatch):
+    # A worker started by another Blender listens on the remembered port with a different authkey
+    foreign = Listener((inference_worker.WORKER_HOST, 0), authkey=b'another blender')
+    own = Listener((inference_worker.WORKER_HOST, 0), authkey=inference_worker._authkey())
+    monkeypatch.setenv(inference_worker.PORT_ENV, str(foreign.address[1]))
+    try:
+        accept_in_background(foreign)
+        assert inference_worker._connect(start=False) is None
+        assert inference_worker.PORT_ENV not in os.environ
+
+        # With start, a private worker is started on a port of its own
+        monkeypatch.setattr(inference_worker, '_start_worker_process', lambda: own.address[1])
+        accept_in_background(own)
+        connection = inference_worker._connect()
+        connection.close()
+        assert os.environ[inference_worker.PORT_ENV] == str(own.address[1])
+    finally:
+        foreign.close()
+        own.close()
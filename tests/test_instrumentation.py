@@ -0,0 +1,37 @@
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark_pipeline import make_frame, run_stages, StubSegmentationModel
+import instrumentation
+
+def test_pipeline_stages_are_traced(tmp_path):
+    instrumentation.configure_instrumentation(enabled=True, trace_dir=str(tmp_path))
+    instrumentation.start_run("test")
+    run_stages(make_frame(320, 180), StubSegmentationModel())
+    summary = instrumentation.end_run()
+
+    for stage in ('frame_extraction', 'edge_mask', 'mask_postprocess', 'stroke_tracing', 'stroke_writing',
+                  'segment_stroke_writing', 'image_upload'):
+        assert summary[stage]['calls'] >= 1
+    assert summary['frame_extraction']['counts']['pixels'] == 320 * 180
+    assert summary['mask_postprocess']['counts']['objects'] > 0
+
+    with open(instrumentation.get_last_trace_path()) as f:
+        trace = json.load(f)
+    spans = [event for event in trace['traceEvents'] if event['ph'] == 'X']
+    assert {event['name'] for event in spans} >= set(summary)
+    assert all(event['dur'] >= 0 and 'cpu_ms' in event['args'] for event in spans)
+
+def test_disabled_instrumentation_records_nothing():
+    instrumentation.configure_instrumentation(enabled=False)
+    try:
+        instrumentation.start_run("test")
+        with instrumentation.span('stage', items=3) as counts:
+            counts['items'] += 1
+        assert instrumentation.end_run() == {}
+        assert instrumentation.get_last_trace_path() is None
+    finally:
+        instrumentation.configure_instrumentation(enabled=True)
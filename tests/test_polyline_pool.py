@@ -0,0 +1,97 @@
+import os
+import sys
+import time
+import queue
+import threading
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark_pipeline import bpy
+from benchmark_polyline_pool import make_instance_mask, make_instance_masks, run_instance_benchmark
+import polyline_pool
+import frame_pipeline
+from stroke_geometry import mask_to_contour_strokes, trace_contours
+
+@pytest.fixture(autouse=True)
+def default_pool(monkeypatch):
+    # Parallelize the small test masks too
+    monkeypatch.setattr(polyline_pool, 'MIN_PARALLEL_POINTS', 0)
+    defaults = dict(polyline_pool._config)
+    yield
+    polyline_pool.shutdown_pool()
+    polyline_pool.configure_polyline_pool(**defaults)
+
+def test_contour_ranges_are_contiguous_and_balanced():
+    lengths = [len(contour) for contour in trace_contours(make_instance_mask(1280, 720))]
+    point_offsets = np.concatenate([[0], np.cumsum(lengths)])
+    ranges = polyline_pool.contour_ranges(point_offsets, 4)
+    assert len(ranges) == 4
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(lengths)
+    assert all(previous[1] == current[0] for previous, current in zip(ranges, ranges[1:]))
+    points = [point_offsets[last] - point_offsets[first] for first, last in ranges]
+    assert max(points) < 2 * point_offsets[-1] / 4
+    assert polyline_pool.contour_ranges(point_offsets[:3], 8) == [(0, 1), (1, 2)]
+
+@pytest.mark.parametrize('use_processes', [False, True])
+def test_parallel_strokes_match_a_serial_pass(use_processes):
+    mask = make_instance_mask(1280, 720)
+    polyline_pool.configure_polyline_pool(workers=3, use_processes=use_processes)
+    expected = mask_to_contour_strokes(mask, 0.001)
+    result = polyline_pool.mask_to_contour_strokes_parallel(mask, 0.001)
+    np.testing.assert_array_equal(result[0], expected[0])
+    np.testing.assert_array_equal(result[1], expected[1])
+    assert polyline_pool._pool['key'] == (3, use_processes)
+
+@pytest.mark.parametrize('use_processes', [False, True])
+def test_parallel_instance_polygons_match_a_serial_pass(use_processes):
+    masks, transforms = make_instance_masks(12, size=96)
+    polyline_pool.configure_polyline_pool(workers=1)
+    expected = polyline_pool.masks_to_polygons(masks, transforms, (2160, 3840), 4, 1.0, 0.5)
+    polyline_pool.configure_polyline_pool(workers=3, use_processes=use_processes)
+    result = polyline_pool.masks_to_polygons(masks, transforms, (2160, 3840), 4, 1.0, 0.5)
+    assert polyline_pool._pool['key'] == (3, use_processes)
+    assert len(result) == 12 and any(len(polygons) > outer for polygons, outer in result)
+    for (polygons, outer), (expected_polygons, expected_outer) in zip(result, expected):
+        assert outer == expected_outer and len(polygons) == len(expected_polygons)
+        for polygon, expected_polygon in zip(polygons, expected_polygons):
+            np.testing.assert_array_equal(polygon, expected_polygon)
+
+@pytest.mark.skipif((os.cpu_count() or 1) < 4, reason="needs 4 cores to measure a speedup")
+def test_instance_tracing_speeds_up_with_workers():
+    # Tracing and simplification release the GIL, so threads scale on a single 50-instance frame
+    results = run_instance_benchmark([1, 4], use_processes=False, instances=50)
+    assert results[4]['seconds'] < results[1]['seconds'] / 1.3
+
+def test_only_frame_ranges_simplify_in_processes():
+    mask = make_instance_mask(1280, 720)
+    polyline_pool.mask_to_contour_strokes_parallel(mask, 0.001)
+    workers = min(polyline_pool.DEFAULT_WORKERS, os.cpu_count() or 1)
+    assert polyline_pool._pool['key'] in (None, (workers, False))
+
+    polyline_pool.configure_polyline_pool(workers=2)
+    polyline_pool.begin_frame_range()
+    try:
+        polyline_pool.mask_to_contour_strokes_parallel(mask, 0.001)
+        assert polyline_pool._pool['key'] == (2, True)
+    finally:
+        polyline_pool.end_frame_range()
+    # The processes do not outlive the range
+    assert polyline_pool._pool['executor'] is None
+
+def test_prepare_stage_keeps_frame_order():
+    inferred, prepared, stop = queue.Queue(), queue.Queue(), threading.Event()
+    for frame_number in range(8):
+        inferred.put((frame_number, None, None))
+    inferred.put(frame_pipeline._END)
+
+    def prepare(frame_number, frame_bgr, detections):
+        # Later frames finish first
+        time.sleep(0.002 * (8 - frame_number))
+        return frame_number
+
+    errors = []
+    frame_pipeline._prepare_results(inferred, prepared, prepare, stop, errors, workers=4)
+    results = [prepared.get() for _ in range(9)]
+    assert results[:8] == list(range(8)) and results[8] is frame_pipeline._END and not errors
@@ -0,0 +1,78 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark_pipeline import bpy
+from polyline_store import PolylineStore
+from stroke_creation import object_polylines, write_polyline_store
+from blender_utils import get_or_create_grease_pencil_object
+
+def make_store(count=4, layers=("Default",)):
+    rng = np.random.default_rng(0)
+    polylines = [rng.random((3 + index, 2)) * 100 for index in range(count)]
+    return PolylineStore.from_polylines(polylines, layers=layers, class_id=np.arange(count)), polylines
+
+def test_slices_share_points_and_selections_gather_them():
+    store, polylines = make_store()
+    tail = store[1:]
+    assert len(tail) == 3
+    assert np.shares_memory(tail.coords, store.coords)
+    np.testing.assert_allclose(tail[0], polylines[1], rtol=1e-6)
+
+    picked = store[[3, 0]]
+    assert picked.columns['class_id'].tolist() == [3, 0]
+    np.testing.assert_allclose(picked[0], polylines[3], rtol=1e-6)
+    np.testing.assert_allclose(picked[1], polylines[0], rtol=1e-6)
+    assert store[store.columns['class_id'] % 2 == 1].columns['class_id'].tolist() == [1, 3]
+
+def test_concatenate_merges_layers_by_name():
+    edges, _ = make_store(2, layers=("Edge_Layer",))
+    segments, _ = make_store(3, layers=("Segmentation_Layer", "Edge_Layer"))
+    segments.columns['layer'][:] = [0, 1, 0]
+    merged = PolylineStore.concatenate([edges[1:], segments])
+    assert merged.layers == ("Edge_Layer", "Segmentation_Layer")
+    assert merged.columns['layer'].tolist() == [0, 1, 0, 1]
+    assert merged.offsets[0] == 0 and merged.num_points == len(merged.coords)
+    assert len(merged.layer_strokes("Edge_Layer")) == 2
+
+def test_save_and_memory_mapped_load_round_trip(tmp_path):
+    store, _ = make_store()
+    store[1:].save(str(tmp_path))
+    loaded = PolylineStore.load(str(tmp_path))
+    assert isinstance(loaded.coords.base, np.memmap) or isinstance(loaded.coords, np.memmap)
+    np.testing.assert_array_equal(loaded.coords, store[1:].compact().coords)
+    assert loaded.columns['class_id'].tolist() == [1, 2, 3]
+
+def test_stroke_space_and_transforms():
+    store = PolylineStore.from_polylines([[[0, 0], [100, 50]]])
+    np.testing.assert_allclose(store.to_stroke_space(100, 50).coords, [[0, 1, 0], [1, 0, 0]])
+    np.testing.assert_allclose(store.transformed(scale=2, offset=(1, 0)).coords, [[1, 0], [201, 100]])
+
+def test_store_is_far_smaller_than_object_dictionaries():
+    # A dense frame: 40 objects with 500-point outlines, stored like instance_polygons does today
+    rng = np.random.default_rng(1)
+    object_data = [{'class': 'person', 'class_id': 0, 'confidence': 0.9,
+                    'segmentation': (rng.random((500, 2)) * 1000).tolist()} for _ in range(40)]
+    list_bytes = sum(sys.getsizeof(obj['segmentation']) + sum(
+        sys.getsizeof(point) + sum(sys.getsizeof(value) for value in point) for point in obj['segmentation'])
+        for obj in object_data)
+    store = object_polylines(object_data)
+    assert store.num_points == 20000
+    assert store.nbytes * 10 < list_bytes
+
+def test_missing_class_id_is_the_same_in_every_process():
+    # hash() of a string changes with PYTHONHASHSEED, so it cannot identify a class across runs
+    store = object_polylines([{'class': 'person', 'segmentation': np.zeros((3, 2))}])
+    assert store.columns['class_id'].tolist() == [886886774]
+
+def test_writer_fills_layers_with_stroke_attributes():
+    bpy.reset()
+    gp_object = get_or_create_grease_pencil_object("Store")
+    gp_object.material_slots = [None, None]
+    store = object_polylines([{'class': 'a', 'class_id': 3, 'polygons': [np.zeros((4, 2)), np.ones((5, 2))]}])
+    gp_frames = write_polyline_store(gp_object, store.to_stroke_space(10, 10), frame_number=5)
+    strokes = gp_frames["Segmentation_Layer"].strokes
+    assert [len(stroke.points) for stroke in strokes] == [4, 5]
+    assert all(stroke.use_cyclic and stroke.line_width == 10 and stroke.material_index == 1 for stroke in strokes)
@@ -0,0 +1,49 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark_pipeline import bpy, make_frame
+import preview
+from blender_utils import create_image_from_numpy
+
+def make_intermediates(width=1920, height=1080):
+    frame = make_frame(width, height)
+    mask = np.zeros((height, width), dtype=np.uint8)
+    mask[200:600, 300:900] = 255
+    object_data = [{'class': 'blob', 'confidence': 0.9, 'bbox': [300, 200, 900, 600]}]
+    return frame, mask, mask, object_data
+
+def test_every_source_is_downsampled():
+    frame, edge_mask, segmentation_mask, object_data = make_intermediates()
+    for source in preview.PREVIEW_SOURCES:
+        array = preview.build_preview(source, frame, edge_mask, segmentation_mask, object_data, max_size=480)
+        assert array.shape[:2] == (270, 480)
+    overlay = preview.build_preview('OVERLAY', frame, edge_mask, segmentation_mask, object_data, max_size=480)
+    assert not np.array_equal(overlay, preview.build_preview('FRAME', frame, edge_mask, segmentation_mask,
+                                                             object_data, max_size=480))
+
+def test_preview_is_throttled_and_updated_in_place():
+    bpy.reset()
+    settings = preview.get_preview_config()
+    preview.configure_preview(enabled=True, interval=5)
+    try:
+        preview.reset_preview()
+        intermediates = make_intermediates(320, 180)
+        updated = [preview.update_preview(frame, *intermediates) is not None for frame in range(1, 12)]
+        assert updated == [True, False, False, False, False, True, False, False, False, False, True]
+        assert len(bpy.data.images) == 1
+    finally:
+        preview.configure_preview(**settings)
+
+def test_preview_is_off_in_background_mode():
+    assert bpy.app.background
+    assert not preview.get_preview_config()['enabled']
+
+def test_two_channel_images_are_rejected():
+    bpy.reset()
+    create_image_from_numpy(np.ones((4, 6, 3), dtype=np.float32), "Reused")
+    with pytest.raises(ValueError):
+        create_image_from_numpy(np.zeros((4, 6, 2), dtype=np.float32), "Reused")
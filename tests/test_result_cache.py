@@ -0,0 +1,45 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark_pipeline import bpy
+from test_background_job import FRAMES, stub_detect, movie
+import frame_pipeline
+import result_cache
+import yolo_detection
+import main
+
+# The movie fixture stubs out inference; the cache sits below this in run_yolo_detection_batch
+detect_bgr_batch = frame_pipeline._detect_bgr_batch
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch, movie):
+    monkeypatch.setattr(frame_pipeline, '_detect_bgr_batch', detect_bgr_batch)
+    inferred = []
+    def detect_batch(frames, confidence_threshold, iou_threshold, channel_order, options):
+        inferred.extend(frames)
+        return stub_detect(frames)
+    monkeypatch.setattr(yolo_detection, '_detect_batch', detect_batch)
+    weights = tmp_path / "weights.pt"
+    weights.write_bytes(b"stub weights")
+    monkeypatch.setattr(yolo_detection, 'MODEL_PATH', str(weights))
+
+    defaults = dict(result_cache._config)
+    result_cache.configure_cache(enabled=True, directory=str(tmp_path / "cache"))
+    result_cache.reset_cache_stats()
+    yield inferred
+    result_cache.configure_cache(**defaults)
+    result_cache.reset_cache_stats()
+
+def test_warm_frame_range_is_served_from_the_cache(cache):
+    main.edge_to_grease_pencil_range(1, FRAMES, batch_size=2)
+    assert len(cache) == FRAMES
+    assert result_cache.get_cache_stats()['stores'] == FRAMES
+
+    main.edge_to_grease_pencil_range(1, FRAMES, batch_size=2)
+    assert len(cache) == FRAMES
+    assert result_cache.get_cache_stats()['hits'] == FRAMES
+    layer = bpy.data.objects.get("Edge2GP_Result").data.layers.get("Segmentation_Layer")
+    assert sorted(frame.frame_number for frame in layer.frames) == list(range(1, FRAMES + 1))
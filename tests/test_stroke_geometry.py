@@ -0,0 +1,78 @@
+import os
+import sys
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from stroke_geometry import (mask_to_run_strokes, mask_to_contour_strokes, simplify_polyline, contours_to_strokes,
+                            simplify_contour, mask_outlines)
+from benchmark_stroke_creation import make_edge_mask, legacy_run_strokes
+
+def test_run_strokes_match_legacy_loop():
+    mask = make_edge_mask(97, 61, boxes=5, seed=3)
+    coords, offsets = mask_to_run_strokes(mask)
+
+    legacy = legacy_run_strokes(mask)
+    assert len(offsets) - 1 == len(legacy)
+    for i, stroke in enumerate(legacy):
+        expected = np.array(stroke, dtype=np.float32)
+        np.testing.assert_array_equal(coords[offsets[i]:offsets[i + 1]], expected)
+
+def test_run_strokes_empty_mask():
+    coords, offsets = mask_to_run_strokes(np.zeros((4, 5), dtype=bool))
+    assert coords.shape == (0, 3)
+    assert offsets.tolist() == [0]
+
+def test_run_strokes_full_rows():
+    coords, offsets = mask_to_run_strokes(np.ones((2, 3), dtype=bool))
+    assert offsets.tolist() == [0, 3, 6]
+    assert coords[:, 1].tolist() == [1.0, 1.0, 1.0, 0.5, 0.5, 0.5]
+
+def test_simplify_polyline_drops_collinear_points():
+    points = np.array([[0, 0, 0], [1, 0.001, 0], [2, 0, 0], [3, 1, 0]], dtype=np.float32)
+    simplified = simplify_polyline(points, 0.01)
+    np.testing.assert_array_equal(simplified, points[[0, 2, 3]])
+
+def test_contour_strokes_trace_box_outline():
+    mask = np.zeros((50, 80), dtype=bool)
+    mask[10, 20:61] = mask[40, 20:61] = True
+    mask[10:41, 20] = mask[10:41, 60] = True
+    coords, offsets = mask_to_contour_strokes(mask, tolerance=0.001)
+
+    # One closed stroke with the four corners plus the closing point
+    assert offsets.tolist() == [0, 5]
+    np.testing.assert_array_equal(coords[0], coords[-1])
+    corners = {(round(x * 80), round((1 - y) * 50)) for x, y, _ in coords}
+    assert corners == {(20, 10), (60, 10), (20, 40), (60, 40)}
+
+def test_contour_tolerance_is_the_same_along_x_and_y():
+    # A 3 pixel bump across a horizontal and a vertical edge of a 4:1 frame, with a 4 pixel tolerance
+    horizontal = np.array([[0, 100], [800, 100], [800, 103], [1600, 100]])
+    vertical = np.array([[100, 0], [100, 200], [103, 200], [100, 400]])
+    coords, offsets = contours_to_strokes([horizontal, vertical], (400, 1600), tolerance=4 / 1600)
+    assert offsets.tolist() == [0, 2, 4]
+
+def test_closed_contour_stays_closed_when_simplified():
+    square = np.array([[0, 0], [5, 0], [10, 0], [10, 10], [0, 10], [0, 5], [0, 0]], dtype=np.int32)
+    simplified = simplify_contour(square, 0.5)
+    assert len(simplified) == 5
+    np.testing.assert_array_equal(simplified[0], simplified[-1])
+    assert {tuple(point) for point in simplified} == {(0, 0), (10, 0), (10, 10), (0, 10)}
+
+def test_mask_outlines_keep_holes():
+    # A ring, a second smaller disc and a speck below the minimum area
+    mask = np.zeros((100, 100), dtype=np.uint8)
+    cv2.circle(mask, (40, 40), 30, 1, -1)
+    cv2.circle(mask, (40, 40), 12, 0, -1)
+    cv2.circle(mask, (85, 85), 8, 1, -1)
+    mask[2, 97] = 1
+    outlines, outer = mask_outlines(mask > 0, min_area=4.0)
+    assert outer == 2 and len(outlines) == 3
+    assert cv2.contourArea(outlines[0]) > cv2.contourArea(outlines[1])
+
+    # One fill call restores the mask with its hole
+    restored = np.zeros_like(mask)
+    cv2.fillPoly(restored, outlines, 1)
+    assert restored[40, 40] == 0 and restored[40, 15] == 1 and restored[85, 85] == 1
+    assert np.count_nonzero(restored != mask) < 0.1 * np.count_nonzero(mask)
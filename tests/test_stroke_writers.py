@@ -0,0 +1,93 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark_pipeline import bpy
+import stylization
+from polyline_store import PolylineStore
+from batch_runner import export_shard, import_shard
+from blender_utils import get_or_create_grease_pencil_object
+from stroke_creation import write_polyline_store, read_frame_stroke_arrays
+from stroke_writers import LEGACY_RADIUS_FACTOR, GreasePencilV3Writer, LegacyStrokeWriter, get_stroke_writer
+
+@pytest.fixture
+def blender_version(monkeypatch):
+    bpy.reset()
+    def set_version(version):
+        monkeypatch.setattr(bpy.app, 'version', version)
+    return set_version
+
+@pytest.fixture(autouse=True)
+def default_style():
+    defaults = stylization.get_style_config()
+    yield
+    stylization.configure_style(**defaults)
+    stylization.clear_base_strokes()
+
+def make_store(count=200):
+    rng = np.random.default_rng(0)
+    polylines = [np.column_stack([rng.random((2 + index % 7, 2)), np.zeros(2 + index % 7)]) for index in range(count)]
+    return PolylineStore.from_polylines(polylines, layers=("Edge_Layer",), class_id=np.arange(count) % 4 - 1,
+                                        cyclic=np.arange(count) % 2 == 0, width=10)
+
+def test_writer_follows_the_blender_version(blender_version):
+    blender_version((4, 1, 0))
+    assert isinstance(get_stroke_writer(get_or_create_grease_pencil_object("Old")), LegacyStrokeWriter)
+    blender_version((4, 3, 0))
+    gp_object = get_or_create_grease_pencil_object("New")
+    assert gp_object.type == 'GREASEPENCIL'
+    assert isinstance(get_stroke_writer(gp_object), GreasePencilV3Writer)
+
+def test_v3_frame_is_written_with_one_allocation(blender_version):
+    blender_version((4, 3, 0))
+    gp_object = get_or_create_grease_pencil_object("New")
+    gp_object.material_slots = [None, None]
+    stylization.configure_style(pressure_taper=1.0)
+    store = make_store()
+    gp_frame = write_polyline_store(gp_object, store, frame_number=3)["Edge_Layer"]
+
+    assert gp_frame.drawing.add_strokes_calls == 1
+    arrays = read_frame_stroke_arrays(gp_frame)
+    np.testing.assert_array_equal(arrays['offsets'], store.offsets)
+    np.testing.assert_array_equal(arrays['coords'], store.coords)
+    np.testing.assert_array_equal(arrays['use_cyclic'], store.columns['cyclic'])
+    # Strokes without a class (-1) use the first material slot
+    assert arrays['material_index'][:4].tolist() == [0, 0, 1, 0]
+    # Radius is the legacy line width scaled by the pressure taper, which is 0 at open stroke ends
+    assert arrays['radius'].max() == pytest.approx(10 * LEGACY_RADIUS_FACTOR)
+    assert arrays['radius'][store.offsets[1]] == 0
+
+    # Writing the frame again replaces it
+    write_polyline_store(gp_object, store[:5], frame_number=3)
+    layer = gp_object.data.layers.get("Edge_Layer")
+    assert len(layer.frames) == 1
+    assert len(read_frame_stroke_arrays(layer.frames[0])['offsets']) == 6
+
+def test_legacy_and_v3_write_the_same_geometry(blender_version):
+    store = make_store(20)
+    geometry = []
+    for version in ((4, 1, 0), (4, 3, 0)):
+        blender_version(version)
+        gp_object = get_or_create_grease_pencil_object(f"Edge2GP_{version[1]}")
+        gp_frame = write_polyline_store(gp_object, store, frame_number=1)["Edge_Layer"]
+        arrays = read_frame_stroke_arrays(gp_frame)
+        geometry.append((arrays['coords'], arrays['offsets'], arrays['use_cyclic']))
+    for legacy, v3 in zip(*geometry):
+        np.testing.assert_array_equal(legacy, v3)
+
+def test_v3_shards_merge(blender_version, tmp_path):
+    blender_version((4, 3, 0))
+    worker_object = bpy.data.objects.new("Worker", bpy.data.grease_pencils_v3.new("Worker"))
+    for frame_number in (1, 2):
+        write_polyline_store(worker_object, make_store(10 * frame_number), frame_number=frame_number)
+    assert export_shard(worker_object, str(tmp_path / "shard.npz")) == 2
+
+    merged = get_or_create_grease_pencil_object("Edge2GP_Result")
+    import_shard(merged, str(tmp_path / "shard.npz"))
+    for (_, written), (_, merged_frame) in zip(get_stroke_writer(worker_object).layer_frames(),
+                                               get_stroke_writer(merged).layer_frames()):
+        for name, values in read_frame_stroke_arrays(written).items():
+            np.testing.assert_array_equal(read_frame_stroke_arrays(merged_frame)[name], values)
@@ -0,0 +1,80 @@
+import os
+import sys
+import time
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark_pipeline import bpy
+import stylization
+from polyline_store import PolylineStore
+from stroke_creation import write_polyline_store, restyle_polyline_frames
+from blender_utils import get_or_create_grease_pencil_object
+
+@pytest.fixture(autouse=True)
+def default_style():
+    defaults = stylization.get_style_config()
+    yield
+    stylization.configure_style(**defaults)
+    stylization.clear_base_strokes()
+
+def make_strokes(count=100, points=50, cyclic=False, layer_name="Edge_Layer"):
+    rng = np.random.default_rng(0)
+    polylines = [np.column_stack([rng.random((points, 2)), np.zeros(points)]) for _ in range(count)]
+    return PolylineStore.from_polylines(polylines, layers=(layer_name,), cyclic=cyclic)
+
+def test_same_seed_and_frame_reproduce_the_same_strokes():
+    store = make_strokes()
+    def styled(seed, frame_number):
+        rng = stylization.stroke_rng(seed, frame_number, "Edge_Layer")
+        return stylization.stylize_polylines(store, rng, noise=1.0, variation=1.0, width_jitter=0.5)[0]
+    first, again = styled(1, 10), styled(1, 10)
+    np.testing.assert_array_equal(first.coords, again.coords)
+    np.testing.assert_array_equal(first.columns['width'], again.columns['width'])
+    assert not np.array_equal(first.coords, styled(1, 11).coords)
+    assert not np.array_equal(first.coords, styled(2, 10).coords)
+    # z stays on the drawing plane
+    assert np.all(first.coords[:, 2] == 0)
+
+def test_amounts_scale_the_same_pattern():
+    store = make_strokes()
+    def displacement(noise):
+        rng = stylization.stroke_rng(0, 1, "Edge_Layer")
+        return stylization.stylize_polylines(store, rng, noise=noise)[0].coords - store.coords
+    np.testing.assert_allclose(displacement(2.0), 2 * displacement(1.0), atol=1e-6)
+
+def test_taper_thins_open_strokes_only():
+    rng = np.random.default_rng(0)
+    _, pressure, strength = stylization.stylize_polylines(make_strokes(1, 5), rng, pressure_taper=1.0)
+    np.testing.assert_allclose(pressure, [0, np.sqrt(0.5), 1, np.sqrt(0.5), 0], atol=1e-6)
+    assert np.all(strength == 1)
+    _, pressure, _ = stylization.stylize_polylines(make_strokes(1, 5, cyclic=True), rng, pressure_taper=1.0)
+    assert np.all(pressure == 1)
+
+def test_styling_a_dense_frame_takes_milliseconds():
+    store = make_strokes(count=2000, points=100)
+    rng = stylization.stroke_rng(0, 1, "Edge_Layer")
+    start = time.perf_counter()
+    stylization.stylize_polylines(store, rng, noise=1.0, variation=1.0, pressure_taper=0.5, strength_taper=0.5,
+                                  width_jitter=0.2)
+    assert time.perf_counter() - start < 0.25
+
+def test_restyle_rewrites_kept_strokes_without_detection():
+    bpy.reset()
+    gp_object = get_or_create_grease_pencil_object("Styled")
+    store = make_strokes(count=3, points=4)
+    write_polyline_store(gp_object, store, frame_number=2)
+    def layer_points():
+        gp_frame = gp_object.data.layers.get("Edge_Layer").frames[0]
+        return np.concatenate([stroke.points._co for stroke in gp_frame.strokes])
+    np.testing.assert_array_equal(layer_points(), store.coords)
+
+    stylization.configure_style(seed=5, noise=1.0, pressure_taper=1.0)
+    assert restyle_polyline_frames(gp_object) == 1
+    styled = layer_points()
+    assert not np.array_equal(styled, store.coords)
+    # Restyling starts from the kept strokes, so doing it again does not add up
+    restyle_polyline_frames(gp_object, frame_numbers={2})
+    np.testing.assert_array_equal(layer_points(), styled)
+    assert restyle_polyline_frames(gp_object, frame_numbers={3}) == 0
@@ -0,0 +1,80 @@
+import os
+import sys
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from yolo_segmentation import segmentation_from_detections, instance_polygons
+from temporal import propagate_detections
+
+def make_circle_detections(count=1):
+    # A 1920x1080 frame letterboxed into 640x640: scale 1/3, 140 pixels of padding on top
+    centers_y, centers_x = np.mgrid[0:160, 0:160] + 0.5
+    protos = np.zeros((1, 32, 160, 160), dtype=np.float32)
+    protos[0, 0] = 1.0 - ((centers_x - 80) ** 2 + (centers_y - 80) ** 2) / 20 ** 2
+    coefficients = np.zeros((count, 32), dtype=np.float32)
+    coefficients[:, 0] = 1.0
+    return {
+        'boxes': np.tile(np.array([[700, 280, 1220, 800]], dtype=np.float32), (count, 1)),
+        'scores': np.full(count, 0.9, dtype=np.float32),
+        'classes': np.zeros(count, dtype=np.int32),
+        'mask_coefficients': coefficients,
+        'protos': protos,
+        'proto_index': np.zeros(count, dtype=np.int32),
+        'proto_transforms': np.array([[1 / 3, 0, 140]], dtype=np.float32),
+        'names': {0: 'person'},
+        'frame_shape': (1080, 1920),
+    }
+
+def test_mask_polygon_maps_back_to_source_pixels():
+    (obj,) = instance_polygons(make_circle_detections())
+    assert obj['class'] == 'person'
+    assert obj['class_id'] == 0
+
+    # The proto circle (radius 20 at 80, 80) is a radius 240 circle at 960, 540 in the frame
+    points = np.array(obj['segmentation'])
+    radii = np.hypot(points[:, 0] - 960, points[:, 1] - 540)
+    assert np.all(np.abs(radii - 240) < 12)
+
+def test_overlapping_instances_fill_the_same_area():
+    single, _ = segmentation_from_detections(make_circle_detections(1))
+    many, object_data = segmentation_from_detections(make_circle_detections(4))
+    assert len(object_data) == 4
+    np.testing.assert_array_equal(single, many)
+    assert abs(np.count_nonzero(single) / (np.pi * 240 ** 2) - 1) < 0.05
+
+def test_results_without_protos_fall_back_to_boxes():
+    detections = make_circle_detections()
+    detections['protos'] = None
+    (obj,) = instance_polygons(detections)
+    assert obj['segmentation'] == [[700, 280], [1220, 280], [1220, 800], [700, 800]]
+
+def test_propagated_detection_moves_its_mask_uncut():
+    # A textured plate that moved 60 pixels right and 30 down since the keyframe
+    rng = np.random.default_rng(0)
+    keyframe = cv2.resize(rng.integers(0, 255, (27, 48), dtype=np.uint8), (1920, 1080),
+                          interpolation=cv2.INTER_CUBIC)
+    current = np.roll(keyframe, (30, 60), axis=(0, 1))
+    propagated = propagate_detections(make_circle_detections(), keyframe, current)
+    np.testing.assert_allclose(propagated['boxes'][0], [760, 310, 1280, 830], atol=1)
+
+    (obj,) = instance_polygons(propagated)
+    points = np.array(obj['segmentation'])
+    # The whole circle moved along; cropping the unmoved mask to the moved box would cut off its left side
+    radii = np.hypot(points[:, 0] - 1020, points[:, 1] - 570)
+    assert np.all(np.abs(radii - 240) < 12)
+    assert np.ptp(points[:, 0]) > 2 * 240 - 24
+
+def test_mask_holes_stay_empty():
+    # Cut a radius 8 hole (96 source pixels) into the proto circle
+    detections = make_circle_detections()
+    centers_y, centers_x = np.mgrid[0:160, 0:160] + 0.5
+    detections['protos'][0, 1] = -10.0 * (np.hypot(centers_x - 80, centers_y - 80) < 8)
+    detections['mask_coefficients'][:, 1] = 1.0
+
+    segmentation_mask, (obj,) = segmentation_from_detections(detections)
+    assert len(obj['polygons']) == 2
+    hole = np.hypot(*np.array(obj['polygons'][1]).T - np.array([[960], [540]]))
+    assert np.all(np.abs(hole - 96) < 12)
+    assert segmentation_mask[540, 960] == 0 and segmentation_mask[540, 960 + 160] == 255